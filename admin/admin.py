@@ -1,16 +1,31 @@
-from aiogram import F, Router, Bot
+import asyncio
+
+from aiogram import Router, Bot
 from aiogram.exceptions import TelegramBadRequest
+from aiogram.filters import Command, CommandObject
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
-from aiogram.types import CallbackQuery, Message
+from aiogram.types import BufferedInputFile, CallbackQuery, Message
 
-from db_manager.db import Database
+from db_manager.db import Database, get_database
+from db_manager.query_profiler import slow_queries
 from menu.keyboard import moderation_keyboard
-from utils.permissions import is_admin
-from logic.feedback import _format_rating
-
-admin_router = Router()
-db = Database()
+from utils.callbacks import (
+    MODERATION_APPROVE,
+    MODERATION_DELETE,
+    MODERATION_QUEUE,
+    MODERATION_REJECT,
+    REVIEWS_DELETE,
+    REVIEWS_REPLY,
+    WELCOME_EDIT,
+    CallbackRoutes,
+)
+from logic.feedback import _format_rating, _format_review_block
+from utils.similarity import review_index
+
+admin_router = Router(name="admin")
+routes = CallbackRoutes(admin_router)
+db = get_database()
 
 
 class WelcomeState(StatesGroup):
@@ -21,9 +36,9 @@ class AdminReplyState(StatesGroup):
     waiting_for_reply = State()
 
 
-@admin_router.callback_query(F.data == "welcome:edit")
-async def start_welcome_edit(call: CallbackQuery, state: FSMContext):
-    if not is_admin(call.from_user.id):
+@routes.on(WELCOME_EDIT)
+async def start_welcome_edit(call: CallbackQuery, state: FSMContext, is_admin: bool):
+    if not is_admin:
         await call.answer("Недостаточно прав.", show_alert=True)
         return
 
@@ -37,8 +52,8 @@ async def start_welcome_edit(call: CallbackQuery, state: FSMContext):
 
 
 @admin_router.message(WelcomeState.waiting_for_content)
-async def process_welcome_content(message: Message, state: FSMContext):
-    if not is_admin(message.from_user.id):
+async def process_welcome_content(message: Message, state: FSMContext, is_admin: bool):
+    if not is_admin:
         return
 
     text = (message.caption or message.text or "").strip()
@@ -67,20 +82,19 @@ async def process_welcome_content(message: Message, state: FSMContext):
     await state.clear()
 
 
-@admin_router.callback_query(F.data.startswith("reviews:reply:"))
-async def start_review_reply(call: CallbackQuery, state: FSMContext):
-    if not is_admin(call.from_user.id):
+@routes.on(REVIEWS_REPLY)
+async def start_review_reply(call: CallbackQuery, cb, state: FSMContext, is_admin: bool):
+    if not is_admin:
         await call.answer("Недостаточно прав.", show_alert=True)
         return
 
-    _, _, review_id, page = call.data.split(":")
-    review = db.get_review(int(review_id))
+    review = db.get_review(cb.review_id, include_archived=True)
     if not review:
         await call.answer("Отзыв не найден.", show_alert=True)
         return
 
     await state.set_state(AdminReplyState.waiting_for_reply)
-    await state.update_data(review_id=review["id"], return_page=int(page))
+    await state.update_data(review_id=review["id"], return_page=cb.page)
     await call.message.answer(
         f"Напишите ответ для пользователя {review.get('full_name') or review['user_id']} по отзыву №{review['id']}."
     )
@@ -88,13 +102,13 @@ async def start_review_reply(call: CallbackQuery, state: FSMContext):
 
 
 @admin_router.message(AdminReplyState.waiting_for_reply)
-async def send_admin_reply(message: Message, state: FSMContext):
-    if not is_admin(message.from_user.id):
+async def send_admin_reply(message: Message, state: FSMContext, is_admin: bool):
+    if not is_admin:
         return
 
     data = await state.get_data()
     review_id = data.get("review_id")
-    review = db.get_review(review_id) if review_id else None
+    review = db.get_review(review_id, include_archived=True) if review_id else None
     if not review:
         await message.answer("Не удалось найти отзыв. Попробуйте заново открыть список отзывов.")
         await state.clear()
@@ -131,10 +145,10 @@ async def send_admin_reply(message: Message, state: FSMContext):
     await state.clear()
 
 
-@admin_router.callback_query(F.data == "admin:moderation")
-async def show_moderation_queue(call: CallbackQuery):
+@routes.on(MODERATION_QUEUE)
+async def show_moderation_queue(call: CallbackQuery, is_admin: bool):
     """Показать очередь модерации"""
-    if not is_admin(call.from_user.id):
+    if not is_admin:
         await call.answer("Недостаточно прав.", show_alert=True)
         return
     
@@ -159,6 +173,14 @@ async def show_moderation_queue(call: CallbackQuery):
     
     if review.get("photo_file_id"):
         text_lines.append("\n📎 Фото прикреплено")
+
+    similar = review_index.flag_for(review['id'])
+    if similar:
+        text_lines.append(f"\n⚠️ Похож на отзыв №{similar[0]} ({similar[1]:.0%}), /review {similar[0]}")
+    if review.get("photo_file_id"):
+        photo_match = db.get_review_photo_match(review['id'])
+        if photo_match:
+            text_lines.append(f"🖼️ Фото как в отзыве №{photo_match[0]} (отличие {photo_match[1]} бит из 64)")
     
     text = "\n".join(text_lines)
     keyboard = moderation_keyboard(review['id'])
@@ -187,18 +209,14 @@ async def show_moderation_queue(call: CallbackQuery):
     await call.answer()
 
 
-@admin_router.callback_query(F.data.startswith("moderation:approve:"))
-async def approve_review(call: CallbackQuery, bot: Bot):
+@routes.on(MODERATION_APPROVE)
+async def approve_review(call: CallbackQuery, cb, bot: Bot, is_admin: bool):
     """Одобрить отзыв"""
-    if not is_admin(call.from_user.id):
+    if not is_admin:
         await call.answer("Недостаточно прав.", show_alert=True)
         return
-    
-    try:
-        review_id = int(call.data.split(":")[2])
-    except (ValueError, IndexError):
-        await call.answer("Неверный ID отзыва.", show_alert=True)
-        return
+
+    review_id = cb.review_id
     
     review = db.get_review(review_id)
     if not review:
@@ -220,7 +238,7 @@ async def approve_review(call: CallbackQuery, bot: Bot):
         # Показываем следующий отзыв на модерации, если есть
         pending = db.get_pending_reviews()
         if pending:
-            await show_moderation_queue(call)
+            await show_moderation_queue(call, is_admin)
         else:
             await call.message.answer("Все отзывы проверены! ✅")
     else:
@@ -229,31 +247,28 @@ async def approve_review(call: CallbackQuery, bot: Bot):
     await call.answer()
 
 
-@admin_router.callback_query(F.data.startswith("moderation:reject:"))
-async def reject_review(call: CallbackQuery, bot: Bot):
-    """Отклонить отзыв (удалить без уведомления)"""
-    if not is_admin(call.from_user.id):
+@routes.on(MODERATION_REJECT)
+async def reject_review(call: CallbackQuery, cb, bot: Bot, is_admin: bool):
+    """Отклонить отзыв (перенести в архив без уведомления)"""
+    if not is_admin:
         await call.answer("Недостаточно прав.", show_alert=True)
         return
-    
-    try:
-        review_id = int(call.data.split(":")[2])
-    except (ValueError, IndexError):
-        await call.answer("Неверный ID отзыва.", show_alert=True)
-        return
+
+    review_id = cb.review_id
     
     review = db.get_review(review_id)
     if not review:
         await call.answer("Отзыв не найден.", show_alert=True)
         return
     
-    if db.delete_review(review_id):
-        await call.message.edit_text(f"❌ Отзыв №{review_id} отклонён и удалён.")
+    if db.archive_review(review_id, "rejected"):
+        review_index.remove(review_id)
+        await call.message.edit_text(f"❌ Отзыв №{review_id} отклонён и перенесён в архив.")
         
         # Показываем следующий отзыв на модерации, если есть
         pending = db.get_pending_reviews()
         if pending:
-            await show_moderation_queue(call)
+            await show_moderation_queue(call, is_admin)
         else:
             await call.message.answer("Все отзывы проверены! ✅")
     else:
@@ -262,26 +277,23 @@ async def reject_review(call: CallbackQuery, bot: Bot):
     await call.answer()
 
 
-@admin_router.callback_query(F.data.startswith("moderation:delete:"))
-async def delete_review_from_moderation(call: CallbackQuery):
+@routes.on(MODERATION_DELETE)
+async def delete_review_from_moderation(call: CallbackQuery, cb, is_admin: bool):
     """Удалить отзыв из модерации"""
-    if not is_admin(call.from_user.id):
+    if not is_admin:
         await call.answer("Недостаточно прав.", show_alert=True)
         return
-    
-    try:
-        review_id = int(call.data.split(":")[2])
-    except (ValueError, IndexError):
-        await call.answer("Неверный ID отзыва.", show_alert=True)
-        return
+
+    review_id = cb.review_id
     
     if db.delete_review(review_id):
+        review_index.remove(review_id)
         await call.message.edit_text(f"🗑️ Отзыв №{review_id} удалён.")
         
         # Показываем следующий отзыв на модерации, если есть
         pending = db.get_pending_reviews()
         if pending:
-            await show_moderation_queue(call)
+            await show_moderation_queue(call, is_admin)
         else:
             await call.message.answer("Все отзывы проверены! ✅")
     else:
@@ -290,25 +302,107 @@ async def delete_review_from_moderation(call: CallbackQuery):
     await call.answer()
 
 
-@admin_router.callback_query(F.data.startswith("reviews:delete:"))
-async def delete_review_from_list(call: CallbackQuery):
+@routes.on(REVIEWS_DELETE)
+async def delete_review_from_list(call: CallbackQuery, cb, is_admin: bool):
     """Удалить отзыв из списка просмотра"""
-    if not is_admin(call.from_user.id):
+    if not is_admin:
         await call.answer("Недостаточно прав.", show_alert=True)
         return
     
-    try:
-        parts = call.data.split(":")
-        review_id = int(parts[2])
-        page = int(parts[3])
-    except (ValueError, IndexError):
-        await call.answer("Неверные параметры.", show_alert=True)
-        return
-    
-    if db.delete_review(review_id):
-        await call.answer(f"Отзыв №{review_id} удалён.", show_alert=True)
+    if db.delete_review(cb.review_id):
+        review_index.remove(cb.review_id)
+        await call.answer(f"Отзыв №{cb.review_id} удалён.", show_alert=True)
         # Обновляем страницу отзывов
         from logic.feedback import _send_reviews_page
-        await _send_reviews_page(call, "admin", page)
+        await _send_reviews_page(call, "admin", cb.page)
     else:
         await call.answer("Не удалось удалить отзыв.", show_alert=True)
+
+
+@admin_router.message(Command("slow_queries"))
+async def show_slow_queries(message: Message, command: CommandObject, is_admin: bool):
+    """Топ медленных SQL-запросов: /slow_queries [N] или /slow_queries reset"""
+    if not is_admin:
+        return
+
+    if command.args and command.args.strip() == "reset":
+        slow_queries.reset()
+        await message.answer("Журнал медленных запросов очищен.")
+        return
+
+    try:
+        limit = int(command.args) if command.args else 5
+    except ValueError:
+        limit = 5
+
+    top = slow_queries.top(limit=max(1, min(limit, 20)))
+    if not top:
+        await message.answer("Медленных запросов пока не было 🚀")
+        return
+
+    blocks = []
+    for idx, stats in enumerate(top, start=1):
+        lines = [
+            f"{idx}. {stats.statement}",
+            f"   ×{stats.count} · всего {stats.total_ms:.0f} мс · ср. {stats.avg_ms:.1f} мс · макс {stats.max_ms:.1f} мс",
+            f"   параметры: {', '.join(stats.shapes)}",
+        ]
+        if stats.plan:
+            lines.append("   план: " + stats.plan.replace("\n", "\n         "))
+        blocks.append("\n".join(lines))
+
+    text = "🐢 Медленные запросы\n\n" + "\n\n".join(blocks)
+    # Лимит Telegram — 4096 символов
+    await message.answer(text[:4000])
+
+
+ARCHIVE_REASONS = {"rejected": "отклонён модератором", "expired": "старый отзыв", "spam": "спам-волна", "automod": "автомодерация"}
+
+
+@admin_router.message(Command("review"))
+async def lookup_review(message: Message, command: CommandObject, is_admin: bool):
+    """Карточка отзыва по номеру, в том числе из архива: /review 123"""
+    if not is_admin:
+        return
+
+    try:
+        review_id = int((command.args or "").strip().lstrip("№#"))
+    except ValueError:
+        await message.answer("Использование: /review <номер отзыва>")
+        return
+
+    review = db.get_review(review_id, include_archived=True)
+    if not review:
+        await message.answer(f"Отзыв №{review_id} не найден.")
+        return
+
+    if review.get("archived"):
+        reason = ARCHIVE_REASONS.get(review.get("archive_reason"), review.get("archive_reason") or "")
+        status = f"🗄️ В архиве с {review.get('archived_at')}" + (f" ({reason})" if reason else "")
+    elif review.get("is_approved"):
+        status = "✅ Опубликован"
+    else:
+        status = "⏳ На модерации"
+    text = f"{_format_review_block(review, 'admin', is_last=True)}\n\n{status}\n🕒 Создан: {review.get('created_at')}"
+    await message.answer(text[:4000])
+
+
+def _build_reviews_export():
+    # Выгрузка читает всю базу в рабочем потоке, поэтому со своим соединением, а не общим
+    from admin.report import generate_reviews_report
+
+    export_db = Database(path_to_database=db.db_path)
+    try:
+        return generate_reviews_report(export_db)
+    finally:
+        export_db.close()
+
+
+@admin_router.message(Command("export_reviews"))
+async def export_reviews(message: Message, is_admin: bool):
+    """XLSX со всеми отзывами, включая архив"""
+    if not is_admin:
+        return
+
+    bio, filename, summary = await asyncio.to_thread(_build_reviews_export)
+    await message.answer_document(BufferedInputFile(bio.getvalue(), filename=filename), caption=summary)
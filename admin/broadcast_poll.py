@@ -5,16 +5,17 @@ from aiogram.types import Message
 from aiogram.filters import Command
 from aiogram.exceptions import TelegramAPIError
 
-from db_manager.db import Database
+from db_manager.db import get_database
+from utils.api_governor import broadcast_lane
 
-db = Database()
-broadcast_poll_router = Router()
+db = get_database()
+broadcast_poll_router = Router(name="broadcast_poll")
 
 
 @broadcast_poll_router.message(Command("broadcast_poll"))
-async def start_broadcast_poll(message: Message):
+async def start_broadcast_poll(message: Message, is_admin: bool):
     """Запуск рассылки опроса"""
-    if not db.is_admin(message.from_user.id):
+    if not is_admin:
         await message.answer("🚫 У вас нет прав для запуска рассылки.")
         return
 
@@ -25,9 +26,9 @@ async def start_broadcast_poll(message: Message):
 
 
 @broadcast_poll_router.message(F.poll)
-async def receive_poll(message: Message, bot: Bot):
+async def receive_poll(message: Message, bot: Bot, is_admin: bool):
     """Получение опроса и рассылка"""
-    if not db.is_admin(message.from_user.id):
+    if not is_admin:
         await message.answer("🚫 Только администраторы могут рассылать опросы.")
         return
 
@@ -44,13 +45,14 @@ async def receive_poll(message: Message, bot: Bot):
 
     for user_id in users:
         try:
-            await bot.send_poll(
-                chat_id=user_id,
-                question=question,
-                options=options,
-                is_anonymous=is_anonymous,
-                allows_multiple_answers=allows_multiple_answers
-            )
+            with broadcast_lane():
+                await bot.send_poll(
+                    chat_id=user_id,
+                    question=question,
+                    options=options,
+                    is_anonymous=is_anonymous,
+                    allows_multiple_answers=allows_multiple_answers
+                )
             sent += 1
         except TelegramAPIError:
             continue
@@ -4,13 +4,19 @@ from aiogram.utils.keyboard import InlineKeyboardBuilder
 from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
-from aiogram.filters import Command
-from db_manager.db import Database
+from aiogram.filters import Command, CommandObject
+from aiogram.types import BufferedInputFile
+import asyncio
+from datetime import datetime
+from loguru import logger
+from db_manager.db import get_database
 from config import config
+from utils.profiler import profile_lock, run_profile
+from utils.automod import ACTIONS, BUILTIN_KINDS, KINDS, RuleError, automod, validate_rule
 
 
-db = Database()
-owner_router = Router()
+db = get_database()
+owner_router = Router(name="owner")
 OWNER_ID = config.bot.owner_id
 
 
@@ -157,4 +163,150 @@ async def delete_admin_confirm(call: CallbackQuery):
 
     admin_id = int(call.data.split(":")[1])
     db.delete_admin(admin_id)
-    await call.message.edit_text(f"✅ Администратор {admin_id} удалён.")
\ No newline at end of file
+    await call.message.edit_text(f"✅ Администратор {admin_id} удалён.")
+
+
+# --- Профилирование ---
+PROFILE_MAX_SECONDS = 120
+
+
+@owner_router.message(Command("profile"))
+async def owner_profile(message: Message, command: CommandObject):
+    """/profile [cpu|mem|all] [секунды] — профиль живого бота, результат приходит файлом"""
+    if message.from_user.id != OWNER_ID:
+        await message.answer("🚫 У вас нет прав для этой команды.")
+        return
+
+    args = (command.args or "").split()
+    mode = args[0] if args else "cpu"
+    if mode not in ("cpu", "mem", "all"):
+        await message.answer("Использование: /profile [cpu|mem|all] [секунды]")
+        return
+    try:
+        seconds = int(args[1]) if len(args) > 1 else 15
+    except ValueError:
+        seconds = 15
+    seconds = max(1, min(seconds, PROFILE_MAX_SECONDS))
+
+    if profile_lock.locked():
+        await message.answer("⏳ Профилирование уже идёт, дождитесь результата.")
+        return
+    # Замок берём до первого await: иначе две команды подряд обе пройдут проверку.
+    # Свободный asyncio.Lock захватывается без переключения задач; отпускает его _send_profile
+    await profile_lock.acquire()
+    try:
+        await message.answer(f"🔬 Профилирую ({mode}) {seconds} с…")
+        # Замер идёт в фоне, чтобы не держать очередь апдейтов владельца
+        task = asyncio.create_task(_send_profile(message, mode, seconds))
+    except BaseException:
+        profile_lock.release()
+        raise
+    # Цикл событий держит на задачу только слабую ссылку — храним её до завершения
+    _background_tasks.add(task)
+    task.add_done_callback(_background_task_done)
+
+
+_background_tasks: set = set()
+
+
+def _background_task_done(task: asyncio.Task) -> None:
+    _background_tasks.discard(task)
+    if not task.cancelled() and task.exception():
+        logger.error(f"Профилирование завершилось с ошибкой: {task.exception()}")
+
+
+async def _send_profile(message: Message, mode: str, seconds: int):
+    """Выполняется под profile_lock, взятым в owner_profile"""
+    try:
+        reports = await run_profile(mode, seconds)
+    except Exception as e:
+        await message.answer(f"Не удалось снять профиль: {e}")
+        return
+    finally:
+        profile_lock.release()
+
+    stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    names = {"cpu": f"cpu_{stamp}.collapsed.txt", "mem": f"mem_{stamp}.txt"}
+    for kind, report in reports.items():
+        await message.answer_document(
+            BufferedInputFile(report.encode("utf-8"), filename=names[kind]),
+            caption="CPU: collapsed stacks (flamegraph/speedscope)" if kind == "cpu" else "Память: топ выделений",
+        )
+
+
+# --- Правила автомодерации ---
+RULES_USAGE = (
+    "Использование: /rule_add <действие> <вид> [параметр]\n"
+    f"Действия: {', '.join(ACTIONS)}\n"
+    f"Виды: {', '.join(KINDS)}\n"
+    "Примеры:\n"
+    "/rule_add reject word казино\n"
+    "/rule_add hold link\n"
+    "/rule_add approve rating 4-5\n"
+    "/rule_add hold min_length 15"
+)
+
+
+@owner_router.message(Command("rules"))
+async def owner_rules(message: Message):
+    """/rules — список правил автомодерации со счётчиками срабатываний"""
+    if message.from_user.id != OWNER_ID:
+        await message.answer("🚫 У вас нет прав для этой команды.")
+        return
+
+    rules = db.get_moderation_rules()
+    if not rules:
+        await message.answer("Правил автомодерации нет.\n\n" + RULES_USAGE)
+        return
+
+    # Срабатывания, ещё не записанные в БД, тоже показываем
+    pending = automod.pending_hits()
+    lines = ["🛡️ Правила автомодерации:"]
+    for rule in rules:
+        pattern = f" {rule['pattern']}" if rule["pattern"] else ""
+        hits = rule["hits"] + pending.get(rule["id"], 0)
+        lines.append(f"#{rule['id']} {rule['action']} {rule['kind']}{pattern} — {hits}")
+    lines.append("\nУдалить: /rule_del <id>")
+    await message.answer("\n".join(lines))
+
+
+@owner_router.message(Command("rule_add"))
+async def owner_rule_add(message: Message, command: CommandObject):
+    if message.from_user.id != OWNER_ID:
+        await message.answer("🚫 У вас нет прав для этой команды.")
+        return
+
+    args = (command.args or "").split(maxsplit=2)
+    if len(args) < 2:
+        await message.answer(RULES_USAGE)
+        return
+    action, kind = args[0].lower(), args[1].lower()
+    pattern = args[2].strip() if len(args) > 2 and kind not in BUILTIN_KINDS else None
+    try:
+        validate_rule(kind, pattern, action)
+    except RuleError as e:
+        await message.answer(f"⚠️ {e}\n\n{RULES_USAGE}")
+        return
+
+    rule_id = db.add_moderation_rule(kind, pattern, action)
+    automod.invalidate()
+    await message.answer(f"✅ Правило #{rule_id} добавлено.")
+
+
+@owner_router.message(Command("rule_del"))
+async def owner_rule_del(message: Message, command: CommandObject):
+    if message.from_user.id != OWNER_ID:
+        await message.answer("🚫 У вас нет прав для этой команды.")
+        return
+
+    try:
+        rule_id = int((command.args or "").strip().lstrip("#"))
+    except ValueError:
+        await message.answer("Использование: /rule_del <id>")
+        return
+
+    if db.delete_moderation_rule(rule_id):
+        automod.invalidate()
+        await message.answer(f"✅ Правило #{rule_id} удалено.")
+    else:
+        await message.answer(f"Правило #{rule_id} не найдено.")
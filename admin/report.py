@@ -1,7 +1,6 @@
 # admin/report.py
 from datetime import datetime
 from io import BytesIO
-from openpyxl import Workbook
 from db_manager.db import Database
 
 def generate_report(db: Database):
@@ -10,6 +9,9 @@ def generate_report(db: Database):
     (BytesIO объект с файлом, имя файла, текстовое резюме)
     Без столбца user_id
     """
+    # openpyxl тяжёлый и нужен только здесь — не грузим его при старте бота
+    from openpyxl import Workbook
+
     feedbacks = db.get_all_feedbacks()  # [(id, user_id, description, status), ...]
     users = db.get_all_users()
 
@@ -55,4 +57,49 @@ def generate_report(db: Database):
     ]
     summary = "\n".join(summary_lines)
 
-    return bio, filename, summary
\ No newline at end of file
+    return bio, filename, summary
+
+REVIEW_EXPORT_COLUMNS = [
+    "id", "status", "rating", "text", "user_id", "username", "full_name", "photo_file_id",
+    "created_at", "admin_reply", "admin_username", "admin_reply_at", "archived_at", "archive_reason",
+]
+
+
+def generate_reviews_report(db: Database):
+    """
+    Генерирует XLSX со всеми отзывами, включая архивные, и возвращает:
+    (BytesIO объект с файлом, имя файла, текстовое резюме)
+    """
+    from openpyxl import Workbook
+
+    # write_only не держит весь лист в памяти — архив может быть большим
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("reviews")
+    ws.append(REVIEW_EXPORT_COLUMNS)
+
+    counts = {"published": 0, "pending": 0, "archived": 0}
+    for review in db.iter_all_reviews(include_archived=True):
+        if review.get("archived"):
+            status = "archived"
+        else:
+            status = "published" if review.get("is_approved") else "pending"
+        counts[status] += 1
+        row = dict(review, status=status)
+        ws.append([
+            str(row[column]) if column.endswith("_at") and row.get(column) is not None else row.get(column)
+            for column in REVIEW_EXPORT_COLUMNS
+        ])
+
+    bio = BytesIO()
+    wb.save(bio)
+    bio.seek(0)
+
+    now_str = datetime.now().strftime("%Y%m%d_%H%M%S")
+    filename = f"reviews_{now_str}.xlsx"
+    summary = "\n".join([
+        f"Отзывы: {now_str}",
+        f"Опубликовано: {counts['published']}",
+        f"На модерации: {counts['pending']}",
+        f"В архиве: {counts['archived']}",
+    ])
+    return bio, filename, summary
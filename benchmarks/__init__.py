@@ -0,0 +1,7 @@
+"""
+Бенчмарки слоя БД.
+
+    python -m benchmarks.db_bench --reviews 100000            # SQLite во временном файле
+    python -m benchmarks.db_bench --backend postgres --pg-url postgresql://... --reset
+    python -m benchmarks.compare benchmarks/results/a.json benchmarks/results/b.json
+"""
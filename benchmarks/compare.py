@@ -0,0 +1,53 @@
+"""
+Сравнение двух результатов benchmarks.db_bench.
+
+    python -m benchmarks.compare old.json new.json [--metric median_ms] [--threshold 10]
+
+Отмечает регрессии, где метрика выросла больше чем на threshold процентов.
+"""
+import argparse
+import json
+import sys
+
+
+def _load(path: str) -> dict:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Сравнение результатов бенчмарка")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--metric", default="median_ms", choices=("min_ms", "median_ms", "p95_ms", "mean_ms"))
+    parser.add_argument("--threshold", type=float, default=10.0, help="порог регрессии, %%")
+    args = parser.parse_args()
+
+    old, new = _load(args.baseline), _load(args.candidate)
+    for label, report in (("baseline", old), ("candidate", new)):
+        meta = report["meta"]
+        print(f"{label}: {meta['git_revision']} {meta['backend']} reviews={meta['dataset']['reviews']} {meta['timestamp']}")
+    if old["meta"]["dataset"] != new["meta"]["dataset"] or old["meta"]["backend"] != new["meta"]["backend"]:
+        print("warning: datasets or backends differ, numbers are not directly comparable")
+    print()
+
+    names = [name for name in new["results"] if name in old["results"]]
+    width = max((len(name) for name in names), default=10)
+    regressions = 0
+    for name in names:
+        before = old["results"][name][args.metric]
+        after = new["results"][name][args.metric]
+        delta = (after - before) / before * 100 if before else 0.0
+        mark = ""
+        if delta > args.threshold:
+            mark = "  REGRESSION"
+            regressions += 1
+        elif delta < -args.threshold:
+            mark = "  faster"
+        print(f"{name:<{width}}  {before:>10.3f} -> {after:>10.3f} ms  {delta:+7.1f}%{mark}")
+
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Детерминированный генератор синтетических users и reviews.
+
+Один и тот же seed и объёмы дают одни и те же строки на любой машине, поэтому
+результаты разных прогонов сравнимы. Строки пишутся пачками через
+Database._execute_many, память не зависит от объёма (до 10M строк).
+"""
+import random
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Iterator, List, Tuple
+
+from db_manager.db import Database
+
+WORDS = (
+    "отличный сервис быстро качественно мастер машина ремонт замена масла диагностика "
+    "рекомендую вежливый персонал цена дорого дешево долго ждал запчасти подвеска тормоза "
+    "двигатель кондиционер шиномонтаж развал схождение гарантия снова приеду спасибо "
+    "всё понравилось не понравилось аккуратно чисто кофе зона ожидания запись онлайн"
+).split()
+
+PHOTO_FILE_ID = "AgACAgIAAxkBAAI{:010d}AAHfBench"
+
+
+@dataclass
+class DatasetSpec:
+    users: int = 1000
+    reviews: int = 10000
+    photo_ratio: float = 0.2  # Доля отзывов с фото
+    approved_ratio: float = 0.7  # Доля одобренных
+    replied_ratio: float = 0.1  # Доля отзывов с ответом администрации
+    text_median: int = 180  # Медианная длина текста отзыва, символов
+    days: int = 730  # На сколько дней назад растянуты даты
+    seed: int = 42
+    chunk_size: int = 20000
+
+
+def _text(rng: random.Random, median: int) -> str:
+    # Логнормальное распределение: много коротких отзывов и редкие «простыни»
+    length = int(min(max(rng.lognormvariate(0, 0.8) * median, 5), 3500))
+    words: List[str] = []
+    size = 0
+    while size < length:
+        word = rng.choice(WORDS)
+        words.append(word)
+        size += len(word) + 1
+    text = " ".join(words)[:length]
+    return text[0].upper() + text[1:] + "."
+
+
+def iter_users(spec: DatasetSpec) -> Iterator[Tuple]:
+    rng = random.Random(spec.seed)
+    for user_id in range(1, spec.users + 1):
+        username = f"user{user_id}" if rng.random() < 0.8 else None
+        yield 100000 + user_id, username, f"Пользователь {user_id}"
+
+
+def iter_reviews(spec: DatasetSpec) -> Iterator[Tuple]:
+    rng = random.Random(spec.seed + 1)
+    start = datetime(2024, 1, 1)
+    step = timedelta(days=spec.days) / max(spec.reviews, 1)
+    for idx in range(spec.reviews):
+        user_id = 100000 + rng.randint(1, spec.users)
+        created_at = start + step * idx + timedelta(seconds=rng.randint(0, 59))
+        has_photo = rng.random() < spec.photo_ratio
+        approved = 1 if rng.random() < spec.approved_ratio else 0
+        replied = approved and rng.random() < spec.replied_ratio
+        yield (
+            user_id,
+            f"user{user_id - 100000}",
+            f"Пользователь {user_id - 100000}",
+            rng.choices((1, 2, 3, 4, 5), weights=(5, 5, 10, 30, 50))[0],
+            _text(rng, spec.text_median),
+            PHOTO_FILE_ID.format(idx) if has_photo else None,
+            created_at.strftime("%Y-%m-%d %H:%M:%S"),
+            approved,
+            _text(rng, 80) if replied else None,
+        )
+
+
+def _chunks(rows: Iterator[Tuple], size: int) -> Iterator[List[Tuple]]:
+    chunk: List[Tuple] = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def clear(db: Database) -> None:
+    with db.connection:
+        db._execute("DELETE FROM reviews")
+        db._execute("DELETE FROM users")
+
+
+USERS_COLUMNS = "user_id, username, full_name"
+REVIEWS_COLUMNS = "user_id, username, full_name, rating, text, photo_file_id, created_at, is_approved, admin_reply"
+
+
+def _insert(db: Database, table: str, columns: str, rows: List[Tuple]) -> None:
+    with db.connection:
+        if db.use_postgres:
+            # executemany в psycopg2 шлёт строки по одной, для миллионов строк это часы
+            from psycopg2.extras import execute_values
+            execute_values(db.connection.cursor(), f"INSERT INTO {table} ({columns}) VALUES %s", rows, page_size=1000)
+        else:
+            placeholders = ", ".join("?" * len(rows[0]))
+            db._execute_many(f"INSERT INTO {table} ({columns}) VALUES ({placeholders})", rows)
+
+
+def fill(db: Database, spec: DatasetSpec, progress=None) -> None:
+    """Заполняет users и reviews по спецификации (таблицы должны быть пустыми)"""
+    for chunk in _chunks(iter_users(spec), spec.chunk_size):
+        _insert(db, "users", USERS_COLUMNS, chunk)
+
+    done = 0
+    for chunk in _chunks(iter_reviews(spec), spec.chunk_size):
+        _insert(db, "reviews", REVIEWS_COLUMNS, chunk)
+        done += len(chunk)
+        if progress:
+            progress(done, spec.reviews)
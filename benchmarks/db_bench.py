@@ -0,0 +1,202 @@
+"""
+Бенчмарк методов Database на синтетических данных.
+
+Заполняет users/reviews генератором из benchmarks.dataset, затем замеряет:
+- get_reviews_page на первых и глубоких страницах (OFFSET);
+- count_reviews (одобренные и все);
+- get_pending_reviews;
+- create_review — пропускная способность одиночных вставок;
+- upsert_user — пачка обновлений существующих и новых пользователей.
+
+Результат пишется в JSON (benchmarks/results/), сравнение — benchmarks.compare.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Callable, Dict, List
+
+from config import config
+from db_manager.db import Database
+
+from benchmarks.dataset import DatasetSpec, clear, fill
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+PER_PAGE = 5  # Как в листании отзывов в боте
+
+
+def _summary(samples: List[float]) -> Dict[str, float]:
+    ordered = sorted(samples)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    return {
+        "min_ms": round(ordered[0] * 1000, 3),
+        "median_ms": round(statistics.median(ordered) * 1000, 3),
+        "p95_ms": round(p95 * 1000, 3),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 3),
+        "runs": len(ordered),
+    }
+
+
+def _timeit(func: Callable[[], object], repeat: int) -> Dict[str, float]:
+    func()  # Прогрев: кэш страниц и планов
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - started)
+    return _summary(samples)
+
+
+def _throughput(func: Callable[[int], object], count: int) -> Dict[str, float]:
+    samples = []
+    started = time.perf_counter()
+    for i in range(count):
+        op_started = time.perf_counter()
+        func(i)
+        samples.append(time.perf_counter() - op_started)
+    elapsed = time.perf_counter() - started
+    result = _summary(samples)
+    result["ops_per_sec"] = round(count / elapsed, 1) if elapsed else 0.0
+    return result
+
+
+def run(db: Database, spec: DatasetSpec, repeat: int, writes: int) -> Dict[str, Dict[str, float]]:
+    results: Dict[str, Dict[str, float]] = {}
+
+    approved_pages = max(db.count_reviews(approved_only=True) // PER_PAGE, 1)
+    all_pages = max(db.count_reviews(approved_only=False) // PER_PAGE, 1)
+    for name, page in (("first", 1), ("page_10", 10), ("middle", approved_pages // 2), ("last", approved_pages)):
+        page = max(page, 1)
+        results[f"get_reviews_page.approved.{name}"] = _timeit(
+            lambda: db.get_reviews_page(page, PER_PAGE, approved_only=True), repeat
+        )
+    for name, page in (("first", 1), ("last", all_pages)):
+        results[f"get_reviews_page.all.{name}"] = _timeit(
+            lambda: db.get_reviews_page(page, PER_PAGE, approved_only=False), repeat
+        )
+
+    results["count_reviews.approved"] = _timeit(lambda: db.count_reviews(approved_only=True), repeat)
+    results["count_reviews.all"] = _timeit(lambda: db.count_reviews(approved_only=False), repeat)
+    results["get_pending_reviews"] = _timeit(db.get_pending_reviews, max(repeat // 5, 3))
+
+    results["create_review"] = _throughput(
+        lambda i: db.create_review(100001 + i % spec.users, f"user{i}", f"Bench {i}", 5, "Бенчмарк " * 20), writes
+    )
+    # Половина — существующие пользователи (UPDATE), половина — новые (INSERT)
+    new_base = 100001 + spec.users
+    results["upsert_user"] = _throughput(
+        lambda i: db.upsert_user(100001 + i % spec.users if i % 2 else new_base + i, f"u{i}", f"Burst {i}"), writes
+    )
+    return results
+
+
+def _git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+def _open_database(args) -> Database:
+    if args.backend == "postgres":
+        url = args.pg_url or config.database.url
+        if not url:
+            sys.exit("Для PostgreSQL укажите --pg-url или DATABASE_URL")
+        db = Database(database_url=url)
+    else:
+        # DATABASE_URL из окружения имеет приоритет в Database, поэтому отключаем его явно
+        config.database.url = None
+        path = args.db_path or os.path.join(tempfile.mkdtemp(prefix="reviews-bench-"), "bench.db")
+        db = Database(path_to_database=path)
+    if db.use_postgres != (args.backend == "postgres"):
+        sys.exit(f"Не удалось открыть {args.backend}: проверьте, установлен ли psycopg2")
+    return db
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Бенчмарк слоя БД на синтетических данных")
+    parser.add_argument("--backend", choices=("sqlite", "postgres"), default="sqlite")
+    parser.add_argument("--pg-url", help="строка подключения PostgreSQL (по умолчанию DATABASE_URL)")
+    parser.add_argument("--db-path", help="файл SQLite (по умолчанию временный)")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--reviews", type=int, default=10000)
+    parser.add_argument("--photo-ratio", type=float, default=0.2)
+    parser.add_argument("--approved-ratio", type=float, default=0.7)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=50, help="повторов для каждого чтения")
+    parser.add_argument("--writes", type=int, default=1000, help="операций в тестах записи")
+    parser.add_argument("--reset", action="store_true", help="очистить непустые таблицы перед заполнением")
+    parser.add_argument("--out", help="файл результата (по умолчанию benchmarks/results/...)")
+    args = parser.parse_args()
+
+    # Сами замеры не должны запускать EXPLAIN журнала медленных запросов
+    config.database.slow_query_ms = float("inf")
+
+    spec = DatasetSpec(
+        users=args.users,
+        reviews=args.reviews,
+        photo_ratio=args.photo_ratio,
+        approved_ratio=args.approved_ratio,
+        seed=args.seed,
+    )
+    db = _open_database(args)
+
+    existing = db.count_reviews(approved_only=False)
+    if existing:
+        if not args.reset:
+            sys.exit(f"В reviews уже {existing} строк; запустите с --reset, чтобы очистить таблицы")
+        clear(db)
+
+    started = time.perf_counter()
+    fill(db, spec, progress=lambda done, total: print(f"\rfill: {done}/{total}", end="", file=sys.stderr))
+    fill_seconds = time.perf_counter() - started
+    print(f"\nfill: {fill_seconds:.1f}s", file=sys.stderr)
+
+    if db.use_postgres:
+        with db.connection:
+            db._execute("ANALYZE users")
+            db._execute("ANALYZE reviews")
+    else:
+        db._execute("ANALYZE")
+
+    results = run(db, spec, args.repeat, args.writes)
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "git_revision": _git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "backend": args.backend,
+            "dataset": spec.__dict__,
+            "fill_seconds": round(fill_seconds, 2),
+            "repeat": args.repeat,
+            "writes": args.writes,
+        },
+        "results": results,
+    }
+
+    out = args.out
+    if not out:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        out = os.path.join(RESULTS_DIR, f"{stamp}_{args.backend}_{args.reviews}.json")
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    width = max(len(name) for name in results)
+    for name, stats in results.items():
+        extra = f"  {stats['ops_per_sec']:>9} ops/s" if "ops_per_sec" in stats else ""
+        print(f"{name:<{width}}  median {stats['median_ms']:>9.3f} ms  p95 {stats['p95_ms']:>9.3f} ms{extra}")
+    print(f"\nSaved to {out}")
+
+
+if __name__ == "__main__":
+    main()
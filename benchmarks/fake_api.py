@@ -0,0 +1,229 @@
+"""
+Локальная подмена Telegram Bot API для нагрузочных тестов.
+
+Принимает запросы вида POST /bot<token>/<method>, отвечает правдоподобными
+объектами (Message, User, True) и умеет имитировать сеть: задержку с
+разбросом и долю ответов 429 с retry_after.
+
+    python -m benchmarks.fake_api --port 8081 --latency-ms 40 --rate-limit-ratio 0.01
+
+Бот направляется сюда через TELEGRAM_API_URL=http://127.0.0.1:8081.
+
+getFile и скачивание файлов тоже работают: вместо фото отдаётся картинка
+PGM, одна из FAKE_IMAGE_VARIANTS по file_id с небольшим шумом — похоже на
+стоковые фото, которые прикладывают к разным отзывам.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import zlib
+from collections import Counter
+from typing import Any, Dict, Optional
+
+from aiohttp import web
+
+# Методы, которые возвращают отправленное/изменённое сообщение
+MESSAGE_METHODS = {
+    "sendmessage", "sendphoto", "sendvideo", "senddocument", "sendanimation", "sendaudio",
+    "sendvoice", "sendsticker", "sendpoll", "sendlocation", "sendcontact", "forwardmessage",
+    "editmessagetext", "editmessagecaption", "editmessagemedia", "editmessagereplymarkup",
+}
+MEDIA_FIELDS = {
+    "sendphoto": "photo",
+    "sendvideo": "video",
+    "senddocument": "document",
+    "sendanimation": "animation",
+}
+
+FAKE_IMAGE_VARIANTS = 8
+FAKE_IMAGE_SIZE = (64, 48)
+
+
+def fake_image(file_id: str) -> bytes:
+    """Серая картинка PGM из крупных блоков: вариант по file_id, шум — по самому file_id"""
+    variant = random.Random(zlib.crc32(file_id.encode()) % FAKE_IMAGE_VARIANTS)
+    blocks = [[variant.randrange(256) for _ in range(8)] for _ in range(6)]
+    noise = random.Random(file_id)
+    width, height = FAKE_IMAGE_SIZE
+    pixels = bytes(
+        max(0, min(255, blocks[y * 6 // height][x * 8 // width] + noise.randint(-3, 3)))
+        for y in range(height) for x in range(width)
+    )
+    return f"P5 {width} {height} 255\n".encode() + pixels
+
+
+class FakeBotApi:
+    def __init__(
+        self,
+        latency_ms: float = 30.0,
+        jitter_ms: float = 20.0,
+        rate_limit_ratio: float = 0.0,
+        retry_after: int = 1,
+        seed: Optional[int] = None,
+    ) -> None:
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.rate_limit_ratio = rate_limit_ratio
+        self.retry_after = retry_after
+        self._rng = random.Random(seed)
+        self._message_id = 0
+        self._runner: Optional[web.AppRunner] = None
+
+        self.calls: Counter = Counter()
+        self.rate_limited: Counter = Counter()
+
+    async def _read_params(self, request: web.Request) -> Dict[str, Any]:
+        if request.content_type == "application/json":
+            return await request.json()
+        # aiogram шлёт multipart/form-data, сложные поля в нём сериализованы в JSON
+        form = await request.post()
+        return {key: value for key, value in form.items() if isinstance(value, str)}
+
+    def _delay(self) -> float:
+        delay = self.latency
+        if self.jitter:
+            delay += self._rng.expovariate(1 / self.jitter)
+        return delay
+
+    def _message(self, method: str, params: Dict[str, Any], bot_id: int) -> Dict[str, Any]:
+        self._message_id += 1
+        chat_id = int(params.get("chat_id") or 0)
+        message = {
+            "message_id": int(params.get("message_id") or self._message_id),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private" if chat_id > 0 else "supergroup", "title": "Load test"},
+            "from": {"id": bot_id, "is_bot": True, "first_name": "LoadTest"},
+        }
+        if "text" in params:
+            message["text"] = params["text"]
+        if "caption" in params:
+            message["caption"] = params["caption"]
+        media = MEDIA_FIELDS.get(method)
+        if media == "photo":
+            message["photo"] = [{
+                "file_id": f"fake-photo-{self._message_id}",
+                "file_unique_id": f"fp{self._message_id}",
+                "width": 1280,
+                "height": 960,
+            }]
+        elif media:
+            message[media] = {"file_id": f"fake-{media}-{self._message_id}", "file_unique_id": f"f{self._message_id}"}
+        if "reply_markup" in params:
+            markup = params["reply_markup"]
+            message["reply_markup"] = json.loads(markup) if isinstance(markup, str) else markup
+        return message
+
+    def _result(self, method: str, params: Dict[str, Any], bot_id: int) -> Any:
+        if method == "getme":
+            return {"id": bot_id, "is_bot": True, "first_name": "LoadTest", "username": "loadtest_bot"}
+        if method == "getupdates":
+            return []
+        if method == "getfile":
+            file_id = params.get("file_id", "")
+            return {
+                "file_id": file_id,
+                "file_unique_id": f"u{zlib.crc32(file_id.encode())}",
+                "file_size": len(fake_image(file_id)),
+                "file_path": f"photos/{file_id}.pgm",
+            }
+        if method == "copymessage":
+            self._message_id += 1
+            return {"message_id": self._message_id}
+        if method == "sendmediagroup":
+            media = params.get("media")
+            count = len(json.loads(media)) if isinstance(media, str) else len(media or [])
+            return [self._message("sendphoto", params, bot_id) for _ in range(max(count, 1))]
+        if method in MESSAGE_METHODS:
+            if method.startswith("edit") and params.get("inline_message_id"):
+                return True
+            return self._message(method, params, bot_id)
+        return True
+
+    async def handle(self, request: web.Request) -> web.Response:
+        token = request.match_info["token"]
+        method = request.match_info["method"].lower()
+        params = await self._read_params(request)
+        self.calls[method] += 1
+
+        await asyncio.sleep(self._delay())
+
+        if self.rate_limit_ratio and method != "getme" and self._rng.random() < self.rate_limit_ratio:
+            self.rate_limited[method] += 1
+            return web.json_response(
+                {
+                    "ok": False,
+                    "error_code": 429,
+                    "description": f"Too Many Requests: retry after {self.retry_after}",
+                    "parameters": {"retry_after": self.retry_after},
+                },
+                status=429,
+            )
+
+        bot_id = int(token.split(":", 1)[0])
+        return web.json_response({"ok": True, "result": self._result(method, params, bot_id)})
+
+    async def handle_file(self, request: web.Request) -> web.Response:
+        self.calls["file"] += 1
+        await asyncio.sleep(self._delay())
+        file_id = request.match_info["path"].rsplit("/", 1)[-1].rsplit(".", 1)[0]
+        return web.Response(body=fake_image(file_id), content_type="image/x-portable-graymap")
+
+    def create_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/bot{token}/{method}", self.handle)
+        app.router.add_get("/file/bot{token}/{path:.+}", self.handle_file)
+        return app
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8081) -> str:
+        self._runner = web.AppRunner(self.create_app(), access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        # При port=0 порт выбирает ОС
+        port = self._runner.addresses[0][1]
+        return f"http://{host}:{port}"
+
+    async def stop(self) -> None:
+        if self._runner:
+            await self._runner.cleanup()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "calls": dict(self.calls),
+            "calls_total": sum(self.calls.values()),
+            "rate_limited": dict(self.rate_limited),
+            "rate_limited_total": sum(self.rate_limited.values()),
+        }
+
+
+async def _serve(args) -> None:
+    api = FakeBotApi(args.latency_ms, args.jitter_ms, args.rate_limit_ratio, args.retry_after, args.seed)
+    url = await api.start(args.host, args.port)
+    print(f"Fake Bot API listening on {url}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await api.stop()
+        print(json.dumps(api.stats(), indent=2))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Фейковый Telegram Bot API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency-ms", type=float, default=30.0)
+    parser.add_argument("--jitter-ms", type=float, default=20.0)
+    parser.add_argument("--rate-limit-ratio", type=float, default=0.0, help="доля ответов 429")
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+    try:
+        asyncio.run(_serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
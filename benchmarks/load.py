@@ -0,0 +1,379 @@
+"""
+Сквозной нагрузочный тест: апдейты идут через настоящий Dispatcher со всеми
+middleware и роутерами, а Bot API подменён benchmarks.fake_api.
+
+Сессии пользователей (сценарии) стартуют с пуассоновскими интервалами так,
+чтобы в среднем получалось --rate апдейтов в секунду; шаги внутри сессии идут
+последовательно с паузой --think-ms, как у живого человека.
+
+    python -m benchmarks.load --rate 200 --duration 30 --latency-ms 40 --rate-limit-ratio 0.01
+    python -m benchmarks.load --mix start=2,review=3,browse=4,moderate=1 --no-limits
+
+Без --db-path используется временная SQLite; --database-url — PostgreSQL.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Кодек кнопок не читает config, поэтому его можно импортировать до настройки окружения
+from utils.callbacks import (
+    MODERATION_APPROVE,
+    MODERATION_QUEUE,
+    REVIEW_NEW,
+    REVIEW_RATING,
+    REVIEW_SKIP_MEDIA,
+    REVIEWS_USER,
+)
+
+FAKE_TOKEN = "123456789:LOADTEST-fake-token"
+USER_ID_BASE = 5_000_000
+MODERATOR_IDS = list(range(900_001, 900_011))
+
+
+def _prepare_environment(args) -> None:
+    """Окружение должно быть готово до импорта config: модули роутеров сразу открывают БД"""
+    os.environ["BOT_TOKEN"] = FAKE_TOKEN
+    os.environ.setdefault("OWNER_ID", "1")
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    else:
+        os.environ.pop("DATABASE_URL", None)
+        os.environ["DATABASE_PATH"] = args.db_path or os.path.join(tempfile.mkdtemp(prefix="reviews-load-"), "load.db")
+    # Нагрузочный прогон не должен засорять рабочие логи и открывать порт метрик
+    os.environ["METRICS_ENABLED"] = "false"
+    os.environ.setdefault("SLOW_QUERY_MS", "1000")
+
+
+def _percentiles(samples: List[float]) -> Dict[str, float]:
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def pick(q: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(len(ordered) * q))] * 1000, 2)
+
+    return {
+        "count": len(ordered),
+        "p50_ms": pick(0.50),
+        "p95_ms": pick(0.95),
+        "p99_ms": pick(0.99),
+        "max_ms": round(ordered[-1] * 1000, 2),
+    }
+
+
+class UpdateFactory:
+    """Собирает апдейты Telegram в виде словарей, как их прислал бы сервер"""
+
+    def __init__(self, bot_id: int) -> None:
+        self.bot_id = bot_id
+        self._update_id = itertools.count(1)
+        self._message_id = itertools.count(1)
+
+    @staticmethod
+    def _user(user_id: int) -> Dict[str, Any]:
+        return {"id": user_id, "is_bot": False, "first_name": f"Load{user_id}", "username": f"load{user_id}"}
+
+    def _chat_message(self, user_id: int, **fields) -> Dict[str, Any]:
+        return {
+            "message_id": next(self._message_id),
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": self._user(user_id),
+            **fields,
+        }
+
+    def message(self, user_id: int, text: str) -> Dict[str, Any]:
+        return {"update_id": next(self._update_id), "message": self._chat_message(user_id, text=text)}
+
+    def photo(self, user_id: int) -> Dict[str, Any]:
+        n = next(self._message_id)
+        photo = [{"file_id": f"load-photo-{n}", "file_unique_id": f"lp{n}", "width": 1280, "height": 960}]
+        return {"update_id": next(self._update_id), "message": self._chat_message(user_id, photo=photo)}
+
+    def callback(self, user_id: int, data: str, message_id: int) -> Dict[str, Any]:
+        return {
+            "update_id": next(self._update_id),
+            "callback_query": {
+                "id": str(next(self._update_id)),
+                "from": self._user(user_id),
+                "chat_instance": str(user_id),
+                "data": data,
+                "message": {
+                    "message_id": message_id,
+                    "date": int(time.time()),
+                    "chat": {"id": user_id, "type": "private"},
+                    "from": {"id": self.bot_id, "is_bot": True, "first_name": "LoadTest"},
+                    "text": "...",
+                },
+            },
+        }
+
+
+Step = Tuple[str, Callable[[], Dict[str, Any]]]
+
+
+class Scenarios:
+    """Сценарии сессий: список шагов (имя, фабрика апдейта)"""
+
+    def __init__(self, factory: UpdateFactory, db, rng: random.Random, photo_ratio: float) -> None:
+        self.f = factory
+        self.db = db
+        self.rng = rng
+        self.photo_ratio = photo_ratio
+
+    def start(self, user_id: int) -> List[Step]:
+        return [("message:/start", lambda: self.f.message(user_id, "/start"))]
+
+    def review(self, user_id: int) -> List[Step]:
+        menu = next(self.f._message_id)
+        rating = self.rng.randint(1, 5)
+        text = "Нагрузочный отзыв " + " ".join("текст" for _ in range(self.rng.randint(3, 60)))
+        if self.rng.random() < self.photo_ratio:
+            last: Step = ("message:photo", lambda: self.f.photo(user_id))
+        else:
+            last = ("callback:review:skip_media", lambda: self.f.callback(user_id, REVIEW_SKIP_MEDIA.pack(), menu))
+        return [
+            ("message:/start", lambda: self.f.message(user_id, "/start")),
+            ("callback:review:new", lambda: self.f.callback(user_id, REVIEW_NEW.pack(), menu)),
+            ("callback:review:rating", lambda: self.f.callback(user_id, REVIEW_RATING.pack(rating=rating), menu)),
+            ("message:review_text", lambda: self.f.message(user_id, text)),
+            last,
+        ]
+
+    def browse(self, user_id: int) -> List[Step]:
+        menu = next(self.f._message_id)
+        pages = self.rng.randint(1, 5)
+        return [("message:/start", lambda: self.f.message(user_id, "/start"))] + [
+            ("callback:reviews:user", lambda page=page: self.f.callback(user_id, REVIEWS_USER.pack(page=page), menu))
+            for page in range(1, pages + 1)
+        ]
+
+    def moderate(self, user_id: int) -> List[Step]:
+        moderator = self.rng.choice(MODERATOR_IDS)
+        menu = next(self.f._message_id)
+
+        def approve() -> Dict[str, Any]:
+            # Id берём в момент шага: к этому времени очередь могли разобрать другие модераторы
+            cursor = self.db._execute("SELECT id FROM reviews WHERE is_approved = 0 ORDER BY id LIMIT 1")
+            # _fetchone: в PostgreSQL строки приходят словарями, индекс [0] там не работает
+            row = self.db._fetchone(cursor)
+            review_id = row["id"] if row else 0
+            return self.f.callback(moderator, MODERATION_APPROVE.pack(review_id=review_id), menu)
+
+        return [
+            ("callback:admin:moderation", lambda: self.f.callback(moderator, MODERATION_QUEUE.pack(), menu)),
+            ("callback:moderation:approve", approve),
+        ]
+
+
+class LoadDriver:
+    def __init__(self, dp, bot, scenarios: Scenarios, mix: Dict[str, float], think: float, seed: int) -> None:
+        self.dp = dp
+        self.bot = bot
+        self.scenarios = scenarios
+        self.names = list(mix)
+        self.weights = [mix[name] for name in self.names]
+        self.think = think
+        self.rng = random.Random(seed)
+        self._user_ids = itertools.count(USER_ID_BASE)
+
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.sessions_started = 0
+        self.sessions_done = 0
+
+    def avg_steps(self) -> float:
+        # Оценка по выборке: длина части сценариев случайна
+        probe = random.Random(0)
+        total = 0
+        for _ in range(200):
+            name = probe.choices(self.names, self.weights)[0]
+            total += len(getattr(self.scenarios, name)(0))
+        return total / 200
+
+    async def _feed(self, step: str, payload: Dict[str, Any]) -> None:
+        from aiogram.types import Update
+
+        update = Update.model_validate(payload, context={"bot": self.bot})
+        started = time.perf_counter()
+        try:
+            await self.dp.feed_update(self.bot, update)
+        except Exception as e:
+            self.errors[f"{step} {type(e).__name__}"] += 1
+        finally:
+            self.latencies[step].append(time.perf_counter() - started)
+
+    async def _session(self, name: str) -> None:
+        steps = getattr(self.scenarios, name)(next(self._user_ids))
+        for idx, (step, build) in enumerate(steps):
+            if idx and self.think:
+                await asyncio.sleep(self.rng.expovariate(1 / self.think))
+            await self._feed(step, build())
+        self.sessions_done += 1
+
+    async def run(self, rate: float, duration: float, drain_timeout: float) -> float:
+        session_rate = rate / self.avg_steps()
+        tasks = set()
+        started = time.perf_counter()
+        deadline = started + duration
+        next_at = started
+        while True:
+            next_at += self.rng.expovariate(session_rate)
+            if next_at >= deadline:
+                break
+            delay = next_at - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            name = self.rng.choices(self.names, self.weights)[0]
+            task = asyncio.create_task(self._session(name))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+            self.sessions_started += 1
+        if tasks:
+            await asyncio.wait(list(tasks), timeout=drain_timeout)
+        return time.perf_counter() - started
+
+
+def _parse_mix(value: str) -> Dict[str, float]:
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ("start", "review", "browse", "moderate"):
+            raise argparse.ArgumentTypeError(f"unknown scenario: {name}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+async def _run(args) -> Dict[str, Any]:
+    from loguru import logger
+
+    logger.remove()
+    logger.add(sys.stderr, level="ERROR")
+
+    from benchmarks.dataset import DatasetSpec, fill
+    from benchmarks.fake_api import FakeBotApi
+    from config import config
+
+    fake_api: Optional[FakeBotApi] = None
+    if args.api_url:
+        config.api.server_url = args.api_url
+    else:
+        fake_api = FakeBotApi(args.latency_ms, args.jitter_ms, args.rate_limit_ratio, args.retry_after, args.seed)
+        config.api.server_url = await fake_api.start(port=0)
+    if args.no_limits:
+        config.api.global_rate = 1_000_000
+        config.api.private_chat_rate = 1_000_000
+        config.api.group_chat_rate = 1_000_000
+    config.bot.admin_ids = list(config.bot.admin_ids) + MODERATOR_IDS
+
+    # Импорт main открывает БД в модулях роутеров, поэтому после настройки config
+    from main import create_bot, create_dispatcher
+
+    bot = create_bot()
+    dp = create_dispatcher()
+    db = sys.modules["logic.feedback"].db
+    if args.seed_reviews and not db.count_reviews(approved_only=False):
+        fill(db, DatasetSpec(users=max(args.seed_reviews // 10, 1), reviews=args.seed_reviews, seed=args.seed))
+
+    scenarios = Scenarios(UpdateFactory(bot.id), db, random.Random(args.seed), args.photo_ratio)
+    driver = LoadDriver(dp, bot, scenarios, args.mix, args.think_ms / 1000, args.seed)
+
+    await dp.emit_startup(bot=bot)
+    try:
+        elapsed = await driver.run(args.rate, args.duration, args.drain_timeout)
+    finally:
+        await dp.emit_shutdown(bot=bot)
+        await dp.storage.close()
+        await bot.session.close()
+        if fake_api:
+            await fake_api.stop()
+
+    all_samples = [sample for samples in driver.latencies.values() for sample in samples]
+    from utils.api_governor import ApiGovernor
+
+    governor = next(m for m in bot.session.middleware if isinstance(m, ApiGovernor))
+    return {
+        "meta": {
+            "rate_target": args.rate,
+            "duration": args.duration,
+            "mix": args.mix,
+            "think_ms": args.think_ms,
+            "latency_ms": args.latency_ms,
+            "jitter_ms": args.jitter_ms,
+            "rate_limit_ratio": args.rate_limit_ratio,
+            "no_limits": args.no_limits,
+            "backend": "postgres" if db.use_postgres else "sqlite",
+        },
+        "summary": {
+            "elapsed_s": round(elapsed, 2),
+            "updates": len(all_samples),
+            "updates_per_sec": round(len(all_samples) / elapsed, 1) if elapsed else 0.0,
+            "sessions_started": driver.sessions_started,
+            "sessions_done": driver.sessions_done,
+            "errors": sum(driver.errors.values()),
+            "latency": _percentiles(all_samples),
+        },
+        "steps": {step: _percentiles(samples) for step, samples in sorted(driver.latencies.items())},
+        "errors": dict(driver.errors),
+        "scheduler": dp["update_scheduler"].stats(),
+        "antiflood_blocked": dp["antiflood"].blocked_total,
+        "governor": governor.stats(),
+        "fake_api": fake_api.stats() if fake_api else {},
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Сквозной нагрузочный тест бота на фейковом Bot API")
+    parser.add_argument("--rate", type=float, default=50.0, help="целевых апдейтов в секунду")
+    parser.add_argument("--duration", type=float, default=20.0, help="сколько секунд запускать новые сессии")
+    parser.add_argument("--mix", type=_parse_mix, default=_parse_mix("start=2,review=3,browse=4,moderate=1"))
+    parser.add_argument("--think-ms", type=float, default=300.0, help="средняя пауза между шагами сессии")
+    parser.add_argument("--photo-ratio", type=float, default=0.3)
+    parser.add_argument("--seed-reviews", type=int, default=2000, help="отзывов в пустой БД перед стартом")
+    parser.add_argument("--api-url", help="внешний фейковый API вместо встроенного")
+    parser.add_argument("--latency-ms", type=float, default=30.0)
+    parser.add_argument("--jitter-ms", type=float, default=20.0)
+    parser.add_argument("--rate-limit-ratio", type=float, default=0.0, help="доля ответов 429")
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--no-limits", action="store_true", help="снять лимиты ApiGovernor")
+    parser.add_argument("--db-path", help="файл SQLite (по умолчанию временный)")
+    parser.add_argument("--database-url", help="PostgreSQL вместо SQLite")
+    parser.add_argument("--drain-timeout", type=float, default=60.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", help="сохранить отчёт в JSON")
+    args = parser.parse_args()
+
+    _prepare_environment(args)
+    report = asyncio.run(_run(args))
+
+    summary = report["summary"]
+    latency = summary["latency"]
+    print(
+        f"updates={summary['updates']} in {summary['elapsed_s']}s -> {summary['updates_per_sec']} upd/s, "
+        f"errors={summary['errors']}"
+    )
+    if latency.get("count"):
+        print(f"latency p50={latency['p50_ms']}ms p95={latency['p95_ms']}ms p99={latency['p99_ms']}ms max={latency['max_ms']}ms")
+    width = max((len(step) for step in report["steps"]), default=10)
+    for step, stats in report["steps"].items():
+        print(f"  {step:<{width}}  n={stats['count']:<6} p50={stats['p50_ms']:>8}  p95={stats['p95_ms']:>8}  p99={stats['p99_ms']:>8}")
+    if report["fake_api"]:
+        print(f"fake api: calls={report['fake_api']['calls_total']} 429={report['fake_api']['rate_limited_total']}")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"Saved to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,4 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from environs import Env
 
 
@@ -16,12 +16,133 @@ class DatabaseConfig:
     backup_dir: str = "backups"  # Директория для бэкапов SQLite
     backup_interval_hours: int = 24  # Интервал между бэкапами в часах
     backup_keep_count: int = 10  # Количество бэкапов для хранения
+    backup_pages_per_step: int = 1024  # Страниц за шаг онлайн-бэкапа (1024 × 4 КБ = 4 МБ)
+    backup_step_pause_ms: float = 50.0  # Пауза между шагами, чтобы не забивать диск
+    backup_chunk_kb: int = 64  # Размер куска в хранилище инкрементальных бэкапов
+    wal_archive_enabled: bool = False  # Непрерывный архив WAL для восстановления на момент времени
+    wal_archive_interval: float = 10.0  # Период копирования WAL в архив (точность восстановления), секунды
+    wal_checkpoint_pages: int = 1000  # После скольких заархивированных страниц делать checkpoint
+    slow_query_ms: float = 100.0  # Порог журнала медленных запросов, миллисекунды
+    review_archive_days: int = 0  # Переносить в архив одобренные отзывы старше N дней (0 — не переносить)
+    review_archive_batch: int = 500  # Отзывов за одну транзакцию архивации
+    maintenance_interval_hours: float = 24.0  # Период архивации, ANALYZE и VACUUM
+    vacuum_pages: int = 2000  # Максимум страниц, возвращаемых файлу SQLite за проход (0 — все)
+
+
+@dataclass
+class ApiConfig:
+    global_rate: float = 25.0  # Максимум отправок в секунду на весь бот
+    private_chat_rate: float = 1.0  # Отправок в секунду в один личный чат
+    group_chat_rate: float = 0.33  # Отправок в секунду в одну группу (~20 в минуту)
+    max_retries: int = 3  # Повторов после RetryAfter (429)
+    chat_burst: int = 3  # Сколько сообщений подряд уходит в один чат без ожидания
+    server_url: str | None = None  # Свой Bot API сервер (локальный или фейковый для тестов)
+
+
+@dataclass
+class FsmConfig:
+    cache_size: int = 10000  # Размер LRU-кэша состояний (0 — без кэша, для нескольких процессов)
+    state_ttl_hours: int = 72  # Через сколько часов заброшенное состояние удаляется
+    flush_interval: float = 0.5  # Период пакетной записи состояний в БД, секунды
+
+
+@dataclass
+class FeedbackConfig:
+    flush_interval: float = 1.0  # Период пакетной записи обратной связи в БД, секунды
+    dedup_window: float = 300.0  # Одинаковое сообщение пользователя в этом окне не сохраняется повторно, секунды
+    notify_interval: float = 30.0  # Как часто админы получают сводку новых сообщений, секунды
+
+
+@dataclass
+class SimilarityConfig:
+    threshold: float = 0.7  # Похожесть (оценка Жаккара), начиная с которой отзывы считаются повтором
+    spam_wave_users: int = 3  # Столько разных авторов с похожим текстом — спам-волна
+    spam_wave_hours: float = 24.0  # Окно, в котором ищутся участники волны
+    index_size: int = 20000  # Сколько последних отзывов держать в индексе
+
+
+@dataclass
+class AutomodConfig:
+    enabled: bool = True
+    default_action: str = "hold"  # Если не сработало ни одно правило: approve / hold / reject
+    reload_seconds: float = 30.0  # Как часто сверять правила с БД
+
+
+@dataclass
+class PhotoDedupConfig:
+    enabled: bool = False  # Нужен Pillow
+    workers: int = 1  # Процессов для хэширования и воркеров очереди
+    max_distance: int = 6  # Различие хэшей (бит из 64), при котором фото считаются одинаковыми
+    queue_size: int = 1000  # Фото в очереди, лишние пропускаются
+
+
+@dataclass
+class WebhookConfig:
+    enabled: bool = False  # True — webhook, False — long polling
+    url: str = ""  # Публичный адрес бота, например https://bot.example.com
+    path: str = "/webhook"
+    secret: str = ""  # Секрет для заголовка X-Telegram-Bot-Api-Secret-Token (обязателен для webhook)
+    host: str = "0.0.0.0"
+    port: int = 8080
+    register: bool = True  # Вызывать setWebhook при старте (в одном из процессов)
+    reuse_port: bool = False  # Несколько процессов на одном порту
+    queue_size: int = 1000  # Максимум принятых, но не обработанных апдейтов
+    workers: int = 16  # Одновременно обрабатываемых апдейтов
+    max_connections: int = 40  # Параллельных соединений со стороны Telegram
+    drain_timeout: float = 10.0  # Сколько ждать обработки очереди при остановке, секунды
+
+
+@dataclass
+class SchedulerConfig:
+    max_in_flight: int = 64  # Одновременно выполняемых хендлеров на процесс
+    max_pending_per_user: int = 5  # Апдейтов одного пользователя в очереди, лишние отбрасываются
+
+
+@dataclass
+class AntiFloodConfig:
+    user_capacity: float = 20  # Запас апдейтов пользователя на всплеск
+    user_rate: float = 2.0  # Восполнение в секунду
+
+
+@dataclass
+class LoggingConfig:
+    # Доля записей, которые пишутся в файл, по event_type
+    sample_rates: dict[str, float] = field(default_factory=lambda: {"callback_query": 0.2, "button_click": 0.2})
+    # Максимум записей в секунду по event_type
+    rate_caps: dict[str, int] = field(default_factory=lambda: {"callback_query": 20, "button_click": 20, "message_sent": 50})
+    queue_size: int = 10000  # Максимум записей в очереди на запись, лишние отбрасываются
+
+
+@dataclass
+class MetricsConfig:
+    enabled: bool = False
+    host: str = "127.0.0.1"  # Только локально; наружу — через прокси или агент Prometheus
+    port: int = 9100  # У каждого процесса бота свой порт: метрики считаются в памяти процесса
+
+
+@dataclass
+class LoopMonitorConfig:
+    enabled: bool = True
+    interval: float = 0.1  # Как часто проверять лаг цикла событий, секунды
+    block_threshold_ms: float = 100.0  # Лаг, после которого снимается стек блокирующего кода
 
 
 @dataclass
 class Config:
     bot: TgBot
     database: DatabaseConfig
+    api: ApiConfig
+    fsm: FsmConfig
+    feedback: FeedbackConfig
+    similarity: SimilarityConfig
+    automod: AutomodConfig
+    photo_dedup: PhotoDedupConfig
+    webhook: WebhookConfig
+    scheduler: SchedulerConfig
+    antiflood: AntiFloodConfig
+    logging: LoggingConfig
+    metrics: MetricsConfig
+    loop_monitor: LoopMonitorConfig
 
 
 # Инициализация Env
@@ -41,6 +162,89 @@ config = Config(
         path=env('DATABASE_PATH', default="database/database.db"),
         backup_dir=env('BACKUP_DIR', default="backups"),
         backup_interval_hours=env.int('BACKUP_INTERVAL_HOURS', default=24),
-        backup_keep_count=env.int('BACKUP_KEEP_COUNT', default=10)
+        backup_keep_count=env.int('BACKUP_KEEP_COUNT', default=10),
+        backup_pages_per_step=env.int('BACKUP_PAGES_PER_STEP', default=1024),
+        backup_step_pause_ms=env.float('BACKUP_STEP_PAUSE_MS', default=50.0),
+        backup_chunk_kb=env.int('BACKUP_CHUNK_KB', default=64),
+        wal_archive_enabled=env.bool('WAL_ARCHIVE_ENABLED', default=False),
+        wal_archive_interval=env.float('WAL_ARCHIVE_INTERVAL', default=10.0),
+        wal_checkpoint_pages=env.int('WAL_CHECKPOINT_PAGES', default=1000),
+        slow_query_ms=env.float('SLOW_QUERY_MS', default=100.0),
+        review_archive_days=env.int('REVIEW_ARCHIVE_DAYS', default=0),
+        review_archive_batch=env.int('REVIEW_ARCHIVE_BATCH', default=500),
+        maintenance_interval_hours=env.float('MAINTENANCE_INTERVAL_HOURS', default=24.0),
+        vacuum_pages=env.int('VACUUM_PAGES', default=2000)
+    ),
+    api=ApiConfig(
+        global_rate=env.float('API_GLOBAL_RATE', default=25.0),
+        private_chat_rate=env.float('API_PRIVATE_CHAT_RATE', default=1.0),
+        group_chat_rate=env.float('API_GROUP_CHAT_RATE', default=0.33),
+        max_retries=env.int('API_MAX_RETRIES', default=3),
+        chat_burst=env.int('API_CHAT_BURST', default=3),
+        server_url=env('TELEGRAM_API_URL', default=None)
+    ),
+    fsm=FsmConfig(
+        cache_size=env.int('FSM_CACHE_SIZE', default=10000),
+        state_ttl_hours=env.int('FSM_STATE_TTL_HOURS', default=72),
+        flush_interval=env.float('FSM_FLUSH_INTERVAL', default=0.5)
+    ),
+    feedback=FeedbackConfig(
+        flush_interval=env.float('FEEDBACK_FLUSH_INTERVAL', default=1.0),
+        dedup_window=env.float('FEEDBACK_DEDUP_SECONDS', default=300.0),
+        notify_interval=env.float('FEEDBACK_NOTIFY_INTERVAL', default=30.0)
+    ),
+    similarity=SimilarityConfig(
+        threshold=env.float('DUPLICATE_THRESHOLD', default=0.7),
+        spam_wave_users=env.int('SPAM_WAVE_USERS', default=3),
+        spam_wave_hours=env.float('SPAM_WAVE_HOURS', default=24.0),
+        index_size=env.int('DUPLICATE_INDEX_SIZE', default=20000)
+    ),
+    automod=AutomodConfig(
+        enabled=env.bool('AUTOMOD_ENABLED', default=True),
+        default_action=env('AUTOMOD_DEFAULT_ACTION', default="hold"),
+        reload_seconds=env.float('AUTOMOD_RELOAD_SECONDS', default=30.0)
+    ),
+    photo_dedup=PhotoDedupConfig(
+        enabled=env.bool('PHOTO_DEDUP_ENABLED', default=False),
+        workers=env.int('PHOTO_DEDUP_WORKERS', default=1),
+        max_distance=env.int('PHOTO_DEDUP_DISTANCE', default=6),
+        queue_size=env.int('PHOTO_DEDUP_QUEUE_SIZE', default=1000)
+    ),
+    webhook=WebhookConfig(
+        enabled=env.bool('WEBHOOK_ENABLED', default=False),
+        url=env('WEBHOOK_URL', default=""),
+        path=env('WEBHOOK_PATH', default="/webhook"),
+        secret=env('WEBHOOK_SECRET', default=""),
+        host=env('WEBHOOK_HOST', default="0.0.0.0"),
+        port=env.int('WEBHOOK_PORT', default=8080),
+        register=env.bool('WEBHOOK_REGISTER', default=True),
+        reuse_port=env.bool('WEBHOOK_REUSE_PORT', default=False),
+        queue_size=env.int('WEBHOOK_QUEUE_SIZE', default=1000),
+        workers=env.int('WEBHOOK_WORKERS', default=16),
+        max_connections=env.int('WEBHOOK_MAX_CONNECTIONS', default=40),
+        drain_timeout=env.float('WEBHOOK_DRAIN_TIMEOUT', default=10.0)
+    ),
+    scheduler=SchedulerConfig(
+        max_in_flight=env.int('MAX_IN_FLIGHT_UPDATES', default=64),
+        max_pending_per_user=env.int('MAX_PENDING_PER_USER', default=5)
+    ),
+    antiflood=AntiFloodConfig(
+        user_capacity=env.float('FLOOD_USER_CAPACITY', default=20),
+        user_rate=env.float('FLOOD_USER_RATE', default=2.0)
+    ),
+    logging=LoggingConfig(
+        sample_rates=env.dict('LOG_SAMPLE_RATES', subcast_values=float, default={"callback_query": 0.2, "button_click": 0.2}),
+        rate_caps=env.dict('LOG_RATE_CAPS', subcast_values=int, default={"callback_query": 20, "button_click": 20, "message_sent": 50}),
+        queue_size=env.int('LOG_QUEUE_SIZE', default=10000)
+    ),
+    metrics=MetricsConfig(
+        enabled=env.bool('METRICS_ENABLED', default=False),
+        host=env('METRICS_HOST', default="127.0.0.1"),
+        port=env.int('METRICS_PORT', default=9100)
+    ),
+    loop_monitor=LoopMonitorConfig(
+        enabled=env.bool('LOOP_MONITOR_ENABLED', default=True),
+        interval=env.float('LOOP_MONITOR_INTERVAL', default=0.1),
+        block_threshold_ms=env.float('LOOP_BLOCK_THRESHOLD_MS', default=100.0)
     ),
 )
\ No newline at end of file
@@ -1,17 +1,12 @@
 import os
 import sqlite3
-from typing import Any, Dict, List, Optional, Tuple
-
-# Попытка импортировать PostgreSQL драйвер
-try:
-    import psycopg2
-    from psycopg2.extras import RealDictCursor
-    POSTGRES_AVAILABLE = True
-except ImportError:
-    POSTGRES_AVAILABLE = False
-    psycopg2 = None
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
 from config import config
+from db_manager.query_profiler import slow_queries
+from utils.metrics import observe_query, observe_rows
+from utils.permissions import admin_registry
 
 DEFAULT_WELCOME_TEXT = (
     "Привет! 👋\n\n"
@@ -19,8 +14,24 @@ DEFAULT_WELCOME_TEXT = (
     "Нажмите на кнопку ниже, чтобы оставить отзыв или посмотреть отзывы других пользователей."
 )
 
+# Колонки отзыва, общие для reviews и reviews_archive
+REVIEW_COLUMNS = (
+    "id", "user_id", "username", "full_name", "rating", "text", "photo_file_id", "created_at",
+    "is_approved", "admin_reply", "admin_id", "admin_username", "admin_reply_at",
+)
+
+
+def _load_psycopg2():
+    try:
+        import psycopg2
+    except ImportError:
+        return None
+    return psycopg2
+
 
 class Database:
+    _schema_ready: set = set()
+
     def __init__(self, database_url: Optional[str] = None, path_to_database: Optional[str] = None) -> None:
         """
         Инициализация базы данных.
@@ -29,12 +40,17 @@ class Database:
         self.use_postgres = False
         self.connection = None
         self.db_path = None
+        self._last_query = ""
         
         # Приоритет: database_url из параметра > config > SQLite
         db_url = database_url or config.database.url
         
-        if db_url and POSTGRES_AVAILABLE and psycopg2:
+        # Драйвер PostgreSQL импортируем только когда он нужен: на SQLite это лишнее время старта
+        psycopg2 = _load_psycopg2() if db_url else None
+        if psycopg2:
             # Используем PostgreSQL
+            from psycopg2.extras import RealDictCursor
+            self._dict_cursor = RealDictCursor
             self.use_postgres = True
             self.connection = psycopg2.connect(db_url)
             self.connection.autocommit = False
@@ -46,29 +62,50 @@ class Database:
             os.makedirs(os.path.dirname(path_to_database), exist_ok=True)
             self.connection = sqlite3.connect(path_to_database, check_same_thread=False)
             self.connection.row_factory = sqlite3.Row
+            # Действует только для новой базы и только до перевода в WAL;
+            # существующую переводит python -m utils.maintenance --convert
+            self.connection.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            if config.database.wal_archive_enabled:
+                # Checkpoint делает только архиватор WAL, иначе кадры могут пропасть до копирования
+                self.connection.execute("PRAGMA journal_mode=WAL")
+                self.connection.execute("PRAGMA wal_autocheckpoint=0")
         
-        self._create_tables()
+        # Схему проверяем один раз на базу за процесс, а не в каждом экземпляре
+        schema_key = db_url if self.use_postgres else os.path.abspath(self.db_path)
+        if schema_key not in Database._schema_ready:
+            self._create_tables()
+            Database._schema_ready.add(schema_key)
 
     def _execute(self, query: str, params: tuple = ()) -> Any:
         """Универсальный метод выполнения запросов для SQLite и PostgreSQL"""
         # Адаптируем запрос для PostgreSQL (заменяем ? на %s)
         if self.use_postgres:
             query = query.replace('?', '%s')
-            cursor = self.connection.cursor(cursor_factory=RealDictCursor)
+            cursor = self.connection.cursor(cursor_factory=self._dict_cursor)
         else:
             cursor = self.connection.cursor()
         
+        started = time.perf_counter()
         try:
             cursor.execute(query, params)
-            return cursor
         except Exception as e:
             if self.use_postgres:
                 self.connection.rollback()
             raise
+        finally:
+            elapsed = time.perf_counter() - started
+            # Для SELECT строки считаются при выборке в _fetchone/_fetchall
+            affected = max(cursor.rowcount, 0) if cursor.description is None else 0
+            observe_query(query, elapsed, affected)
+        if elapsed * 1000 >= config.database.slow_query_ms:
+            slow_queries.record(self, query, params, elapsed)
+        self._last_query = query
+        return cursor
 
     def _execute_many(self, query: str, params_list: list) -> None:
         """Универсальный метод для массовых операций"""
         cursor = self.connection.cursor()
+        started = time.perf_counter()
         try:
             if self.use_postgres:
                 query = query.replace('?', '%s')
@@ -76,12 +113,19 @@ class Database:
         except Exception as e:
             self.connection.rollback()
             raise
+        finally:
+            elapsed = time.perf_counter() - started
+            observe_query(query, elapsed, max(cursor.rowcount, 0))
+        if params_list and elapsed * 1000 >= config.database.slow_query_ms:
+            # План снимаем по первой строке параметров
+            slow_queries.record(self, query, params_list[0], elapsed)
 
     def _fetchone(self, cursor: Any) -> Optional[Dict[str, Any]]:
         """Получить одну строку результата"""
         row = cursor.fetchone()
         if not row:
             return None
+        observe_rows(self._last_query, 1)
         # Для PostgreSQL RealDictCursor уже возвращает dict
         if self.use_postgres:
             return dict(row)
@@ -91,6 +135,7 @@ class Database:
     def _fetchall(self, cursor: Any) -> List[Dict[str, Any]]:
         """Получить все строки результата"""
         rows = cursor.fetchall()
+        observe_rows(self._last_query, len(rows))
         if self.use_postgres:
             return [dict(row) for row in rows]
         return [dict(row) for row in rows]
@@ -102,7 +147,7 @@ class Database:
         auto_increment = "SERIAL" if self.use_postgres else "INTEGER PRIMARY KEY AUTOINCREMENT"
         integer_primary = "INTEGER PRIMARY KEY" if not self.use_postgres else "SERIAL PRIMARY KEY"
         timestamp_default = "DEFAULT CURRENT_TIMESTAMP" if not self.use_postgres else "DEFAULT NOW()"
-        
+
         with self.connection:
             # Таблица users
             if self.use_postgres:
@@ -171,6 +216,35 @@ class Database:
                 except sqlite3.OperationalError:
                     pass  # Колонка уже существует
 
+            # Горячая таблица держит только живые отзывы, поэтому индекс под страницы и счётчики остаётся маленьким
+            self._execute(
+                "CREATE INDEX IF NOT EXISTS idx_reviews_approved_created ON reviews(is_approved, created_at, id)"
+            )
+
+            # Архив: старые одобренные и отклонённые отзывы с теми же id
+            id_type, user_type, time_type = (
+                ("BIGINT", "BIGINT", "TIMESTAMP") if self.use_postgres else ("INTEGER", "INTEGER", "TEXT")
+            )
+            self._execute(f"""
+                CREATE TABLE IF NOT EXISTS reviews_archive (
+                    id {id_type} PRIMARY KEY,
+                    user_id {user_type} NOT NULL,
+                    username TEXT,
+                    full_name TEXT,
+                    rating INTEGER NOT NULL,
+                    text TEXT NOT NULL,
+                    photo_file_id TEXT,
+                    created_at {time_type},
+                    is_approved INTEGER DEFAULT 0,
+                    admin_reply TEXT,
+                    admin_id {user_type},
+                    admin_username TEXT,
+                    admin_reply_at {time_type},
+                    archived_at {time_type} {timestamp_default},
+                    archive_reason TEXT
+                )
+            """)
+
             # Таблица welcome_post
             if self.use_postgres:
                 self._execute("""
@@ -195,6 +269,73 @@ class Database:
                     )
                 """)
 
+            # Таблица admins (назначенные владельцем; ADMIN_IDS из окружения сюда не пишутся)
+            self._execute(f"""
+                CREATE TABLE IF NOT EXISTS admins (
+                    user_id {user_type} PRIMARY KEY,
+                    alias TEXT,
+                    added_at {time_type} {timestamp_default}
+                )
+            """)
+
+            # Таблица fsm_states (состояния FSM, ключ собирается хранилищем)
+            real_type = "DOUBLE PRECISION" if self.use_postgres else "REAL"
+            self._execute(f"""
+                CREATE TABLE IF NOT EXISTS fsm_states (
+                    key TEXT PRIMARY KEY,
+                    state TEXT,
+                    data TEXT,
+                    updated_at {real_type} NOT NULL
+                )
+            """)
+            self._execute("CREATE INDEX IF NOT EXISTS idx_fsm_states_updated_at ON fsm_states(updated_at)")
+
+            # Таблица feedback (свободная обратная связь, status: 0 — открыта, 1 — закрыта)
+            self._execute(f"""
+                CREATE TABLE IF NOT EXISTS feedback (
+                    id {integer_primary},
+                    user_id {user_type} NOT NULL,
+                    description TEXT NOT NULL,
+                    status INTEGER NOT NULL DEFAULT 0,
+                    created_at {time_type} {timestamp_default}
+                )
+            """)
+
+            # Таблица moderation_rules (правила автомодерации, см. utils/automod.py)
+            self._execute(f"""
+                CREATE TABLE IF NOT EXISTS moderation_rules (
+                    id {integer_primary},
+                    kind TEXT NOT NULL,
+                    pattern TEXT,
+                    action TEXT NOT NULL,
+                    hits INTEGER NOT NULL DEFAULT 0,
+                    updated_at {real_type} NOT NULL
+                )
+            """)
+
+            # Таблица review_photos (перцептивные хэши фото отзывов, см. utils/photo_dedup.py)
+            self._execute(f"""
+                CREATE TABLE IF NOT EXISTS review_photos (
+                    review_id {id_type} PRIMARY KEY,
+                    file_unique_id TEXT NOT NULL,
+                    phash TEXT NOT NULL,
+                    similar_review_id {id_type},
+                    distance INTEGER,
+                    created_at {real_type} NOT NULL
+                )
+            """)
+            self._execute("CREATE INDEX IF NOT EXISTS idx_review_photos_file ON review_photos(file_unique_id)")
+
+            # Таблица scheduled_deletions (отложенное удаление сообщений, переживает перезапуск)
+            self._execute(f"""
+                CREATE TABLE IF NOT EXISTS scheduled_deletions (
+                    chat_id {user_type} NOT NULL,
+                    message_id INTEGER NOT NULL,
+                    delete_at {real_type} NOT NULL,
+                    PRIMARY KEY (chat_id, message_id)
+                )
+            """)
+
             # Вставка дефолтного приветствия
             if self.use_postgres:
                 self._execute("""
@@ -231,6 +372,45 @@ class Database:
                         last_seen = CURRENT_TIMESTAMP
                 """, (user_id, username, full_name))
 
+    def user_exists(self, user_id: int) -> bool:
+        cursor = self._execute("SELECT 1 FROM users WHERE user_id = ?", (user_id,))
+        return cursor.fetchone() is not None
+
+    def get_all_users(self) -> List[int]:
+        """user_id всех пользователей, нажимавших /start"""
+        cursor = self._execute("SELECT user_id FROM users ORDER BY user_id")
+        return [row["user_id"] for row in self._fetchall(cursor)]
+
+    # --- ADMINS ---
+    def add_admin(self, user_id: int, alias: Optional[str]) -> None:
+        with self.connection:
+            self._execute("""
+                INSERT INTO admins (user_id, alias)
+                VALUES (?, ?)
+                ON CONFLICT(user_id) DO UPDATE SET alias = excluded.alias
+            """, (user_id, alias))
+        admin_registry.invalidate()
+
+    def delete_admin(self, user_id: int) -> bool:
+        with self.connection:
+            cursor = self._execute("DELETE FROM admins WHERE user_id = ?", (user_id,))
+        admin_registry.invalidate()
+        return cursor.rowcount > 0
+
+    def get_all_admins(self) -> List[Tuple[int, Optional[str]]]:
+        """[(user_id, alias), ...] назначенных администраторов"""
+        cursor = self._execute("SELECT user_id, alias FROM admins ORDER BY added_at, user_id")
+        return [(row["user_id"], row["alias"]) for row in self._fetchall(cursor)]
+
+    def count_admins(self) -> int:
+        cursor = self._execute("SELECT COUNT(*) AS total FROM admins")
+        return self._fetchone(cursor)["total"]
+
+    def is_admin(self, user_id: int) -> bool:
+        """Только таблица admins; для проверки прав используйте utils.permissions.is_admin"""
+        cursor = self._execute("SELECT 1 FROM admins WHERE user_id = ?", (user_id,))
+        return cursor.fetchone() is not None
+
     # --- WELCOME POST ---
     def get_welcome_post(self) -> Dict[str, Any]:
         cursor = self._execute("SELECT * FROM welcome_post WHERE id = 1")
@@ -278,8 +458,8 @@ class Database:
                     VALUES (%s, %s, %s, %s, %s, %s)
                     RETURNING id
                 """, (user_id, username, full_name, rating, text, photo_file_id))
-                result = cursor.fetchone()
-                return result[0] if result else 0
+                result = self._fetchone(cursor)
+                return result["id"] if result else 0
         else:
             with self.connection:
                 cursor = self._execute("""
@@ -337,33 +517,35 @@ class Database:
             cursor = self._execute("DELETE FROM reviews WHERE id = ?", (review_id,))
             return cursor.rowcount > 0
 
-    def get_review(self, review_id: int) -> Optional[Dict[str, Any]]:
+    def get_review(self, review_id: int, include_archived: bool = False) -> Optional[Dict[str, Any]]:
+        """include_archived=True ищет и в архиве; у найденного там отзыва есть ключ archived"""
         cursor = self._execute("SELECT * FROM reviews WHERE id = ?", (review_id,))
-        return self._fetchone(cursor)
+        review = self._fetchone(cursor)
+        if review or not include_archived:
+            return review
+        cursor = self._execute("SELECT * FROM reviews_archive WHERE id = ?", (review_id,))
+        review = self._fetchone(cursor)
+        if review:
+            review["archived"] = True
+        return review
 
     def save_admin_reply(
         self, review_id: int, admin_id: int, admin_username: Optional[str], reply_text: str
     ) -> None:
-        if self.use_postgres:
-            with self.connection:
-                self._execute("""
-                    UPDATE reviews
-                    SET admin_reply = %s,
-                        admin_id = %s,
-                        admin_username = %s,
-                        admin_reply_at = NOW()
-                    WHERE id = %s
-                """, (reply_text, admin_id, admin_username, review_id))
-        else:
-            with self.connection:
-                self._execute("""
-                    UPDATE reviews
+        now = "NOW()" if self.use_postgres else "CURRENT_TIMESTAMP"
+        with self.connection:
+            # Отвечать можно и на архивный отзыв: сначала горячая таблица, затем архив
+            for table in ("reviews", "reviews_archive"):
+                cursor = self._execute(f"""
+                    UPDATE {table}
                     SET admin_reply = ?,
                         admin_id = ?,
                         admin_username = ?,
-                        admin_reply_at = CURRENT_TIMESTAMP
+                        admin_reply_at = {now}
                     WHERE id = ?
                 """, (reply_text, admin_id, admin_username, review_id))
+                if cursor.rowcount:
+                    break
 
     def get_review_author(self, review_id: int) -> Optional[Tuple[int, str]]:
         cursor = self._execute("SELECT user_id, full_name FROM reviews WHERE id = ?", (review_id,))
@@ -371,3 +553,307 @@ class Database:
         if not row:
             return None
         return row['user_id'], row.get('full_name') or ""
+
+
+    # --- ARCHIVE ---
+    def _move_to_archive(self, ids: List[int], reason: str) -> int:
+        """Переносит отзывы в архив; вызывать внутри транзакции"""
+        columns = ", ".join(REVIEW_COLUMNS)
+        placeholders = ", ".join("?" * len(ids))
+        self._execute(f"""
+            INSERT INTO reviews_archive ({columns}, archive_reason)
+            SELECT {columns}, ? FROM reviews WHERE id IN ({placeholders})
+        """, (reason, *ids))
+        cursor = self._execute(f"DELETE FROM reviews WHERE id IN ({placeholders})", tuple(ids))
+        return cursor.rowcount
+
+    def archive_review(self, review_id: int, reason: str) -> bool:
+        """Перенести один отзыв в архив (например, отклонённый модератором)"""
+        with self.connection:
+            return self._move_to_archive([review_id], reason) > 0
+
+    def archive_pending_reviews(self, ids: List[int], reason: str) -> int:
+        """Перенести в архив те из отзывов, что ещё ждут модерации"""
+        if not ids:
+            return 0
+        placeholders = ", ".join("?" * len(ids))
+        with self.connection:
+            cursor = self._execute(
+                f"SELECT id FROM reviews WHERE is_approved = 0 AND id IN ({placeholders})", tuple(ids)
+            )
+            pending = [row["id"] for row in self._fetchall(cursor)]
+            return self._move_to_archive(pending, reason) if pending else 0
+
+    def archive_old_reviews(self, older_than_days: int, limit: int) -> int:
+        """
+        Переносит в архив до limit одобренных отзывов старше older_than_days.
+        Одна порция — одна короткая транзакция; возвращает число перенесённых.
+        """
+        if self.use_postgres:
+            cursor = self._execute("""
+                SELECT id FROM reviews
+                WHERE is_approved = 1 AND created_at < NOW() - (? * INTERVAL '1 day')
+                ORDER BY id LIMIT ?
+            """, (older_than_days, limit))
+        else:
+            cursor = self._execute("""
+                SELECT id FROM reviews
+                WHERE is_approved = 1 AND created_at < datetime('now', ?)
+                ORDER BY id LIMIT ?
+            """, (f"-{older_than_days} days", limit))
+        ids = [row["id"] for row in self._fetchall(cursor)]
+        if not ids:
+            return 0
+        with self.connection:
+            return self._move_to_archive(ids, "expired")
+
+    def count_archived_reviews(self) -> int:
+        cursor = self._execute("SELECT COUNT(*) AS total FROM reviews_archive")
+        return self._fetchone(cursor)["total"]
+
+    def iter_all_reviews(self, include_archived: bool = True, batch_size: int = 1000) -> Iterator[Dict[str, Any]]:
+        """Все отзывы по возрастанию id порциями, для выгрузок; архивные помечены ключом archived"""
+        tables = ("reviews", "reviews_archive") if include_archived else ("reviews",)
+        for table in tables:
+            last_id = 0
+            while True:
+                cursor = self._execute(
+                    f"SELECT * FROM {table} WHERE id > ? ORDER BY id LIMIT ?", (last_id, batch_size)
+                )
+                rows = self._fetchall(cursor)
+                for row in rows:
+                    if table == "reviews_archive":
+                        row["archived"] = True
+                    yield row
+                if len(rows) < batch_size:
+                    break
+                last_id = rows[-1]["id"]
+
+    def get_recent_reviews(self, limit: int) -> List[Dict[str, Any]]:
+        """Последние limit отзывов (без архива) по убыванию id"""
+        cursor = self._execute(
+            "SELECT id, user_id, text, is_approved, created_at FROM reviews ORDER BY id DESC LIMIT ?", (limit,)
+        )
+        return self._fetchall(cursor)
+
+    # --- MAINTENANCE ---
+    def analyze(self) -> None:
+        """Обновить статистику планировщика"""
+        if self.use_postgres:
+            with self.connection:
+                self._execute("ANALYZE users, reviews, reviews_archive")
+        else:
+            self._execute("ANALYZE")
+            self.connection.commit()
+
+    def auto_vacuum_mode(self) -> Optional[int]:
+        """PRAGMA auto_vacuum: 0 — выключен, 1 — полный, 2 — инкрементальный; None для PostgreSQL"""
+        if self.use_postgres:
+            return None
+        return self._execute("PRAGMA auto_vacuum").fetchone()[0]
+
+    def convert_to_incremental_vacuum(self) -> Dict[str, Any]:
+        """
+        Разовый перевод SQLite в auto_vacuum=INCREMENTAL. Режим меняется только
+        полным VACUUM: файл переписывается целиком, запись на это время заблокирована.
+        """
+        if self.use_postgres or self.auto_vacuum_mode() == 2:
+            return {"converted": 0}
+        started = time.monotonic()
+        size_before = os.path.getsize(self.db_path)
+        self._execute("PRAGMA auto_vacuum=INCREMENTAL")
+        self._execute("VACUUM")
+        return {
+            "converted": 1,
+            "seconds": round(time.monotonic() - started, 2),
+            "bytes_freed": size_before - os.path.getsize(self.db_path),
+        }
+
+    def incremental_vacuum(self, max_pages: int = 0) -> Dict[str, int]:
+        """
+        Возвращает свободные страницы SQLite файлу (не больше max_pages за раз, 0 — все).
+        Работает только в режиме auto_vacuum=INCREMENTAL (convert_to_incremental_vacuum),
+        иначе ничего не делает. В PostgreSQL место освобождает autovacuum.
+        """
+        if self.auto_vacuum_mode() != 2:
+            return {}
+        page_size = self._execute("PRAGMA page_size").fetchone()[0]
+        before = self._execute("PRAGMA freelist_count").fetchone()[0]
+        # execute() делает один шаг прагмы и освобождает одну страницу; executescript проходит её целиком
+        self.connection.executescript(f"PRAGMA incremental_vacuum({int(max_pages)})")
+        after = self._execute("PRAGMA freelist_count").fetchone()[0]
+        return {
+            "pages_freed": before - after,
+            "free_pages_left": after,
+            "bytes_freed": (before - after) * page_size,
+        }
+
+    def close(self) -> None:
+        self.connection.close()
+
+    # --- FSM ---
+    def get_fsm_record(self, key: str) -> Optional[Dict[str, Any]]:
+        cursor = self._execute("SELECT state, data, updated_at FROM fsm_states WHERE key = ?", (key,))
+        return self._fetchone(cursor)
+
+    def save_fsm_records(self, records: List[Tuple[str, Optional[str], Optional[str], float]]) -> None:
+        """Пакетная запись состояний: [(key, state, data_json, updated_at), ...]"""
+        if not records:
+            return
+        with self.connection:
+            self._execute_many("""
+                INSERT INTO fsm_states (key, state, data, updated_at)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(key) DO UPDATE SET
+                    state = excluded.state,
+                    data = excluded.data,
+                    updated_at = excluded.updated_at
+            """, records)
+
+    def delete_fsm_records(self, keys: List[str]) -> None:
+        if not keys:
+            return
+        with self.connection:
+            self._execute_many("DELETE FROM fsm_states WHERE key = ?", [(key,) for key in keys])
+
+    def delete_expired_fsm_records(self, older_than: float) -> int:
+        """Удалить состояния, не обновлявшиеся с момента older_than (unix time)"""
+        with self.connection:
+            cursor = self._execute("DELETE FROM fsm_states WHERE updated_at < ?", (older_than,))
+            return cursor.rowcount
+
+    def count_fsm_records(self) -> int:
+        cursor = self._execute("SELECT COUNT(*) AS total FROM fsm_states WHERE state IS NOT NULL")
+        return self._fetchone(cursor)["total"]
+
+    # --- FEEDBACK ---
+    def add_feedbacks(self, rows: List[Tuple[int, str, int]]) -> None:
+        """Пакетная запись обратной связи: [(user_id, description, status), ...]"""
+        if not rows:
+            return
+        with self.connection:
+            self._execute_many("INSERT INTO feedback (user_id, description, status) VALUES (?, ?, ?)", rows)
+
+    def add_feedback(self, user_id: int, description: str, status: int = 0) -> None:
+        self.add_feedbacks([(user_id, description, status)])
+
+    def get_all_feedbacks(self) -> List[Tuple[int, int, str, int]]:
+        cursor = self._execute("SELECT id, user_id, description, status FROM feedback ORDER BY id")
+        return [(row["id"], row["user_id"], row["description"], row["status"]) for row in self._fetchall(cursor)]
+
+    # --- MODERATION RULES ---
+    def get_moderation_rules(self) -> List[Dict[str, Any]]:
+        cursor = self._execute("SELECT id, kind, pattern, action, hits FROM moderation_rules ORDER BY id")
+        return self._fetchall(cursor)
+
+    def moderation_rules_version(self) -> Tuple[int, float]:
+        """Дешёвый признак изменения правил: (число правил, время последней правки)"""
+        cursor = self._execute("SELECT COUNT(*) AS total, MAX(updated_at) AS updated FROM moderation_rules")
+        row = self._fetchone(cursor)
+        return (row["total"], row["updated"] or 0.0) if row else (0, 0.0)
+
+    def add_moderation_rule(self, kind: str, pattern: Optional[str], action: str) -> int:
+        with self.connection:
+            if self.use_postgres:
+                cursor = self._execute("""
+                    INSERT INTO moderation_rules (kind, pattern, action, updated_at)
+                    VALUES (?, ?, ?, ?)
+                    RETURNING id
+                """, (kind, pattern, action, time.time()))
+                result = self._fetchone(cursor)
+                return result["id"] if result else 0
+            cursor = self._execute("""
+                INSERT INTO moderation_rules (kind, pattern, action, updated_at)
+                VALUES (?, ?, ?, ?)
+            """, (kind, pattern, action, time.time()))
+            return cursor.lastrowid
+
+    def delete_moderation_rule(self, rule_id: int) -> bool:
+        with self.connection:
+            cursor = self._execute("DELETE FROM moderation_rules WHERE id = ?", (rule_id,))
+            return cursor.rowcount > 0
+
+    def add_moderation_rule_hits(self, hits: List[Tuple[int, int]]) -> None:
+        """Прибавить срабатывания: [(прирост, rule_id), ...]"""
+        if not hits:
+            return
+        with self.connection:
+            self._execute_many("UPDATE moderation_rules SET hits = hits + ? WHERE id = ?", hits)
+
+    # --- REVIEW PHOTOS ---
+    def get_photo_hash(self, file_unique_id: str) -> Optional[int]:
+        """Хэш уже обработанного файла: тот же file_unique_id второй раз не скачиваем"""
+        cursor = self._execute("SELECT phash FROM review_photos WHERE file_unique_id = ? LIMIT 1", (file_unique_id,))
+        row = self._fetchone(cursor)
+        return int(row["phash"], 16) if row else None
+
+    def save_review_photo(
+        self,
+        review_id: int,
+        file_unique_id: str,
+        phash: int,
+        similar_review_id: Optional[int] = None,
+        distance: Optional[int] = None,
+    ) -> None:
+        # Хэш хранится строкой: 64-битное беззнаковое не влезает в INTEGER SQLite
+        with self.connection:
+            self._execute("""
+                INSERT INTO review_photos (review_id, file_unique_id, phash, similar_review_id, distance, created_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(review_id) DO UPDATE SET
+                    file_unique_id = excluded.file_unique_id,
+                    phash = excluded.phash,
+                    similar_review_id = excluded.similar_review_id,
+                    distance = excluded.distance
+            """, (review_id, file_unique_id, f"{phash:016x}", similar_review_id, distance, time.time()))
+
+    def get_review_photo_hashes(self) -> List[Tuple[int, int]]:
+        cursor = self._execute("SELECT review_id, phash FROM review_photos ORDER BY review_id")
+        return [(row["review_id"], int(row["phash"], 16)) for row in self._fetchall(cursor)]
+
+    def get_review_photo_match(self, review_id: int) -> Optional[Tuple[int, int]]:
+        """(похожий отзыв, расстояние Хэмминга) или None"""
+        cursor = self._execute(
+            "SELECT similar_review_id, distance FROM review_photos WHERE review_id = ? AND similar_review_id IS NOT NULL",
+            (review_id,),
+        )
+        row = self._fetchone(cursor)
+        return (row["similar_review_id"], row["distance"]) if row else None
+
+    # --- SCHEDULED DELETIONS ---
+    def add_scheduled_deletions(self, rows: List[Tuple[int, int, float]]) -> None:
+        """Запланировать удаление: [(chat_id, message_id, delete_at), ...]"""
+        if not rows:
+            return
+        with self.connection:
+            self._execute_many("""
+                INSERT INTO scheduled_deletions (chat_id, message_id, delete_at)
+                VALUES (?, ?, ?)
+                ON CONFLICT(chat_id, message_id) DO UPDATE SET delete_at = excluded.delete_at
+            """, rows)
+
+    def get_scheduled_deletions(self) -> List[Tuple[int, int, float]]:
+        cursor = self._execute("SELECT chat_id, message_id, delete_at FROM scheduled_deletions")
+        return [(row["chat_id"], row["message_id"], row["delete_at"]) for row in self._fetchall(cursor)]
+
+    def remove_scheduled_deletions(self, keys: List[Tuple[int, int]]) -> None:
+        """Снять выполненные удаления: [(chat_id, message_id), ...]"""
+        if not keys:
+            return
+        with self.connection:
+            self._execute_many("DELETE FROM scheduled_deletions WHERE chat_id = ? AND message_id = ?", keys)
+
+
+_shared_database: Optional[Database] = None
+
+
+def get_database() -> Database:
+    """
+    Общий экземпляр для хендлеров: одно соединение на процесс вместо отдельного
+    соединения в каждом модуле роутера. Хранилище FSM открывает своё, потому что
+    пишет из рабочего потока.
+    """
+    global _shared_database
+    if _shared_database is None:
+        _shared_database = Database()
+    return _shared_database
@@ -0,0 +1,217 @@
+"""
+Хранилище FSM поверх Database (SQLite/PostgreSQL).
+
+- состояния переживают перезапуск бота (недописанные отзывы, ответы админов);
+- горячие ключи держатся в ограниченном LRU-кэше процесса;
+- записи копятся и сбрасываются в БД пачками раз в flush_interval секунд;
+- заброшенные состояния истекают по TTL и удаляются из БД фоновой задачей.
+
+При запуске нескольких процессов бота на одной БД кэш стоит выключить
+(FSM_CACHE_SIZE=0), тогда каждое чтение идёт в общую БД.
+"""
+import asyncio
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Mapping, Optional, Set, Tuple
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, KeyBuilder, StateType, StorageKey
+from loguru import logger
+
+from config import config
+from db_manager.db import Database
+
+# (state, data, touched_at)
+_Record = Tuple[Optional[str], Dict[str, Any], float]
+
+
+class DatabaseStorage(BaseStorage):
+    def __init__(
+        self,
+        db: Optional[Database] = None,
+        cache_size: Optional[int] = None,
+        ttl_seconds: Optional[float] = None,
+        flush_interval: Optional[float] = None,
+        key_builder: Optional[KeyBuilder] = None,
+    ) -> None:
+        cfg = config.fsm
+        # Отдельное соединение: запросы хранилища выполняются в рабочем потоке
+        self.db = db or Database()
+        self.cache_size = cfg.cache_size if cache_size is None else cache_size
+        self.ttl_seconds = cfg.state_ttl_hours * 3600 if ttl_seconds is None else ttl_seconds
+        self.flush_interval = cfg.flush_interval if flush_interval is None else flush_interval
+        self.key_builder = key_builder or DefaultKeyBuilder(with_bot_id=True, with_destiny=True)
+
+        self._cache: "OrderedDict[str, _Record]" = OrderedDict()
+        # Ещё не записанные в БД изменения: key -> запись (None — удалить)
+        self._pending: Dict[str, Optional[_Record]] = {}
+        # Пачка, которая прямо сейчас пишется в БД
+        self._inflight: Dict[str, Optional[_Record]] = {}
+        # Ключи, которые сейчас читаются из БД (key -> число чтений), и те из них,
+        # что успели измениться за время чтения: прочитанная строка уже устарела
+        self._loading: Dict[str, int] = {}
+        self._changed_while_loading: Set[str] = set()
+        self._db_lock = threading.Lock()
+        self._flush_task: Optional[asyncio.Task] = None
+        self._last_purge = 0.0
+
+    # --- Кэш ---
+    def _is_expired(self, record: _Record) -> bool:
+        return self.ttl_seconds > 0 and time.time() - record[2] > self.ttl_seconds
+
+    def _remember(self, key: str, record: _Record) -> None:
+        if self.cache_size <= 0:
+            return
+        self._cache[key] = record
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def _lookup(self, key: str) -> Tuple[bool, Optional[_Record]]:
+        """Запись из памяти процесса: (найдена ли, запись; None — удалена)"""
+        if key in self._pending:
+            return True, self._pending[key]
+        if key in self._inflight:
+            return True, self._inflight[key]
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return True, self._cache[key]
+        return False, None
+
+    async def _load(self, key: str) -> Optional[_Record]:
+        while True:
+            found, record = self._lookup(key)
+            if found:
+                break
+            self._loading[key] = self._loading.get(key, 0) + 1
+            try:
+                row = await asyncio.to_thread(self._db_call, self.db.get_fsm_record, key)
+            finally:
+                changed = key in self._changed_while_loading
+                self._loading[key] -= 1
+                if not self._loading[key]:
+                    del self._loading[key]
+                    self._changed_while_loading.discard(key)
+            if changed:
+                # Пока читали, запись изменили: берём её из памяти или, если она
+                # уже сброшена в БД, читаем заново — строку из БД не кэшируем
+                continue
+            record = None
+            if row:
+                record = (row["state"], json.loads(row["data"] or "{}"), float(row["updated_at"]))
+                self._remember(key, record)
+            break
+
+        if record is not None and self._is_expired(record):
+            return None
+        return record
+
+    def _store(self, key: str, state: Optional[str], data: Dict[str, Any]) -> None:
+        if key in self._loading:
+            self._changed_while_loading.add(key)
+        if state is None and not data:
+            # Пустая запись равносильна отсутствию — удаляем, чтобы таблица не росла
+            self._cache.pop(key, None)
+            self._pending[key] = None
+        else:
+            record = (state, data, time.time())
+            self._remember(key, record)
+            self._pending[key] = record
+        self._ensure_flusher()
+
+    # --- Интерфейс BaseStorage ---
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        storage_key = self.key_builder.build(key)
+        record = await self._load(storage_key)
+        data = dict(record[1]) if record else {}
+        self._store(storage_key, state.state if isinstance(state, State) else state, data)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        record = await self._load(self.key_builder.build(key))
+        return record[0] if record else None
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        if not isinstance(data, dict):
+            raise ValueError(f"Data must be a dict, got {type(data).__name__}")
+        storage_key = self.key_builder.build(key)
+        record = await self._load(storage_key)
+        self._store(storage_key, record[0] if record else None, data.copy())
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        record = await self._load(self.key_builder.build(key))
+        return record[1].copy() if record else {}
+
+    async def close(self) -> None:
+        if self._flush_task:
+            self._flush_task.cancel()
+            self._flush_task = None
+        await self._flush()
+
+    # --- Запись в БД ---
+    def _db_call(self, func, *args):
+        with self._db_lock:
+            return func(*args)
+
+    def _ensure_flusher(self) -> None:
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self._flush()
+                if time.time() - self._last_purge > 3600:
+                    self._last_purge = time.time()
+                    await self._purge_expired()
+            except Exception as e:
+                logger.error(f"Ошибка при сохранении FSM-состояний: {e}")
+
+    async def _flush(self) -> None:
+        if not self._pending:
+            return
+        # Забираем накопленное целиком; новые изменения попадут в следующую пачку
+        pending, self._pending = self._pending, {}
+        self._inflight = pending
+        upserts = [
+            (key, record[0], json.dumps(record[1], ensure_ascii=False, default=str), record[2])
+            for key, record in pending.items()
+            if record is not None
+        ]
+        deletes = [key for key, record in pending.items() if record is None]
+        try:
+            await asyncio.to_thread(self._write_batch, upserts, deletes)
+        except Exception:
+            # Возвращаем несохранённое, не затирая более свежие изменения
+            for key, record in pending.items():
+                self._pending.setdefault(key, record)
+            raise
+        finally:
+            self._inflight = {}
+
+    def _write_batch(self, upserts: list, deletes: list) -> None:
+        with self._db_lock:
+            self.db.save_fsm_records(upserts)
+            self.db.delete_fsm_records(deletes)
+
+    async def _purge_expired(self) -> None:
+        if self.ttl_seconds <= 0:
+            return
+        older_than = time.time() - self.ttl_seconds
+        removed = await asyncio.to_thread(self._db_call, self.db.delete_expired_fsm_records, older_than)
+        for key in [key for key, record in self._cache.items() if self._is_expired(record)]:
+            del self._cache[key]
+        if removed:
+            logger.info(f"Удалено заброшенных FSM-состояний: {removed}")
+
+    async def count_states(self) -> int:
+        """Число активных состояний в БД (для метрик)"""
+        return await asyncio.to_thread(self._db_call, self.db.count_fsm_records)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "cached": len(self._cache),
+            "pending_writes": len(self._pending),
+        }
@@ -0,0 +1,111 @@
+"""
+Журнал медленных запросов.
+
+Database сообщает сюда о каждом выражении дольше config.database.slow_query_ms.
+Для каждого выражения копится статистика (число, суммарное и максимальное
+время, «форма» параметров без значений), а при первом попадании в журнал
+снимается план: EXPLAIN QUERY PLAN в SQLite, EXPLAIN в PostgreSQL.
+"""
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from loguru import logger
+
+from utils.metrics import statement_label
+
+# DDL и служебные выражения не объясняем
+_EXPLAINABLE = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH")
+
+
+def params_shape(params: Any) -> str:
+    """Типы и длины параметров без самих значений: (int, str[120], NoneType)"""
+    if not params:
+        return "()"
+    parts = []
+    for value in params:
+        name = type(value).__name__
+        if isinstance(value, (str, bytes)):
+            name += f"[{len(value)}]"
+        parts.append(name)
+    return "(" + ", ".join(parts) + ")"
+
+
+@dataclass
+class SlowQueryStats:
+    statement: str
+    count: int = 0
+    total_ms: float = 0.0
+    max_ms: float = 0.0
+    shapes: Dict[str, int] = field(default_factory=dict)
+    plan: Optional[str] = None
+
+    @property
+    def avg_ms(self) -> float:
+        return self.total_ms / self.count if self.count else 0.0
+
+
+class QueryProfiler:
+    def __init__(self, max_statements: int = 500) -> None:
+        self.max_statements = max_statements
+        self._stats: Dict[str, SlowQueryStats] = {}
+        self._lock = threading.Lock()
+
+    def record(self, db, query: str, params: Any, seconds: float) -> None:
+        label = statement_label(query)
+        elapsed_ms = seconds * 1000
+        shape = params_shape(params)
+        with self._lock:
+            stats = self._stats.get(label)
+            first_seen = stats is None
+            if first_seen:
+                if len(self._stats) >= self.max_statements:
+                    return
+                stats = self._stats[label] = SlowQueryStats(statement=label)
+            stats.count += 1
+            stats.total_ms += elapsed_ms
+            stats.max_ms = max(stats.max_ms, elapsed_ms)
+            stats.shapes[shape] = stats.shapes.get(shape, 0) + 1
+
+        if first_seen:
+            stats.plan = self._explain(db, query, params)
+
+        logger.bind(
+            event_type="slow_query",
+            statement=label,
+            elapsed_ms=round(elapsed_ms, 1),
+            params_shape=shape,
+            first_seen=first_seen,
+        ).warning("Slow SQL query")
+
+    def _explain(self, db, query: str, params: Any) -> Optional[str]:
+        if not query.lstrip().upper().startswith(_EXPLAINABLE):
+            return None
+        # Курсор берём напрямую, мимо Database._execute: план не должен сам попадать в журнал
+        try:
+            cursor = db.connection.cursor()
+            if db.use_postgres:
+                # Савепоинт: ошибка EXPLAIN не должна прерывать транзакцию вызывающего кода
+                cursor.execute("SAVEPOINT explain_slow_query")
+                try:
+                    cursor.execute("EXPLAIN " + query, params)
+                    plan = "\n".join(row[0] for row in cursor.fetchall())
+                finally:
+                    cursor.execute("ROLLBACK TO SAVEPOINT explain_slow_query")
+                return plan
+            cursor.execute("EXPLAIN QUERY PLAN " + query, params)
+            return "\n".join(str(row[-1]) for row in cursor.fetchall())
+        except Exception as e:
+            return f"EXPLAIN failed: {e}"
+
+    def top(self, limit: int = 10, order_by: str = "total_ms") -> List[SlowQueryStats]:
+        with self._lock:
+            items = list(self._stats.values())
+        return sorted(items, key=lambda s: getattr(s, order_by), reverse=True)[:limit]
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats.clear()
+
+
+slow_queries = QueryProfiler()
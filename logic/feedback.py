@@ -4,10 +4,21 @@ from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.types import CallbackQuery, Message
 
-from db_manager.db import Database
+from db_manager.db import get_database
 from menu.keyboard import rating_keyboard, reviews_keyboard, skip_media_keyboard
-from utils.permissions import is_admin
-from config import config
+from utils.callbacks import (
+    REVIEW_NEW,
+    REVIEW_RATING,
+    REVIEW_SKIP_MEDIA,
+    REVIEWS_ADMIN,
+    REVIEWS_PHOTO,
+    REVIEWS_USER,
+    CallbackRoutes,
+)
+from utils.permissions import admin_registry
+from utils.automod import APPROVE, HOLD, REJECT, automod
+from utils.photo_dedup import photo_dedup
+from utils.similarity import DUPLICATE, FLAG, SPAM, review_index
 
 REVIEWS_PER_PAGE = 5
 
@@ -18,8 +29,9 @@ class ReviewState(StatesGroup):
     waiting_for_media = State()
 
 
-db = Database()
-feedback_router = Router()
+db = get_database()
+feedback_router = Router(name="feedback")
+routes = CallbackRoutes(feedback_router)
 
 
 def _format_rating(rating: int) -> str:
@@ -135,7 +147,7 @@ async def _send_reviews_page(call: CallbackQuery, role: str, page: int):
     await call.answer()
 
 
-@feedback_router.callback_query(F.data == "review:new")
+@routes.on(REVIEW_NEW)
 async def start_review(call: CallbackQuery, state: FSMContext):
     await state.clear()
     await state.set_state(ReviewState.waiting_for_rating)
@@ -152,20 +164,14 @@ async def start_review(call: CallbackQuery, state: FSMContext):
     await call.answer()
 
 
-@feedback_router.callback_query(ReviewState.waiting_for_rating, F.data.startswith("review:rating:"))
-async def set_rating(call: CallbackQuery, state: FSMContext):
+@routes.on(REVIEW_RATING, ReviewState.waiting_for_rating)
+async def set_rating(call: CallbackQuery, cb, state: FSMContext):
     data = await state.get_data()
     if data.get("author_id") != call.from_user.id:
         await call.answer("Эта оценка не для вас.", show_alert=True)
         return
 
-    try:
-        rating = int(call.data.split(":")[-1])
-    except (ValueError, IndexError):
-        await call.answer("Неверное значение.", show_alert=True)
-        return
-
-    await state.update_data(rating=rating)
+    await state.update_data(rating=cb.rating)
     await state.set_state(ReviewState.waiting_for_text)
     await call.message.answer("Напишите текст отзыва. Постарайтесь быть максимально конкретным.")
     await call.answer()
@@ -197,7 +203,12 @@ async def collect_photo(message: Message, state: FSMContext):
         return
 
     file_id = message.photo[-1].file_id
-    await state.update_data(photo=file_id)
+    # Для хэша хватает самого маленького размера; file_unique_id — у сохраняемого
+    await state.update_data(
+        photo=file_id,
+        photo_unique_id=message.photo[-1].file_unique_id,
+        photo_thumb_id=message.photo[0].file_id,
+    )
     await finalize_review(message, state)
 
 
@@ -214,7 +225,7 @@ async def handle_skip_text(message: Message, state: FSMContext):
     await message.answer("Если хотите прикрепить фото — отправьте его. Либо напишите «Пропустить».")
 
 
-@feedback_router.callback_query(ReviewState.waiting_for_media, F.data == "review:skip_media")
+@routes.on(REVIEW_SKIP_MEDIA, ReviewState.waiting_for_media)
 async def skip_media(call: CallbackQuery, state: FSMContext):
     data = await state.get_data()
     if data.get("author_id") != call.from_user.id:
@@ -237,8 +248,15 @@ async def finalize_review(message: Message, state: FSMContext):
         await state.clear()
         return
 
+    # Повтор своего отзыва не сохраняем вовсе
+    verdict = review_index.check(user_id, text)
+    if verdict.action == DUPLICATE:
+        await state.clear()
+        await message.answer("Вы уже оставляли такой отзыв — он у нас есть. Спасибо!")
+        return
+
     photo_id = data.get("photo")
-    db.create_review(
+    review_id = db.create_review(
         user_id=user_id,
         username=username,
         full_name=full_name,
@@ -246,62 +264,75 @@ async def finalize_review(message: Message, state: FSMContext):
         text=text,
         photo_file_id=photo_id,
     )
+    review_index.add(review_id, user_id, text, verdict)
+    if photo_id and data.get("photo_unique_id"):
+        photo_dedup.submit(review_id, data.get("photo_thumb_id") or photo_id, data["photo_unique_id"])
 
     await state.clear()
     await message.answer("Спасибо за обратную связь будем рады вас видеть снова.")
 
-    recipients = set(config.bot.admin_ids + [config.bot.owner_id])
+    if verdict.action == SPAM:
+        # Спам-волна: новый отзыв и непроверенные участники волны уходят в архив мимо модерации
+        db.archive_pending_reviews([review_id, *verdict.cluster], "spam")
+        review_index.retire(review_id, *verdict.cluster)
+        return
+
+    decision = automod.evaluate(text, rating)
+    if decision.action == APPROVE and verdict.action == FLAG:
+        # Похожие на чужие отзывы всегда смотрит человек
+        decision = decision._replace(action=HOLD)
+    if decision.action == REJECT:
+        db.archive_review(review_id, "automod")
+        review_index.remove(review_id)
+        return
+    if decision.action == APPROVE:
+        db.approve_review(review_id)
+
+    recipients = set(admin_registry.ids())
     recipients.discard(user_id)
 
+    notice = (
+        "🆕 Новый отзыв\n"
+        f"Оценка: {rating}\n"
+        f"Текст: {text}\n"
+        f"Фото: {'есть' if photo_id else 'нет'}"
+    )
+    if verdict.action == FLAG:
+        notice += f"\n⚠️ Похож на отзыв №{verdict.match_id} ({verdict.score:.0%})"
+    if decision.action == APPROVE:
+        notice += "\n✅ Опубликован автоматически"
+    elif decision.rules:
+        notice += "\n🛑 Правила: " + ", ".join(rule.describe() for rule in decision.rules)
+
     for admin_id in recipients:
         try:
-            await message.bot.send_message(
-                admin_id,
-                (
-                    "🆕 Новый отзыв\n"
-                    f"Оценка: {rating}\n"
-                    f"Текст: {text}\n"
-                    f"Фото: {'есть' if photo_id else 'нет'}"
-                ),
-            )
+            await message.bot.send_message(admin_id, notice)
         except Exception:
             continue
 
 
-@feedback_router.callback_query(F.data.startswith("reviews:user:"))
-async def reviews_user_pagination(call: CallbackQuery):
-    try:
-        page_number = int(call.data.split(":")[2])
-    except (ValueError, IndexError):
-        await call.answer("Неверная страница.", show_alert=True)
-        return
-
-    await _send_reviews_page(call, "user", page_number)
+@routes.on(REVIEWS_USER)
+async def reviews_user_pagination(call: CallbackQuery, cb):
+    await _send_reviews_page(call, "user", cb.page)
 
 
-@feedback_router.callback_query(F.data.startswith("reviews:admin:"))
-async def reviews_admin_pagination(call: CallbackQuery):
-    if not is_admin(call.from_user.id):
+@routes.on(REVIEWS_ADMIN)
+async def reviews_admin_pagination(call: CallbackQuery, cb, is_admin: bool):
+    if not is_admin:
         await call.answer("Недостаточно прав.", show_alert=True)
         return
-    try:
-        page_number = int(call.data.split(":")[2])
-    except (ValueError, IndexError):
-        await call.answer("Неверная страница.", show_alert=True)
-        return
 
-    await _send_reviews_page(call, "admin", page_number)
+    await _send_reviews_page(call, "admin", cb.page)
 
 
-@feedback_router.callback_query(F.data.startswith("reviews:photo:"))
-async def show_review_photo(call: CallbackQuery):
-    _, _, review_id, role, page = call.data.split(":")
-    review = db.get_review(int(review_id))
+@routes.on(REVIEWS_PHOTO)
+async def show_review_photo(call: CallbackQuery, cb, is_admin: bool):
+    review = db.get_review(cb.review_id)
     if not review or not review.get("photo_file_id"):
         await call.answer("Фото не найдено", show_alert=True)
         return
 
-    if role == "admin" and not is_admin(call.from_user.id):
+    if cb.role == "admin" and not is_admin:
         await call.answer("Недостаточно прав.", show_alert=True)
         return
 
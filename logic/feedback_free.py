@@ -1,19 +1,23 @@
 # logic/feedback_free.py
-from aiogram import Router, F, Bot
+from aiogram import Router, F
+from aiogram.filters import StateFilter
 from aiogram.types import Message
-from db_manager.db import Database
-from config import config
-import asyncio
+from utils.deletion_scheduler import DeletionScheduler
+from utils.feedback_inbox import FeedbackInbox
 
-feedback_free_router = Router()
-db = Database()
+feedback_free_router = Router(name="feedback_free")
 
+# Через сколько секунд убрать из чата сообщение пользователя и ответы бота
+CLEANUP_DELAY = 30
 
-@feedback_free_router.message(F.text & ~F.text.startswith('/'))
-async def collect_free_feedback(message: Message, bot: Bot):
+
+# Только вне сценариев FSM: текст посреди создания отзыва или ответа админа сюда не попадает
+@feedback_free_router.message(StateFilter(None), F.text & ~F.text.startswith('/'))
+async def collect_free_feedback(message: Message, deletion_scheduler: DeletionScheduler, feedback_inbox: FeedbackInbox):
     """
     Автоматический сбор обратной связи без FSM и кнопок.
     Любое сообщение, не начинающееся с '/', считается отзывом.
+    Запись в БД и уведомление админов идут пачками через FeedbackInbox.
     """
 
     feedback_text = message.text.strip()
@@ -22,19 +26,10 @@ async def collect_free_feedback(message: Message, bot: Bot):
     if not feedback_text:
         return
 
-    # Сохраняем отзыв в базу
-    db.add_feedback(user_id=message.from_user.id, description=feedback_text, status=0)
-
-    # Уведомляем администраторов
-    for admin_id, _ in db.get_all_admins():
-        try:
-            await bot.send_message(
-                admin_id,
-               f"🆕 Получен новый отзыв:\n\n{feedback_text}"
-                #f"🆕 Получен новый отзыв от @{message.from_user.username or message.from_user.full_name}:\n\n{feedback_text}"
-            )
-        except Exception:
-            pass
+    if not feedback_inbox.submit(message.from_user.id, feedback_text):
+        # Повтор недавнего сообщения: уже приняли и поблагодарили, просто убираем его
+        deletion_scheduler.schedule(message.chat.id, [message.message_id], delay=CLEANUP_DELAY)
+        return
 
     # Благодарим пользователя
     ans_1 = await message.answer(
@@ -44,10 +39,9 @@ async def collect_free_feedback(message: Message, bot: Bot):
         "Если хотите добавить что-то еще — просто напишите сюда!📨"
     )
 
-    # Через 30 секунд очищаем чат
-    await asyncio.sleep(30)
-    for msg in (ans_1, ans_2, message):
-        try:
-            await msg.delete()
-        except Exception:
-            pass
\ No newline at end of file
+    # Чат очистится через CLEANUP_DELAY секунд, хендлер не ждёт
+    deletion_scheduler.schedule(
+        message.chat.id,
+        [message.message_id, ans_1.message_id, ans_2.message_id],
+        delay=CLEANUP_DELAY,
+    )
@@ -1,48 +1,183 @@
 # main.py
 
+# Первым импортом: замеряет время импорта остальных модулей
+from utils.startup import startup
+
 import asyncio
 from aiogram import Bot, Dispatcher
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
 from config import config
-from utils.logger import setup_logging, logger
-from db_manager.db import Database
+from utils.logger import setup_logging, logger, get_logging_stats
+from db_manager.db import get_database
+from db_manager.fsm_storage import DatabaseStorage
+from utils.api_governor import ApiGovernor
+from utils.update_scheduler import UpdateScheduler
+from utils.antiflood import AntiFloodMiddleware
+from utils.permissions import RoleMiddleware
+from utils.deletion_scheduler import DeletionScheduler
+from utils.feedback_inbox import FeedbackInbox
+from utils.photo_dedup import photo_dedup
+from utils.metrics import ApiMetricsMiddleware, HandlerMetricsMiddleware, registry, start_metrics_server
 
 from menu.start_menu import menu_router
 from logic.feedback import feedback_router
 from admin.admin import admin_router
+from admin.owner import owner_router
+from logic.feedback_free import feedback_free_router
+
+startup.mark("imports")
+
+
+def create_bot() -> Bot:
+    session = None
+    if config.api.server_url:
+        # Локальный Bot API сервер или фейковый сервер для нагрузочных тестов
+        session = AiohttpSession(api=TelegramAPIServer.from_base(config.api.server_url))
+    bot = Bot(config.bot.token, session=session)
+    bot.session.middleware(ApiGovernor())
+    # Регистрируется после регулятора, чтобы мерить сам HTTP-вызов без ожидания в очереди
+    bot.session.middleware(ApiMetricsMiddleware())
+    return bot
+
+
+def create_dispatcher() -> Dispatcher:
+    dp = Dispatcher(storage=DatabaseStorage())
+    dp.update.outer_middleware(startup.first_update_middleware)
+    # Анти-флуд раньше планировщика: лишние апдейты не должны занимать очередь
+    dp["antiflood"] = AntiFloodMiddleware()
+    dp["update_scheduler"] = UpdateScheduler()
+    dp.update.outer_middleware(dp["antiflood"])
+    dp.update.outer_middleware(dp["update_scheduler"])
+    # Роль считается один раз на апдейт и приходит в хендлеры как role / is_admin
+    dp.update.outer_middleware(RoleMiddleware())
+    # Отложенное удаление сообщений: хендлеры получают его аргументом deletion_scheduler
+    dp["deletion_scheduler"] = DeletionScheduler()
+    dp["feedback_inbox"] = FeedbackInbox()
+    # Фоновый поиск одинаковых фото; без PHOTO_DEDUP_ENABLED хуки ничего не делают
+    dp.startup.register(photo_dedup.on_startup)
+    dp.shutdown.register(photo_dedup.on_shutdown)
+    # Inner middleware на Dispatcher наследуются всеми подключёнными роутерами
+    dp.message.middleware(HandlerMetricsMiddleware("message"))
+    dp.callback_query.middleware(HandlerMetricsMiddleware("callback_query"))
+    dp.include_router(menu_router)
+    dp.include_router(feedback_router)
+    dp.include_router(admin_router)
+    dp.include_router(owner_router)
+    # Последним: забирает только текст, который не обработал ни один роутер выше
+    dp.include_router(feedback_free_router)
+    return dp
+
+
+def register_runtime_metrics(bot: Bot, dp: Dispatcher) -> None:
+    governor = next(m for m in bot.session.middleware if isinstance(m, ApiGovernor))
+    scheduler = dp["update_scheduler"]
+    storage = dp.storage
+    fsm_states = {"value": 0}
+
+    async def refresh_fsm_states() -> None:
+        fsm_states["value"] = await storage.count_states()
+
+    registry.add_refresher(refresh_fsm_states)
+    registry.gauge("bot_updates_in_flight", "Handlers running right now", lambda: scheduler.stats()["in_flight"])
+    registry.gauge("bot_updates_queued_users", "Users with queued updates", lambda: scheduler.stats()["queued_users"])
+    registry.gauge("bot_updates_dropped_total", "Updates dropped by scheduler", lambda: scheduler.stats()["dropped_total"], kind="counter")
+    registry.gauge("bot_antiflood_blocked_total", "Updates blocked by anti-flood", lambda: dp["antiflood"].blocked_total, kind="counter")
+    registry.gauge("bot_scheduled_deletions", "Messages waiting for scheduled deletion", lambda: dp["deletion_scheduler"].pending())
+    registry.gauge(
+        "bot_feedback", "Free-form feedback ingestion counters",
+        lambda: dp["feedback_inbox"].stats(), labels=("kind",),
+    )
+    registry.gauge("bot_photo_dedup", "Photo dedup pipeline counters", photo_dedup.stats, labels=("kind",))
+    registry.gauge("bot_fsm_states", "Active FSM states in the database", lambda: fsm_states["value"])
+    registry.gauge("bot_fsm_cache_size", "FSM states in the in-process cache", lambda: storage.stats()["cached"])
+    registry.gauge(
+        "bot_api_queue_depth", "Bot API calls waiting for a send slot",
+        lambda: governor.stats()["queue_depth"], labels=("lane",),
+    )
+    registry.gauge("bot_api_throttled_total", "Bot API calls delayed by rate limits", lambda: governor.throttled_total, kind="counter")
+    registry.gauge("bot_api_retry_after_total", "RetryAfter responses from Telegram", lambda: governor.retry_after_total, kind="counter")
+    registry.gauge(
+        "bot_log_records", "Log pipeline counters",
+        lambda: {k: v for k, v in get_logging_stats().items() if k != "avg_write_us"}, labels=("kind",),
+    )
 
 
 async def main():
     setup_logging()
     logger.info("Starting bot application")
+    startup.mark("logging")
 
     # Инициализируем базу данных (автоматически выберет PostgreSQL или SQLite)
-    db = Database()
+    db = get_database()
+    wal_archiver = None
+    db_lock_handle = None
     if db.use_postgres:
         logger.info("Using PostgreSQL database")
     else:
         logger.info(f"Using SQLite database: {db.db_path}")
+        # Держим блокировку до выхода: по ней utils.restore видит, что бот запущен
+        from utils import db_lock
+        try:
+            db_lock_handle = db_lock.acquire(db.db_path)
+        except db_lock.DatabaseLockedError as e:
+            logger.error(f"Cannot start: {e}")
+            return
         # Запускаем периодические бэкапы для SQLite (только если не PostgreSQL)
         from utils.backup import periodic_backup
         backup_task = asyncio.create_task(periodic_backup(db.db_path))
         logger.info(f"SQLite backup system started (every {config.database.backup_interval_hours} hours)")
         logger.info(f"Backups will be saved to: {config.database.backup_dir}")
+        if config.database.wal_archive_enabled:
+            from utils.wal_archive import WalArchiver
+            wal_archiver = WalArchiver(db.db_path)
+            wal_archiver.start()
+            logger.info(f"WAL archiving started (every {config.database.wal_archive_interval} s)")
+    from utils.maintenance import periodic_maintenance
+    maintenance_task = asyncio.create_task(periodic_maintenance(db.db_path))
+    # Индекс похожих отзывов заполняется в фоне, бот принимает апдейты сразу
+    from utils.similarity import review_index
+    similarity_task = asyncio.create_task(asyncio.to_thread(review_index.rebuild, db.db_path))
+    startup.mark("database")
 
-    bot = Bot(config.bot.token)
-    dp = Dispatcher()
+    bot = create_bot()
+    dp = create_dispatcher()
+    startup.mark("bot_and_dispatcher")
 
     logger.bind(bot_id=bot.id).info("Bot instance created")
+    dp["deletion_scheduler"].start(bot)
+    dp["feedback_inbox"].start(bot)
+
+    if config.metrics.enabled:
+        register_runtime_metrics(bot, dp)
+        await start_metrics_server(config.metrics.host, config.metrics.port)
+
+    if config.loop_monitor.enabled:
+        from utils.loop_monitor import LoopLagMonitor
+        LoopLagMonitor(dp).start()
+    startup.mark("monitoring")
+    startup.log_report()
 
-    dp.include_router(menu_router)
-    dp.include_router(feedback_router)
-    dp.include_router(admin_router)
-    
     try:
-        logger.info("Starting bot polling")
-        await dp.start_polling(bot)
+        if config.webhook.enabled:
+            from utils.webhook import run_webhook
+            logger.info("Starting bot in webhook mode")
+            await run_webhook(dp, bot)
+        else:
+            logger.info("Starting bot polling")
+            await dp.start_polling(bot)
     except Exception as e:
-        logger.error("Bot polling failed: {}", str(e))
+        logger.error("Bot failed: {}", str(e))
         raise
     finally:
+        maintenance_task.cancel()
+        similarity_task.cancel()
+        await dp["deletion_scheduler"].stop()
+        await dp["feedback_inbox"].stop()
+        if wal_archiver:
+            wal_archiver.stop()
+        if db_lock_handle:
+            db_lock_handle.close()
         logger.info("Bot shutting down")
 
 
@@ -1,20 +1,37 @@
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 
+from utils.callbacks import (
+    MODERATION_APPROVE,
+    MODERATION_DELETE,
+    MODERATION_QUEUE,
+    MODERATION_REJECT,
+    REVIEW_NEW,
+    REVIEW_RATING,
+    REVIEW_SKIP_MEDIA,
+    REVIEWS_ADMIN,
+    REVIEWS_DELETE,
+    REVIEWS_PAGE,
+    REVIEWS_PHOTO,
+    REVIEWS_REPLY,
+    REVIEWS_USER,
+    WELCOME_EDIT,
+)
+
 
 def user_start_keyboard() -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
-    builder.button(text="📝 Оставить отзыв", callback_data="review:new")
-    builder.button(text="📖 Посмотреть отзывы", callback_data="reviews:user:1")
+    builder.button(text="📝 Оставить отзыв", callback_data=REVIEW_NEW.pack())
+    builder.button(text="📖 Посмотреть отзывы", callback_data=REVIEWS_USER.pack(page=1))
     builder.adjust(1)
     return builder.as_markup()
 
 
 def admin_start_keyboard() -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
-    builder.button(text="✏️ Изменить привет", callback_data="welcome:edit")
-    builder.button(text="📚 Посмотреть отзывы", callback_data="reviews:admin:1")
-    builder.button(text="✅ Модерация отзывов", callback_data="admin:moderation")
+    builder.button(text="✏️ Изменить привет", callback_data=WELCOME_EDIT.pack())
+    builder.button(text="📚 Посмотреть отзывы", callback_data=REVIEWS_ADMIN.pack(page=1))
+    builder.button(text="✅ Модерация отзывов", callback_data=MODERATION_QUEUE.pack())
     builder.adjust(1)
     return builder.as_markup()
 
@@ -22,14 +39,14 @@ def admin_start_keyboard() -> InlineKeyboardMarkup:
 def rating_keyboard() -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     for rate in range(1, 6):
-        builder.button(text=f"{rate}⭐", callback_data=f"review:rating:{rate}")
+        builder.button(text=f"{rate}⭐", callback_data=REVIEW_RATING.pack(rating=rate))
     builder.adjust(5)
     return builder.as_markup()
 
 
 def skip_media_keyboard() -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
-    builder.button(text="Пропустить", callback_data="review:skip_media")
+    builder.button(text="Пропустить", callback_data=REVIEW_SKIP_MEDIA.pack())
     return builder.as_markup()
 
 
@@ -47,18 +64,18 @@ def reviews_keyboard(
             row = [
                 InlineKeyboardButton(
                     text=f"Ответить №{review_id}",
-                    callback_data=f"reviews:reply:{review_id}:{page}",
+                    callback_data=REVIEWS_REPLY.pack(review_id=review_id, page=page),
                 ),
                 InlineKeyboardButton(
                     text=f"🗑️ Удалить №{review_id}",
-                    callback_data=f"reviews:delete:{review_id}:{page}",
+                    callback_data=REVIEWS_DELETE.pack(review_id=review_id, page=page),
                 )
             ]
             if has_photos.get(review_id):
                 row.append(
                     InlineKeyboardButton(
                         text=f"Фото №{review_id}",
-                        callback_data=f"reviews:photo:{review_id}:{role}:{page}",
+                        callback_data=REVIEWS_PHOTO.pack(review_id=review_id, role=role, page=page),
                     )
                 )
             rows.append(row)
@@ -69,7 +86,7 @@ def reviews_keyboard(
                     [
                         InlineKeyboardButton(
                             text=f"Фото №{review_id}",
-                            callback_data=f"reviews:photo:{review_id}:{role}:{page}",
+                            callback_data=REVIEWS_PHOTO.pack(review_id=review_id, role=role, page=page),
                         )
                     ]
                 )
@@ -77,11 +94,11 @@ def reviews_keyboard(
     nav_row: list[InlineKeyboardButton] = []
     if page > 1:
         nav_row.append(
-            InlineKeyboardButton(text="⬅️ Назад", callback_data=f"reviews:{role}:{page-1}")
+            InlineKeyboardButton(text="⬅️ Назад", callback_data=REVIEWS_PAGE[role].pack(page=page - 1))
         )
     if page < total_pages:
         nav_row.append(
-            InlineKeyboardButton(text="Вперед ➡️", callback_data=f"reviews:{role}:{page+1}")
+            InlineKeyboardButton(text="Вперед ➡️", callback_data=REVIEWS_PAGE[role].pack(page=page + 1))
         )
     if nav_row:
         rows.append(nav_row)
@@ -92,8 +109,8 @@ def reviews_keyboard(
 def moderation_keyboard(review_id: int) -> InlineKeyboardMarkup:
     """Клавиатура для модерации отзыва"""
     builder = InlineKeyboardBuilder()
-    builder.button(text="✅ Одобрить", callback_data=f"moderation:approve:{review_id}")
-    builder.button(text="❌ Отклонить", callback_data=f"moderation:reject:{review_id}")
-    builder.button(text="🗑️ Удалить", callback_data=f"moderation:delete:{review_id}")
+    builder.button(text="✅ Одобрить", callback_data=MODERATION_APPROVE.pack(review_id=review_id))
+    builder.button(text="❌ Отклонить", callback_data=MODERATION_REJECT.pack(review_id=review_id))
+    builder.button(text="🗑️ Удалить", callback_data=MODERATION_DELETE.pack(review_id=review_id))
     builder.adjust(1)
     return builder.as_markup()
\ No newline at end of file
@@ -2,12 +2,11 @@ from aiogram import Router
 from aiogram.filters import CommandStart
 from aiogram.types import Message
 
-from db_manager.db import Database
+from db_manager.db import get_database
 from menu.keyboard import admin_start_keyboard, user_start_keyboard
-from utils.permissions import is_admin
 
-menu_router = Router()
-db = Database()
+menu_router = Router(name="menu")
+db = get_database()
 
 
 async def _send_welcome_post(message: Message, keyboard):
@@ -25,9 +24,9 @@ async def _send_welcome_post(message: Message, keyboard):
 
 
 @menu_router.message(CommandStart())
-async def command_start(message: Message) -> None:
+async def command_start(message: Message, is_admin: bool) -> None:
     user = message.from_user
     db.upsert_user(user.id, user.username, user.full_name)
 
-    keyboard = admin_start_keyboard() if is_admin(user.id) else user_start_keyboard()
+    keyboard = admin_start_keyboard() if is_admin else user_start_keyboard()
     await _send_welcome_post(message, keyboard)
\ No newline at end of file
@@ -0,0 +1,10 @@
+import os
+import sys
+
+# config.py читает окружение при импорте: без токена и владельца он не загрузится
+os.environ.setdefault("BOT_TOKEN", "1:test")
+os.environ.setdefault("OWNER_ID", "1")
+# Тесты работают только с временными SQLite-файлами
+os.environ.pop("DATABASE_URL", None)
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,86 @@
+import asyncio
+
+import pytest
+from aiogram.methods import EditMessageText, SendMessage
+
+import utils.api_governor as api_governor
+from utils.api_governor import ApiGovernor
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(api_governor.time, "monotonic", clock)
+    return clock
+
+
+def make_governor(**kwargs) -> ApiGovernor:
+    params = dict(global_rate=1_000_000, private_chat_rate=1.0, group_chat_rate=0.5, chat_burst=3)
+    params.update(kwargs)
+    return ApiGovernor(**params)
+
+
+def test_burst_then_chat_rate(clock):
+    governor = make_governor()
+    waits = [governor._reserve_chat_slot(42) for _ in range(5)]
+    assert waits == [0.0, 0.0, 0.0, 1.0, 2.0]
+
+
+def test_bucket_refills_over_time(clock):
+    governor = make_governor()
+    for _ in range(3):
+        governor._reserve_chat_slot(42)
+    clock.now += 2.0
+    # За 2 секунды при 1 сообщении в секунду вернулось два токена
+    assert [governor._reserve_chat_slot(42) for _ in range(3)] == [0.0, 0.0, 1.0]
+
+
+def test_idle_chat_does_not_bank_more_than_burst(clock):
+    governor = make_governor()
+    governor._reserve_chat_slot(42)
+    clock.now += 3600
+    assert [governor._reserve_chat_slot(42) for _ in range(4)] == [0.0, 0.0, 0.0, 1.0]
+
+
+def test_groups_use_group_rate(clock):
+    governor = make_governor(chat_burst=1)
+    assert [governor._reserve_chat_slot(-100) for _ in range(3)] == [0.0, 2.0, 4.0]
+
+
+def test_chats_are_independent(clock):
+    governor = make_governor(chat_burst=1)
+    governor._reserve_chat_slot(1)
+    assert governor._reserve_chat_slot(2) == 0.0
+
+
+def test_retry_after_empties_bucket(clock):
+    governor = make_governor()
+    governor._pause_chat(42, 5)
+    assert governor._reserve_chat_slot(42) == pytest.approx(5.0)
+
+
+def test_edits_skip_the_chat_bucket():
+    governor = make_governor(chat_burst=1, private_chat_rate=0.001)
+    calls = []
+
+    async def make_request(bot, method):
+        calls.append(type(method).__name__)
+        return True
+
+    async def scenario():
+        await governor(make_request, None, SendMessage(chat_id=42, text="x"))
+        # Бакет чата пуст на ~1000 с, но редактирование не ждёт его
+        await asyncio.wait_for(
+            governor(make_request, None, EditMessageText(chat_id=42, message_id=1, text="y")), timeout=1
+        )
+
+    asyncio.run(scenario())
+    assert calls == ["SendMessage", "EditMessageText"]
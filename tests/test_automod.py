@@ -0,0 +1,93 @@
+import dataclasses
+
+import pytest
+
+from config import config
+from utils.automod import (
+    HOLD,
+    REJECT,
+    AhoCorasick,
+    AutoModerator,
+    CompiledRules,
+    Rule,
+    RuleError,
+    normalize,
+    validate_rule,
+)
+
+
+def test_aho_corasick_finds_overlapping_patterns():
+    automaton = AhoCorasick({"he": [1], "she": [2], "his": [3], "hers": [4]})
+    assert automaton.search("ushers") == {1, 2, 4}
+    assert automaton.search("this") == {3}
+    assert automaton.search("xyz") == set()
+
+
+def test_aho_corasick_matches_brute_force():
+    words = ["аб", "бва", "ва", "абв", "в", "ааб"]
+    automaton = AhoCorasick({word: [i] for i, word in enumerate(words)})
+    text = "ааббвабвааб"
+    assert automaton.search(text) == {i for i, word in enumerate(words) if word in text}
+
+
+def test_normalize_folds_case_and_yo():
+    assert normalize("  ЁЛКА   зелёная ") == "елка зеленая"
+
+
+def test_word_rules_ignore_case_and_yo():
+    rules = CompiledRules([Rule(1, "word", "зелёный", REJECT)])
+    assert [rule.id for rule in rules.match("ЗЕЛЕНЫЙ чай", 5)] == [1]
+
+
+def test_overlapping_regexes_all_fire():
+    rules = CompiledRules([Rule(1, "regex", "кази", HOLD), Rule(2, "regex", "казино", REJECT)])
+    assert [rule.id for rule in rules.match("Лучшее КАЗИНО", 5)] == [1, 2]
+
+
+def test_builtin_and_numeric_rules():
+    rules = CompiledRules(
+        [
+            Rule(1, "link", None, HOLD),
+            Rule(2, "phone", None, HOLD),
+            Rule(3, "rating", "1-2", HOLD),
+            Rule(4, "min_length", "10", HOLD),
+            Rule(5, "max_length", "40", HOLD),
+        ]
+    )
+    assert [rule.id for rule in rules.match("Пишите в t.me/shop_bot", 5)] == [1]
+    assert [rule.id for rule in rules.match("Звоните +7 (999) 123-45-67", 5)] == [2]
+    assert [rule.id for rule in rules.match("Плохо, не советую", 2)] == [3]
+    assert [rule.id for rule in rules.match("Ок", 5)] == [4]
+    assert [rule.id for rule in rules.match("Очень " * 10, 5)] == [5]
+
+
+def test_invalid_rules_are_skipped():
+    rules = CompiledRules([Rule(1, "regex", "(", HOLD), Rule(2, "word", "спам", HOLD)])
+    assert list(rules.rules) == [2]
+
+
+@pytest.mark.parametrize(
+    "kind, pattern, action",
+    [
+        ("word", "спам", "delete"),
+        ("color", "red", HOLD),
+        ("word", None, HOLD),
+        ("word", "   ", HOLD),
+        ("regex", "(", HOLD),
+        ("rating", "a-b", HOLD),
+        ("min_length", "ten", HOLD),
+    ],
+)
+def test_validate_rule_errors(kind, pattern, action):
+    with pytest.raises(RuleError):
+        validate_rule(kind, pattern, action)
+
+
+def test_validate_rule_accepts_builtins_without_pattern():
+    validate_rule("link", None, REJECT)
+
+
+def test_unknown_default_action_is_rejected(monkeypatch):
+    monkeypatch.setattr(config, "automod", dataclasses.replace(config.automod, default_action="aprove"))
+    with pytest.raises(ValueError):
+        AutoModerator()
@@ -0,0 +1,91 @@
+import os
+import sqlite3
+
+import pytest
+
+from utils.backup_store import BackupStore, BackupStoreError
+
+
+def fill(path: str, rows: int, start: int = 0) -> None:
+    connection = sqlite3.connect(path)
+    with connection:
+        connection.execute("CREATE TABLE IF NOT EXISTS t (id INTEGER PRIMARY KEY, payload TEXT)")
+        connection.executemany(
+            "INSERT INTO t (id, payload) VALUES (?, ?)", [(i, f"row {i} " * 20) for i in range(start, start + rows)]
+        )
+    connection.close()
+
+
+def read_rows(path: str) -> list:
+    connection = sqlite3.connect(path)
+    try:
+        return connection.execute("SELECT id, payload FROM t ORDER BY id").fetchall()
+    finally:
+        connection.close()
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = str(tmp_path / "bot.db")
+    fill(path, 500)
+    return path
+
+
+@pytest.fixture
+def store(tmp_path):
+    return BackupStore(root=str(tmp_path / "store"), chunk_kb=4)
+
+
+def test_snapshot_and_restore(store, source, tmp_path):
+    manifest = store.snapshot(source)
+    assert manifest is not None
+    assert len(manifest["chunks"]) > 1
+
+    target = str(tmp_path / "restored.db")
+    store.restore(manifest["id"], target)
+    assert read_rows(target) == read_rows(source)
+    assert not os.path.exists(target + ".part")
+
+
+def test_unchanged_database_is_skipped(store, source):
+    assert store.snapshot(source) is not None
+    assert store.snapshot(source) is None
+    assert len(store.snapshot_ids()) == 1
+
+
+def test_changed_database_reuses_chunks(store, source, tmp_path):
+    first = store.snapshot(source)
+    fill(source, 10, start=500)
+    second = store.snapshot(source)
+    assert second is not None
+    assert second["new_chunks"] < len(second["chunks"])
+
+    # Оба снимка восстанавливаются сами по себе
+    target = str(tmp_path / "first.db")
+    store.restore(first["id"], target)
+    assert len(read_rows(target)) == 500
+    store.restore(second["id"], target)
+    assert len(read_rows(target)) == 510
+
+
+def test_corrupted_chunk_is_detected(store, source, tmp_path):
+    manifest = store.snapshot(source)
+    digest = manifest["chunks"][0]
+    with open(store._chunk_path(digest), "wb") as f:
+        f.write(b"garbage")
+
+    assert store.verify(manifest["id"])[manifest["id"]]
+    target = str(tmp_path / "restored.db")
+    with pytest.raises(BackupStoreError):
+        store.restore(manifest["id"], target)
+    assert not os.path.exists(target)
+
+
+def test_prune_drops_unreferenced_chunks(store, source):
+    store.snapshot(source)
+    fill(source, 200, start=500)
+    latest = store.snapshot(source)
+    result = store.prune(keep_count=1)
+    assert result["snapshots_removed"] == 1
+    assert store.snapshot_ids() == [latest["id"]]
+    assert store.verify() == {latest["id"]: []}
@@ -0,0 +1,70 @@
+import pytest
+
+from utils.callbacks import (
+    MODERATION_APPROVE,
+    MODERATION_QUEUE,
+    REVIEWS_PHOTO,
+    CallbackAction,
+    CallbackDataError,
+    Str,
+    _from_b62,
+    _to_b62,
+    decode,
+)
+
+
+@pytest.mark.parametrize("value", [0, 1, 61, 62, 12345, -7, 2**63 - 1])
+def test_base62_roundtrip(value):
+    assert _from_b62(_to_b62(value)) == value
+
+
+def test_base62_is_compact():
+    assert len(_to_b62(2**63 - 1)) == 11
+
+
+def test_base62_rejects_bad_digit():
+    with pytest.raises(CallbackDataError):
+        _from_b62("1_")
+
+
+def test_pack_and_decode():
+    data = MODERATION_APPROVE.pack(review_id=12345)
+    assert data == "1ma.3D7"
+    payload = decode(data)
+    assert payload.action is MODERATION_APPROVE
+    assert payload.args.review_id == 12345
+
+
+def test_several_fields_and_enum():
+    payload = decode(REVIEWS_PHOTO.pack(review_id=15, role="admin", page=2))
+    assert payload.action is REVIEWS_PHOTO
+    assert tuple(payload.args) == (15, "admin", 2)
+
+
+def test_action_without_fields():
+    assert decode(MODERATION_QUEUE.pack()).action is MODERATION_QUEUE
+    # Лишний хвост у действия без полей — чужой колбэк
+    assert decode(MODERATION_QUEUE.pack() + "x") is None
+
+
+def test_legacy_format_still_decodes():
+    payload = decode("reviews:photo:15:user:2")
+    assert payload.action is REVIEWS_PHOTO
+    assert tuple(payload.args) == (15, "user", 2)
+
+
+def test_broken_fields_give_stale_payload():
+    payload = decode("1ma.!!")
+    assert payload.action is MODERATION_APPROVE
+    assert payload.args is None
+
+
+def test_foreign_data_is_ignored():
+    assert decode("owner_add_admin") is None
+    assert decode(None) is None
+
+
+def test_pack_checks_telegram_limit():
+    action = CallbackAction("test:long", "zz", Str("text"))
+    with pytest.raises(CallbackDataError):
+        action.pack(text="x" * 100)
@@ -0,0 +1,116 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from aiogram.fsm.storage.base import StorageKey
+
+from db_manager.db import Database
+from db_manager.fsm_storage import DatabaseStorage
+
+
+def make_key(user_id: int) -> StorageKey:
+    return StorageKey(bot_id=1, chat_id=user_id, user_id=user_id)
+
+
+@pytest.fixture
+def db(tmp_path):
+    database = Database(path_to_database=str(tmp_path / "fsm.db"))
+    yield database
+    database.close()
+
+
+def make_storage(db, **kwargs) -> DatabaseStorage:
+    params = dict(cache_size=2, ttl_seconds=3600, flush_interval=0.01)
+    params.update(kwargs)
+    return DatabaseStorage(db=db, **params)
+
+
+def test_roundtrip_and_persistence(db):
+    async def scenario():
+        storage = make_storage(db)
+        await storage.set_state(make_key(1), "Review:text")
+        await storage.set_data(make_key(1), {"rating": 5})
+        assert await storage.get_state(make_key(1)) == "Review:text"
+        assert await storage.get_data(make_key(1)) == {"rating": 5}
+        await storage.close()
+
+        # Новое хранилище с пустым кэшем читает сохранённое из БД
+        restored = make_storage(db)
+        assert await restored.get_state(make_key(1)) == "Review:text"
+        assert await restored.get_data(make_key(1)) == {"rating": 5}
+        await restored.close()
+
+    asyncio.run(scenario())
+
+
+def test_cache_is_bounded_lru(db):
+    async def scenario():
+        storage = make_storage(db)
+        for user_id in (1, 2, 3):
+            await storage.set_state(make_key(user_id), f"S{user_id}")
+        await storage.close()
+        assert len(storage._cache) == 2
+        assert list(storage._cache) == [storage.key_builder.build(make_key(u)) for u in (2, 3)]
+
+        # Вытесненный ключ по-прежнему читается — уже из БД
+        assert await storage.get_state(make_key(1)) == "S1"
+        await storage.close()
+
+    asyncio.run(scenario())
+
+
+def test_empty_record_is_deleted(db):
+    async def scenario():
+        storage = make_storage(db)
+        await storage.set_state(make_key(1), "S")
+        await storage.close()
+        await storage.set_state(make_key(1), None)
+        await storage.close()
+        assert db.get_fsm_record(storage.key_builder.build(make_key(1))) is None
+        assert await storage.get_state(make_key(1)) is None
+
+    asyncio.run(scenario())
+
+
+def test_expired_state_is_ignored(db):
+    async def scenario():
+        storage = make_storage(db, ttl_seconds=60)
+        key = storage.key_builder.build(make_key(1))
+        db.save_fsm_records([(key, "S", "{}", time.time() - 120)])
+        assert await storage.get_state(make_key(1)) is None
+
+    asyncio.run(scenario())
+
+
+def test_write_during_slow_read_wins(db, monkeypatch):
+    async def scenario():
+        storage = make_storage(db)
+        key = storage.key_builder.build(make_key(1))
+        db.save_fsm_records([(key, "Old", "{}", time.time())])
+
+        started = threading.Event()
+        release = threading.Event()
+        original = db.get_fsm_record
+
+        def slow_get(record_key):
+            row = original(record_key)
+            started.set()
+            release.wait(5)
+            return row
+
+        monkeypatch.setattr(db, "get_fsm_record", slow_get)
+        reader = asyncio.create_task(storage.get_state(make_key(1)))
+        await asyncio.to_thread(started.wait, 5)
+
+        # Пока читается старая строка, состояние меняют, и его успевают сбросить в БД
+        storage._store(key, None, {})
+        monkeypatch.setattr(db, "get_fsm_record", original)
+        release.set()
+        await storage.close()
+
+        assert await reader is None
+        assert key not in storage._cache
+        assert await storage.get_state(make_key(1)) is None
+
+    asyncio.run(scenario())
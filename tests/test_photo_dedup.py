@@ -0,0 +1,34 @@
+import random
+
+from utils.phash import distance
+from utils.photo_dedup import BKTree
+
+
+def test_distance_counts_differing_bits():
+    assert distance(0, 0) == 0
+    assert distance(0b1011, 0b0001) == 2
+    assert distance(0, (1 << 64) - 1) == 64
+
+
+def test_search_matches_brute_force():
+    rng = random.Random(7)
+    base = [rng.getrandbits(64) for _ in range(20)]
+    # Рядом с каждым базовым хэшем — несколько «пересжатых» копий
+    hashes = base + [value ^ (1 << rng.randrange(64)) ^ (1 << rng.randrange(64)) for value in base for _ in range(5)]
+    tree = BKTree()
+    for item, value in enumerate(hashes):
+        tree.add(value, item)
+    assert len(tree) == len(hashes)
+
+    for query in base + [rng.getrandbits(64) for _ in range(20)]:
+        for radius in (0, 3, 10):
+            expected = sorted((distance(query, value), item) for item, value in enumerate(hashes) if distance(query, value) <= radius)
+            assert sorted(tree.search(query, radius)) == expected
+
+
+def test_equal_hashes_share_a_node():
+    tree = BKTree()
+    tree.add(42, "a")
+    tree.add(42, "b")
+    assert sorted(tree.search(42, 0)) == [(0, "a"), (0, "b")]
+    assert BKTree().search(42, 5) == []
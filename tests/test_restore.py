@@ -0,0 +1,61 @@
+import os
+
+import pytest
+
+from utils import db_lock
+from utils.restore import _swap
+
+
+def write(path: str, content: bytes) -> None:
+    with open(path, "wb") as f:
+        f.write(content)
+
+
+def read(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def test_swap_keeps_previous_database(tmp_path):
+    db_path = str(tmp_path / "bot.db")
+    staging = str(tmp_path / "staging.db")
+    write(db_path, b"old")
+    write(db_path + "-wal", b"old wal")
+    write(db_path + "-shm", b"old shm")
+    write(staging, b"new")
+
+    kept = _swap(staging, db_path)
+
+    assert read(db_path) == b"new"
+    assert not os.path.exists(staging)
+    # Чужой WAL рядом с восстановленной базой не остаётся
+    assert not os.path.exists(db_path + "-wal")
+    assert not os.path.exists(db_path + "-shm")
+    assert read(kept) == b"old"
+    assert read(kept + "-wal") == b"old wal"
+    assert read(kept + "-shm") == b"old shm"
+
+
+def test_swap_into_empty_place(tmp_path):
+    db_path = str(tmp_path / "bot.db")
+    staging = str(tmp_path / "staging.db")
+    write(staging, b"new")
+    assert _swap(staging, db_path) is None
+    assert read(db_path) == b"new"
+
+
+@pytest.mark.skipif(db_lock.fcntl is None, reason="needs fcntl")
+def test_restore_lock_excludes_running_bot(tmp_path):
+    db_path = str(tmp_path / "bot.db")
+    bot = db_lock.acquire(db_path)
+    second_bot = db_lock.acquire(db_path)
+    with pytest.raises(db_lock.DatabaseLockedError):
+        db_lock.acquire(db_path, exclusive=True)
+    db_lock.release(bot)
+    db_lock.release(second_bot)
+
+    restore = db_lock.acquire(db_path, exclusive=True)
+    with pytest.raises(db_lock.DatabaseLockedError):
+        db_lock.acquire(db_path)
+    db_lock.release(restore)
+    db_lock.release(db_lock.acquire(db_path))
@@ -0,0 +1,112 @@
+import time
+from datetime import datetime, timezone
+
+from utils.similarity import (
+    ACCEPT,
+    DUPLICATE,
+    FLAG,
+    SPAM,
+    ReviewSimilarityIndex,
+    _timestamp,
+    minhash,
+    normalize,
+    similarity,
+)
+
+TEXT = "Отличный магазин, быстрая доставка и вежливые продавцы. Рекомендую всем!"
+NEAR = "Отличный магазин, быстрая доставка и очень вежливые продавцы. Рекомендую всем!!!"
+OTHER = "Курьер опоздал на два часа, а посылка пришла мятой. Больше не закажу."
+
+
+def make_index(**overrides) -> ReviewSimilarityIndex:
+    index = ReviewSimilarityIndex()
+    index.threshold = 0.7
+    index.spam_wave_users = 3
+    index.spam_wave_seconds = 3600
+    index.max_docs = 100
+    for name, value in overrides.items():
+        setattr(index, name, value)
+    return index
+
+
+def test_normalize_ignores_case_and_punctuation():
+    assert normalize("  Привет,   МИР!!! ") == "привет мир"
+
+
+def test_minhash_estimates_jaccard():
+    text, near, other = (minhash(normalize(t)) for t in (TEXT, NEAR, OTHER))
+    assert similarity(text, text) == 1.0
+    assert similarity(text, near) > 0.7
+    assert similarity(text, other) < 0.2
+
+
+def test_empty_index_accepts():
+    assert make_index().check(1, TEXT).action == ACCEPT
+
+
+def test_own_repeat_is_duplicate():
+    index = make_index()
+    index.add(10, 1, TEXT)
+    verdict = index.check(1, NEAR)
+    assert (verdict.action, verdict.match_id) == (DUPLICATE, 10)
+    assert index.check(1, TEXT.upper()).score == 1.0
+
+
+def test_other_user_is_flagged_and_wave_is_spam():
+    index = make_index()
+    first = index.check(1, TEXT)
+    index.add(10, 1, TEXT, first)
+
+    second = index.check(2, NEAR)
+    assert (second.action, second.match_id) == (FLAG, 10)
+    index.add(11, 2, NEAR, second)
+    assert index.flag_for(11) == (10, second.score)
+
+    third = index.check(3, TEXT)
+    assert third.action == SPAM
+    assert third.cluster == (10, 11)
+
+
+def test_old_reviews_do_not_form_wave():
+    index = make_index()
+    index.add(10, 1, TEXT, created=time.time() - 7200)
+    assert index.check(2, TEXT).action == ACCEPT
+
+
+def test_short_texts_are_only_checked_per_user():
+    index = make_index()
+    index.add(10, 1, "Всё супер")
+    assert index.check(2, "Всё супер").action == ACCEPT
+    assert index.check(1, "Всё супер").action == DUPLICATE
+
+
+def test_remove_allows_resubmission():
+    index = make_index()
+    index.add(10, 1, TEXT)
+    index.remove(10)
+    assert len(index) == 0
+    assert index.check(1, TEXT).action == ACCEPT
+
+
+def test_retired_review_still_counts_for_wave():
+    index = make_index()
+    index.add(10, 1, TEXT)
+    index.add(11, 2, TEXT)
+    index.retire(10, 11)
+    assert index.check(1, TEXT).action != DUPLICATE
+    assert index.check(3, TEXT).action == SPAM
+
+
+def test_oldest_review_is_evicted():
+    index = make_index(max_docs=2)
+    index.add(10, 1, TEXT)
+    index.add(11, 2, OTHER)
+    index.add(12, 3, "Нормально, но упаковку можно было сделать и получше, честно говоря.")
+    assert len(index) == 2
+    assert index.check(1, TEXT).action == ACCEPT
+
+
+def test_naive_timestamp_is_utc():
+    aware = datetime(2024, 5, 1, 12, 0, tzinfo=timezone.utc).timestamp()
+    assert _timestamp("2024-05-01 12:00:00") == aware
+    assert _timestamp(datetime(2024, 5, 1, 12, 0)) == aware
@@ -0,0 +1,110 @@
+"""
+Анти-флуд на token bucket'ах.
+
+Каждый апдейт списывает токен из общего ведра пользователя и из ведра
+конкретного действия (префикс callback_data или команда). Если токенов нет,
+колбэк получает дешёвый call.answer, а сообщение просто игнорируется —
+до хендлеров и запросов к БД дело не доходит.
+
+Ведро хранится как (tokens, updated_at) и удаляется, как только успело бы
+наполниться заново, поэтому память растёт с числом активных, а не всех
+пользователей.
+"""
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update, User
+
+from config import config
+from utils.callbacks import action_name
+
+# Действие -> (ёмкость ведра, пополнение токенов в секунду)
+ACTION_LIMITS: Dict[str, Tuple[float, float]] = {
+    "reviews:photo": (3, 0.5),
+    "reviews:user": (5, 1.0),
+    "reviews:admin": (5, 1.0),
+    "/start": (3, 0.2),
+}
+
+FLOOD_ANSWER = "Слишком часто, подождите немного ⏳"
+
+
+def _action_of(event: Update) -> Optional[str]:
+    if event.callback_query is not None and event.callback_query.data:
+        data = event.callback_query.data
+        # Свои кнопки — по имени действия из кодека, чужие — по префиксу до второго ':'
+        return action_name(data) or ":".join(data.split(":", 2)[:2])
+    if event.message is not None and event.message.text and event.message.text.startswith("/"):
+        return event.message.text.split(maxsplit=1)[0].split("@", 1)[0]
+    return None
+
+
+class AntiFloodMiddleware(BaseMiddleware):
+    def __init__(
+        self,
+        user_capacity: Optional[float] = None,
+        user_rate: Optional[float] = None,
+        action_limits: Optional[Dict[str, Tuple[float, float]]] = None,
+    ) -> None:
+        cfg = config.antiflood
+        self.user_limit = (user_capacity or cfg.user_capacity, user_rate or cfg.user_rate)
+        self.action_limits = ACTION_LIMITS if action_limits is None else action_limits
+        # (user_id, action) -> (tokens, updated_at); action None — общее ведро пользователя
+        self._buckets: Dict[Tuple[int, Optional[str]], Tuple[float, float]] = {}
+        self._next_sweep = 0.0
+
+        self.blocked_total = 0
+
+    def _take(self, key: Tuple[int, Optional[str]], capacity: float, rate: float, now: float) -> bool:
+        tokens, updated_at = self._buckets.get(key, (capacity, now))
+        tokens = min(capacity, tokens + (now - updated_at) * rate)
+        if tokens < 1:
+            self._buckets[key] = (tokens, now)
+            return False
+        self._buckets[key] = (tokens - 1, now)
+        return True
+
+    def _sweep(self, now: float) -> None:
+        """Удаляет вёдра, которые к этому моменту уже наполнились бы полностью"""
+        expired = []
+        for key, (tokens, updated_at) in self._buckets.items():
+            capacity, rate = self.action_limits.get(key[1], self.user_limit)
+            if tokens + (now - updated_at) * rate >= capacity:
+                expired.append(key)
+        for key in expired:
+            del self._buckets[key]
+        self._next_sweep = now + 60
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any],
+    ) -> Any:
+        user: Optional[User] = data.get("event_from_user")
+        if user is None:
+            return await handler(event, data)
+
+        now = time.monotonic()
+        if now >= self._next_sweep:
+            self._sweep(now)
+
+        allowed = self._take((user.id, None), *self.user_limit, now)
+        action = _action_of(event)
+        if allowed and action in self.action_limits:
+            allowed = self._take((user.id, action), *self.action_limits[action], now)
+
+        if allowed:
+            return await handler(event, data)
+
+        self.blocked_total += 1
+        if event.callback_query is not None:
+            try:
+                await event.callback_query.answer(FLOOD_ANSWER)
+            except Exception:
+                pass
+        return None
+
+    def stats(self) -> Dict[str, int]:
+        return {"buckets": len(self._buckets), "blocked_total": self.blocked_total}
@@ -0,0 +1,207 @@
+"""
+Централизованный регулятор исходящих вызовов Telegram Bot API.
+
+Подключается как middleware сессии бота и пропускает через себя все
+отправки/редактирования сообщений из любых роутеров:
+- глобальный лимит отправок в секунду (общий для всего бота);
+- лимит на один чат (личка и группы отдельно) — токен-бакет: короткая пачка
+  из API_CHAT_BURST сообщений уходит сразу, дальше с частотой чата;
+- приоритетные полосы: интерактивные ответы обслуживаются раньше рассылок;
+- прозрачная обработка RetryAfter (429) — чат или весь бот ставится на паузу,
+  запрос повторяется автоматически.
+"""
+import asyncio
+import heapq
+import itertools
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.exceptions import TelegramRetryAfter
+from loguru import logger
+
+from config import config
+
+# Полосы приоритета: чем меньше число, тем раньше обслуживается запрос
+LANE_INTERACTIVE = 0
+LANE_BROADCAST = 1
+LANE_NAMES = {LANE_INTERACTIVE: "interactive", LANE_BROADCAST: "broadcast"}
+
+_current_lane: ContextVar[int] = ContextVar("api_lane", default=LANE_INTERACTIVE)
+
+# Методы, на которые распространяются лимиты Telegram на отправку сообщений
+_LIMITED_PREFIXES = ("Send", "Edit", "Copy", "Forward")
+# Редактирование не создаёт новых сообщений в чате — на него действует только
+# глобальный лимит (answerCallbackQuery и прочие методы регулятор не трогает вовсе)
+_CHAT_EXEMPT_PREFIXES = ("Edit",)
+
+
+@contextmanager
+def api_lane(lane: int) -> Iterator[None]:
+    """Выполняет вызовы Bot API внутри блока в указанной полосе приоритета"""
+    token = _current_lane.set(lane)
+    try:
+        yield
+    finally:
+        _current_lane.reset(token)
+
+
+def broadcast_lane():
+    """Полоса для массовых рассылок — уступает интерактивным ответам"""
+    return api_lane(LANE_BROADCAST)
+
+
+class _PriorityRateLimiter:
+    """Глобальный ограничитель частоты с очередью по приоритетам"""
+
+    def __init__(self, rate: float) -> None:
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._heap: List[Tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._next_slot = 0.0
+        self._paused_until = 0.0
+        self._wakeup = asyncio.Event()
+        self._pump_task: Optional[asyncio.Task] = None
+
+    def depth(self, lane: int) -> int:
+        return sum(1 for item_lane, _, fut in self._heap if item_lane == lane and not fut.done())
+
+    def pause(self, seconds: float) -> None:
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    async def acquire(self, lane: int) -> None:
+        if self._pump_task is None or self._pump_task.done():
+            self._pump_task = asyncio.create_task(self._pump())
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._heap, (lane, next(self._seq), future))
+        self._wakeup.set()
+        await future
+
+    async def _pump(self) -> None:
+        while True:
+            if not self._heap:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            now = time.monotonic()
+            ready_at = max(self._next_slot, self._paused_until)
+            if ready_at > now:
+                await asyncio.sleep(ready_at - now)
+                continue
+
+            _, _, future = heapq.heappop(self._heap)
+            if future.done():
+                # Ожидающий был отменён — слот не расходуем
+                continue
+            future.set_result(None)
+            self._next_slot = max(now, self._next_slot) + self.interval
+
+
+class ApiGovernor(BaseRequestMiddleware):
+    """Middleware сессии: лимиты отправки, приоритеты и повтор после RetryAfter"""
+
+    def __init__(
+        self,
+        global_rate: Optional[float] = None,
+        private_chat_rate: Optional[float] = None,
+        group_chat_rate: Optional[float] = None,
+        max_retries: Optional[int] = None,
+        chat_burst: Optional[int] = None,
+    ) -> None:
+        cfg = config.api
+        self._global = _PriorityRateLimiter(global_rate or cfg.global_rate)
+        self._private_interval = 1.0 / (private_chat_rate or cfg.private_chat_rate)
+        self._group_interval = 1.0 / (group_chat_rate or cfg.group_chat_rate)
+        self.max_retries = cfg.max_retries if max_retries is None else max_retries
+        self.chat_burst = max(1, cfg.chat_burst if chat_burst is None else chat_burst)
+        # Токен-бакет в форме GCRA: chat_id -> теоретическое время следующей
+        # отправки. Пока оно опережает «сейчас» меньше чем на burst - 1
+        # интервалов, в бакете есть токен и запрос уходит без ожидания.
+        self._chat_tat: Dict[Any, float] = {}
+
+        self.requests_total = 0
+        self.throttled_total = 0
+        self.retry_after_total = 0
+        self.wait_seconds_total = 0.0
+
+    def _chat_interval(self, chat_id: Any) -> float:
+        # Отрицательные ID и @username — группы и каналы
+        if isinstance(chat_id, str) or (isinstance(chat_id, int) and chat_id < 0):
+            return self._group_interval
+        return self._private_interval
+
+    def _reserve_chat_slot(self, chat_id: Any) -> float:
+        """Берёт токен из бакета чата и возвращает, сколько нужно подождать"""
+        now = time.monotonic()
+        if len(self._chat_tat) > 10_000:
+            self._chat_tat = {k: v for k, v in self._chat_tat.items() if v > now}
+        interval = self._chat_interval(chat_id)
+        tat = max(now, self._chat_tat.get(chat_id, now))
+        slot = max(now, tat - (self.chat_burst - 1) * interval)
+        self._chat_tat[chat_id] = tat + interval
+        return slot - now
+
+    def _pause_chat(self, chat_id: Any, seconds: float) -> None:
+        """После RetryAfter бакет чата пуст до конца паузы"""
+        interval = self._chat_interval(chat_id)
+        self._chat_tat[chat_id] = time.monotonic() + seconds + (self.chat_burst - 1) * interval
+
+    async def _acquire(self, chat_id: Any, lane: int, per_chat: bool) -> None:
+        started = time.monotonic()
+        if chat_id is not None and per_chat:
+            delay = self._reserve_chat_slot(chat_id)
+            if delay > 0:
+                await asyncio.sleep(delay)
+        await self._global.acquire(lane)
+        waited = time.monotonic() - started
+        if waited > 0.001:
+            self.throttled_total += 1
+            self.wait_seconds_total += waited
+
+    async def __call__(self, make_request, bot, method):
+        name = type(method).__name__
+        if not name.startswith(_LIMITED_PREFIXES):
+            return await make_request(bot, method)
+
+        chat_id = getattr(method, "chat_id", None)
+        per_chat = not name.startswith(_CHAT_EXEMPT_PREFIXES)
+        lane = _current_lane.get()
+        attempt = 0
+        while True:
+            await self._acquire(chat_id, lane, per_chat)
+            self.requests_total += 1
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                self.retry_after_total += 1
+                attempt += 1
+                logger.bind(
+                    event_type="api_retry_after",
+                    method=name,
+                    chat_id=chat_id,
+                    retry_after=e.retry_after,
+                    lane=LANE_NAMES.get(lane, lane),
+                ).warning("Telegram flood control, retrying")
+                if attempt > self.max_retries:
+                    raise
+                if chat_id is not None and per_chat:
+                    self._pause_chat(chat_id, e.retry_after)
+                elif chat_id is not None:
+                    # Редактирование бакет чата не проходит — ждём паузу здесь
+                    await asyncio.sleep(e.retry_after)
+                else:
+                    self._global.pause(e.retry_after)
+
+    def stats(self) -> Dict[str, Any]:
+        """Метрики регулятора: глубина очередей и счётчики троттлинга"""
+        return {
+            "queue_depth": {name: self._global.depth(lane) for lane, name in LANE_NAMES.items()},
+            "requests_total": self.requests_total,
+            "throttled_total": self.throttled_total,
+            "retry_after_total": self.retry_after_total,
+            "wait_seconds_total": round(self.wait_seconds_total, 3),
+            "tracked_chats": len(self._chat_tat),
+        }
@@ -0,0 +1,274 @@
+"""
+Автомодерация новых отзывов.
+
+Правила хранятся в таблице moderation_rules и редактируются владельцем
+(/rules, /rule_add, /rule_del). Каждое правило — вид, параметр и действие:
+
+    word        подстрока (стоп-слово или фраза, без учёта регистра и ё/е)
+    regex       регулярное выражение
+    link        ссылка, домен или @username (параметр не нужен)
+    phone       номер телефона (параметр не нужен)
+    rating      оценка в диапазоне, например 1-2 или 5
+    min_length  текст короче N символов
+    max_length  текст длиннее N символов
+
+Действия: approve — опубликовать без модератора, hold — оставить в очереди,
+reject — сразу в архив. Если сработало несколько правил, побеждает самое
+строгое (reject > hold > approve); если ни одного — AUTOMOD_DEFAULT_ACTION.
+
+Правила компилируются один раз: все стоп-слова — в один автомат
+Ахо-Корасик (проход по тексту линеен и не зависит от длины списка), каждое
+регулярное выражение — отдельно и проверяется своим search: так срабатывают
+все подходящие правила, даже если их совпадения перекрываются. Линейное время
+гарантировано только для стоп-слов и встроенных видов: цена regex-правил
+растёт с их числом, а выражение с вложенными квантификаторами вроде (a+)+
+может работать экспоненциально долго — такие владелец добавляет на свой риск.
+
+Раз в AUTOMOD_RELOAD_SECONDS модератор сверяет версию правил в БД,
+пересобирает их при изменении и сбрасывает туда счётчики срабатываний.
+"""
+import re
+import time
+from collections import Counter
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from loguru import logger
+
+from config import config
+
+APPROVE = "approve"
+HOLD = "hold"
+REJECT = "reject"
+ACTIONS = (APPROVE, HOLD, REJECT)
+_SEVERITY = {APPROVE: 0, HOLD: 1, REJECT: 2}
+
+KINDS = ("word", "regex", "link", "phone", "rating", "min_length", "max_length")
+# Виды без параметра
+BUILTIN_KINDS = ("link", "phone")
+
+_LINK = re.compile(
+    r"(?:https?://|www\.)\S+"
+    r"|\bt\.me/\S+"
+    r"|\b[\w-]+\.(?:ru|com|net|org|рф|su|io|me|info|biz|xyz|top|online|shop|site)\b"
+    r"|(?<!\w)@[A-Za-z][A-Za-z0-9_]{4,}",
+    re.IGNORECASE,
+)
+# Разделители — не больше двух символов между цифрами: без долгих возвратов на длинных строках
+_PHONE = re.compile(r"\+?\d(?:[\s\-().]{0,2}\d){9,}")
+
+
+def normalize(text: str) -> str:
+    return " ".join(text.lower().replace("ё", "е").split())
+
+
+class Rule(NamedTuple):
+    id: int
+    kind: str
+    pattern: Optional[str]
+    action: str
+
+    def describe(self) -> str:
+        return f"{self.kind} {self.pattern}" if self.pattern else self.kind
+
+
+class Decision(NamedTuple):
+    action: str
+    rules: Tuple[Rule, ...] = ()
+
+
+class RuleError(ValueError):
+    pass
+
+
+def parse_range(pattern: str) -> Tuple[int, int]:
+    low, _, high = pattern.partition("-")
+    try:
+        low_value = int(low)
+        high_value = int(high) if high else low_value
+    except ValueError:
+        raise RuleError(f"bad range {pattern!r}")
+    return low_value, high_value
+
+
+def validate_rule(kind: str, pattern: Optional[str], action: str) -> None:
+    """Проверить правило до записи в БД; RuleError с причиной"""
+    if action not in ACTIONS:
+        raise RuleError(f"unknown action {action!r}")
+    if kind not in KINDS:
+        raise RuleError(f"unknown kind {kind!r}")
+    if kind in BUILTIN_KINDS:
+        return
+    if not pattern:
+        raise RuleError(f"{kind} needs a parameter")
+    if kind == "word" and not normalize(pattern):
+        raise RuleError("empty word")
+    if kind == "regex":
+        try:
+            re.compile(pattern)
+        except re.error as e:
+            raise RuleError(f"bad regex: {e}")
+    if kind == "rating":
+        parse_range(pattern)
+    if kind in ("min_length", "max_length") and not pattern.isdigit():
+        raise RuleError(f"{kind} needs a number")
+
+
+class AhoCorasick:
+    """Автомат Ахо-Корасик: все вхождения набора подстрок за один проход по тексту"""
+
+    def __init__(self, patterns: Dict[str, Iterable[int]]) -> None:
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[Set[int]] = [set()]
+        for pattern, values in patterns.items():
+            state = 0
+            for char in pattern:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append(set())
+                state = next_state
+            self._out[state].update(values)
+
+        # Ссылки неудач — обходом в ширину; выходы наследуются по ним
+        queue = list(self._goto[0].values())
+        for state in queue:
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(char, 0)
+                self._fail[next_state] = target if target != next_state else 0
+                self._out[next_state] |= self._out[self._fail[next_state]]
+
+    def search(self, text: str) -> Set[int]:
+        goto, fail, out = self._goto, self._fail, self._out
+        found: Set[int] = set()
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if out[state]:
+                found |= out[state]
+        return found
+
+
+class CompiledRules:
+    def __init__(self, rules: Iterable[Rule]) -> None:
+        self.rules: Dict[int, Rule] = {}
+        words: Dict[str, List[int]] = {}
+        self._regexes: List[Tuple[re.Pattern, int]] = []
+        self._builtin: List[Tuple[re.Pattern, int]] = []
+        self._ratings: List[Tuple[int, int, int]] = []
+        self._min_length: List[Tuple[int, int]] = []
+        self._max_length: List[Tuple[int, int]] = []
+
+        for rule in rules:
+            try:
+                validate_rule(rule.kind, rule.pattern, rule.action)
+            except RuleError as e:
+                logger.warning(f"Moderation rule #{rule.id} skipped: {e}")
+                continue
+            self.rules[rule.id] = rule
+            if rule.kind == "word":
+                words.setdefault(normalize(rule.pattern), []).append(rule.id)
+            elif rule.kind == "regex":
+                self._regexes.append((re.compile(rule.pattern, re.IGNORECASE), rule.id))
+            elif rule.kind == "link":
+                self._builtin.append((_LINK, rule.id))
+            elif rule.kind == "phone":
+                self._builtin.append((_PHONE, rule.id))
+            elif rule.kind == "rating":
+                self._ratings.append((*parse_range(rule.pattern), rule.id))
+            elif rule.kind == "min_length":
+                self._min_length.append((int(rule.pattern), rule.id))
+            elif rule.kind == "max_length":
+                self._max_length.append((int(rule.pattern), rule.id))
+
+        self._words = AhoCorasick(words) if words else None
+
+    def match(self, text: str, rating: int) -> List[Rule]:
+        hits: Set[int] = set()
+        normalized = normalize(text)
+        if self._words:
+            hits |= self._words.search(normalized)
+        for pattern, rule_id in self._regexes + self._builtin:
+            if pattern.search(text):
+                hits.add(rule_id)
+        hits.update(rule_id for low, high, rule_id in self._ratings if low <= rating <= high)
+        length = len(normalized)
+        hits.update(rule_id for limit, rule_id in self._min_length if length < limit)
+        hits.update(rule_id for limit, rule_id in self._max_length if length > limit)
+        return [self.rules[rule_id] for rule_id in sorted(hits)]
+
+
+class AutoModerator:
+    def __init__(self) -> None:
+        cfg = config.automod
+        self.enabled = cfg.enabled
+        if cfg.default_action not in ACTIONS:
+            # Опечатка молча превратилась бы в неизвестное действие — не запускаемся
+            raise ValueError(f"AUTOMOD_DEFAULT_ACTION must be one of {', '.join(ACTIONS)}, got {cfg.default_action!r}")
+        self.default_action = cfg.default_action
+        self.reload_seconds = cfg.reload_seconds
+        self._compiled: Optional[CompiledRules] = None
+        self._version: Optional[Tuple[int, float]] = None
+        self._checked_at = 0.0
+        self._hits: Counter = Counter()
+
+    def evaluate(self, text: str, rating: int) -> Decision:
+        if not self.enabled:
+            return Decision(HOLD)
+        rules = self._rules().match(text, rating)
+        if not rules:
+            return Decision(self.default_action)
+        self._hits.update(rule.id for rule in rules)
+        action = max((rule.action for rule in rules), key=_SEVERITY.__getitem__)
+        return Decision(action, tuple(rules))
+
+    def invalidate(self) -> None:
+        self._checked_at = 0.0
+
+    def pending_hits(self) -> Dict[int, int]:
+        return dict(self._hits)
+
+    def _rules(self) -> CompiledRules:
+        if self._compiled is None or time.monotonic() - self._checked_at > self.reload_seconds:
+            self._refresh()
+        return self._compiled
+
+    def _refresh(self) -> None:
+        # БД импортируем здесь, как и в admin_registry: db_manager.db импортирует utils
+        from db_manager.db import get_database
+
+        db = get_database()
+        self._checked_at = time.monotonic()
+        try:
+            if self._hits:
+                hits, self._hits = self._hits, Counter()
+                try:
+                    db.add_moderation_rule_hits([(count, rule_id) for rule_id, count in hits.items()])
+                except Exception:
+                    # Не записали — возвращаем, к ним добавятся срабатывания за это время
+                    self._hits.update(hits)
+                    raise
+            version = db.moderation_rules_version()
+            if self._compiled is not None and version == self._version:
+                return
+            rows = db.get_moderation_rules()
+        except Exception as e:
+            logger.error(f"Не удалось обновить правила автомодерации: {e}")
+            if self._compiled is None:
+                self._compiled = CompiledRules(())
+            return
+        self._compiled = CompiledRules(Rule(row["id"], row["kind"], row["pattern"], row["action"]) for row in rows)
+        self._version = version
+        logger.info(f"Loaded {len(self._compiled.rules)} moderation rules")
+
+
+automod = AutoModerator()
@@ -3,13 +3,79 @@
 Для PostgreSQL бэкапы не требуются, так как Railway автоматически делает их.
 """
 import os
-import shutil
+import sqlite3
+import time
 import asyncio
 from datetime import datetime
 from pathlib import Path
 from loguru import logger
 from config import config
 
+# После стольких перезапусков копирования (БД менялась во время шага) снимаем
+# паузы, иначе на активной базе медленный бэкап может не закончиться никогда
+MAX_THROTTLED_RESTARTS = 3
+
+
+class BackupError(Exception):
+    pass
+
+
+def online_backup(
+    db_path: str,
+    target_path: str,
+    pages_per_step: int | None = None,
+    step_pause_ms: float | None = None,
+) -> dict:
+    """
+    Копирует живую базу через SQLite backup API и проверяет копию.
+
+    Выполняется синхронно — вызывать в рабочем потоке. Копия собирается во
+    временном файле и появляется под target_path только после integrity_check,
+    поэтому битый или недописанный бэкап не может оказаться среди готовых.
+    """
+    if pages_per_step is None:
+        pages_per_step = config.database.backup_pages_per_step
+    if step_pause_ms is None:
+        step_pause_ms = config.database.backup_step_pause_ms
+
+    partial_path = target_path + ".part"
+    state = {"remaining": None, "restarts": 0, "pause": step_pause_ms / 1000, "steps": 0}
+
+    def progress(status: int, remaining: int, total: int) -> None:
+        # Если источник изменили другим соединением, SQLite начинает копирование заново
+        if state["remaining"] is not None and remaining > state["remaining"]:
+            state["restarts"] += 1
+            if state["restarts"] >= MAX_THROTTLED_RESTARTS:
+                state["pause"] = 0
+        state["remaining"] = remaining
+        state["steps"] += 1
+        if state["pause"] and remaining:
+            time.sleep(state["pause"])
+
+    started = time.monotonic()
+    source = sqlite3.connect(Path(db_path).resolve().as_uri() + "?mode=ro", uri=True)
+    target = sqlite3.connect(partial_path)
+    try:
+        source.backup(target, pages=pages_per_step, progress=progress)
+        result = target.execute("PRAGMA integrity_check").fetchall()
+        page_count = target.execute("PRAGMA page_count").fetchone()[0]
+    finally:
+        target.close()
+        source.close()
+
+    if [tuple(row) for row in result] != [("ok",)]:
+        os.remove(partial_path)
+        raise BackupError(f"integrity_check failed: {result[:5]}")
+
+    os.replace(partial_path, target_path)
+    return {
+        "pages": page_count,
+        "steps": state["steps"],
+        "restarts": state["restarts"],
+        "seconds": round(time.monotonic() - started, 2),
+        "bytes": os.path.getsize(target_path),
+    }
+
 
 async def backup_sqlite_database(db_path: str, backup_dir: str | None = None) -> str | None:
     """
@@ -39,9 +105,12 @@ async def backup_sqlite_database(db_path: str, backup_dir: str | None = None) ->
     backup_path = os.path.join(backup_dir, backup_filename)
     
     try:
-        # Копируем файл базы данных
-        shutil.copy2(db_path, backup_path)
-        logger.info(f"Бэкап создан: {backup_path}")
+        # Копируем онлайн-бэкапом в рабочем потоке: цикл событий не блокируется,
+        # а копия согласована, даже если бот пишет в базу во время копирования
+        stats = await asyncio.to_thread(online_backup, db_path, backup_path)
+        logger.bind(event_type="backup", **stats).info(
+            f"Бэкап создан: {backup_path} ({stats['bytes'] // 1024} КБ за {stats['seconds']} с)"
+        )
         
         # Удаляем старые бэкапы
         cleanup_old_backups(backup_dir, keep_count=config.database.backup_keep_count)
@@ -82,9 +151,47 @@ def cleanup_old_backups(backup_dir: str, keep_count: int = 10) -> None:
         logger.error(f"Ошибка при очистке старых бэкапов: {e}")
 
 
+async def incremental_backup(db_path: str, store=None) -> dict | None:
+    """
+    Снимок в хранилище с дедупликацией (utils.backup_store) и очистка старых снимков.
+    Возвращает манифест или None, если база не менялась или произошла ошибка.
+    """
+    from utils.backup_store import BackupStore
+
+    if not os.path.exists(db_path):
+        logger.warning(f"База данных не найдена: {db_path}")
+        return None
+
+    try:
+        store = store or BackupStore()
+        manifest = await asyncio.to_thread(store.snapshot, db_path)
+        if manifest is None:
+            logger.info("Бэкап пропущен: база не менялась с последнего снимка")
+            return None
+        pruned = await asyncio.to_thread(store.prune)
+        if config.database.wal_archive_enabled:
+            from utils.wal_archive import prune_timelines
+            pruned["timelines_removed"] = await asyncio.to_thread(prune_timelines, store)
+        logger.bind(
+            event_type="backup",
+            snapshot=manifest["id"],
+            size=manifest["size"],
+            new_chunks=manifest["new_chunks"],
+            new_bytes=manifest["new_bytes"],
+            **pruned,
+        ).info(
+            f"Снимок {manifest['id']}: {manifest['size'] // 1024} КБ базы, "
+            f"записано {manifest['new_bytes'] // 1024} КБ новых данных"
+        )
+        return manifest
+    except Exception as e:
+        logger.error(f"Ошибка при создании инкрементального бэкапа: {e}")
+        return None
+
+
 async def periodic_backup(db_path: str, interval_hours: int | None = None) -> None:
     """
-    Периодическое создание бэкапов.
+    Периодическое создание бэкапов (инкрементальные снимки в BACKUP_DIR/store).
     
     Args:
         db_path: Путь к файлу базы данных
@@ -96,7 +203,7 @@ async def periodic_backup(db_path: str, interval_hours: int | None = None) -> No
     while True:
         try:
             await asyncio.sleep(interval_hours * 3600)  # Конвертируем часы в секунды
-            await backup_sqlite_database(db_path)
+            await incremental_backup(db_path)
         except Exception as e:
             logger.error(f"Ошибка в периодическом бэкапе: {e}")
             await asyncio.sleep(3600)  # Ждем час перед повтором при ошибке
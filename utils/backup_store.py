@@ -0,0 +1,351 @@
+"""
+Инкрементальное хранилище бэкапов SQLite с дедупликацией.
+
+Снимок базы (онлайн-бэкап из utils.backup) режется на куски фиксированного
+размера. Каждый кусок хранится один раз под своим SHA-256 в сжатом виде
+(chunks/ab/abcd...), а снимок — это манифест со списком хэшей кусков.
+Неизменившиеся страницы между снимками не пишутся повторно, поэтому место на
+диске растёт с объёмом изменений, а не с размером базы × число снимков.
+Любой снимок восстанавливается самостоятельно, без проигрывания цепочки.
+
+Если содержимое не изменилось с последнего снимка, новый не создаётся. Чтобы
+не копировать базу зря, сначала сравнивается отпечаток файлов (счётчик
+изменений из заголовка SQLite, размер и mtime базы и её -wal) с записанным в
+последнем манифесте; совпал — база не менялась, копия не снимается.
+
+    python -m utils.backup_store list
+    python -m utils.backup_store verify [SNAPSHOT_ID] [--deep]
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import zlib
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from loguru import logger
+
+from config import config
+from utils.backup import online_backup
+
+
+class BackupStoreError(Exception):
+    pass
+
+
+def _source_state(db_path: str) -> list:
+    """
+    Отпечаток базы без чтения содержимого. PRAGMA data_version тут не подходит:
+    она сравнима только в пределах одного соединения, а снимки снимаются
+    разными. Любая запись меняет -wal (в режиме WAL) или сам файл и его счётчик.
+    """
+    state: list = []
+    for suffix in ("", "-wal"):
+        try:
+            stat = os.stat(db_path + suffix)
+        except FileNotFoundError:
+            state.append(None)
+            continue
+        state.append([stat.st_size, stat.st_mtime_ns])
+    with open(db_path, "rb") as f:
+        header = f.read(28)
+    # Смещение 24: file change counter
+    state.append(int.from_bytes(header[24:28], "big"))
+    return state
+
+
+class BackupStore:
+    def __init__(self, root: Optional[str] = None, chunk_kb: Optional[int] = None, compress_level: int = 6) -> None:
+        self.root = root or os.path.join(config.database.backup_dir, "store")
+        self.chunk_size = (chunk_kb or config.database.backup_chunk_kb) * 1024
+        self.compress_level = compress_level
+        self.chunks_dir = os.path.join(self.root, "chunks")
+        self.snapshots_dir = os.path.join(self.root, "snapshots")
+        os.makedirs(self.chunks_dir, exist_ok=True)
+        os.makedirs(self.snapshots_dir, exist_ok=True)
+
+    # --- Куски ---
+    def _chunk_path(self, digest: str) -> str:
+        return os.path.join(self.chunks_dir, digest[:2], digest)
+
+    def _write_chunk(self, digest: str, data: bytes) -> int:
+        """Сохраняет кусок, если его ещё нет; возвращает записанные байты"""
+        path = self._chunk_path(digest)
+        if os.path.exists(path):
+            return 0
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        packed = zlib.compress(data, self.compress_level)
+        partial = path + ".part"
+        with open(partial, "wb") as f:
+            f.write(packed)
+        os.replace(partial, path)
+        return len(packed)
+
+    def _read_chunk(self, digest: str) -> bytes:
+        try:
+            with open(self._chunk_path(digest), "rb") as f:
+                data = zlib.decompress(f.read())
+        except FileNotFoundError:
+            raise BackupStoreError(f"chunk {digest} is missing")
+        except zlib.error as e:
+            raise BackupStoreError(f"chunk {digest} is corrupted: {e}")
+        if hashlib.sha256(data).hexdigest() != digest:
+            raise BackupStoreError(f"chunk {digest} does not match its hash")
+        return data
+
+    # --- Манифесты ---
+    def _manifest_path(self, snapshot_id: str) -> str:
+        return os.path.join(self.snapshots_dir, f"{snapshot_id}.json.gz")
+
+    def _write_manifest(self, manifest: dict) -> None:
+        path = self._manifest_path(manifest["id"])
+        partial = path + ".part"
+        with gzip.open(partial, "wt", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        os.replace(partial, path)
+
+    def load(self, snapshot_id: str) -> dict:
+        try:
+            with gzip.open(self._manifest_path(snapshot_id), "rt", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise BackupStoreError(f"snapshot {snapshot_id} not found")
+
+    def snapshot_ids(self) -> List[str]:
+        return sorted(
+            name[: -len(".json.gz")] for name in os.listdir(self.snapshots_dir) if name.endswith(".json.gz")
+        )
+
+    def latest(self) -> Optional[dict]:
+        ids = self.snapshot_ids()
+        return self.load(ids[-1]) if ids else None
+
+    # --- Снимки ---
+    def snapshot(self, db_path: str) -> Optional[dict]:
+        """
+        Снимает базу и сохраняет новые куски. Синхронно, вызывать в рабочем потоке.
+        Возвращает манифест или None, если база не менялась с последнего снимка.
+        """
+        # Отпечаток — до копирования: запись во время бэкапа попадёт в следующий снимок
+        source = os.path.abspath(db_path)
+        state = _source_state(db_path)
+        latest = self.latest()
+        if latest and latest.get("source") == source and latest.get("source_state") == state:
+            return None
+
+        now = datetime.now()
+        snapshot_id = now.strftime("%Y%m%d_%H%M%S")
+        while os.path.exists(self._manifest_path(snapshot_id)):
+            snapshot_id += "_"
+
+        fd, copy_path = tempfile.mkstemp(prefix="snapshot-", suffix=".db", dir=self.root)
+        os.close(fd)
+        try:
+            backup_stats = online_backup(db_path, copy_path)
+            manifest = self._store_file(copy_path)
+        finally:
+            if os.path.exists(copy_path):
+                os.remove(copy_path)
+
+        if latest and latest["sha256"] == manifest["sha256"]:
+            # Файлы трогали (например, checkpoint), а данные те же — запоминаем новый отпечаток
+            latest.update(source=source, source_state=state)
+            self._write_manifest(latest)
+            return None
+
+        manifest.update(
+            id=snapshot_id,
+            created_at=now.isoformat(timespec="seconds"),
+            source=source,
+            source_state=state,
+            backup_seconds=backup_stats["seconds"],
+        )
+        self._write_manifest(manifest)
+        return manifest
+
+    def _store_file(self, path: str) -> dict:
+        whole = hashlib.sha256()
+        chunks: List[str] = []
+        new_chunks = 0
+        new_bytes = 0
+        size = 0
+        with open(path, "rb") as f:
+            while True:
+                data = f.read(self.chunk_size)
+                if not data:
+                    break
+                size += len(data)
+                whole.update(data)
+                digest = hashlib.sha256(data).hexdigest()
+                written = self._write_chunk(digest, data)
+                if written:
+                    new_chunks += 1
+                    new_bytes += written
+                chunks.append(digest)
+        return {
+            "size": size,
+            "sha256": whole.hexdigest(),
+            "chunk_size": self.chunk_size,
+            "chunks": chunks,
+            "new_chunks": new_chunks,
+            "new_bytes": new_bytes,
+        }
+
+    # --- Восстановление и проверка ---
+    def restore(self, snapshot_id: str, target_path: str) -> dict:
+        """
+        Собирает снимок в target_path. Файл появляется только после сверки
+        хэша и integrity_check, до этого сборка идёт в target_path.part.
+        """
+        manifest = self.load(snapshot_id)
+        partial = target_path + ".part"
+        whole = hashlib.sha256()
+        with open(partial, "wb") as f:
+            for digest in manifest["chunks"]:
+                data = self._read_chunk(digest)
+                whole.update(data)
+                f.write(data)
+        try:
+            if whole.hexdigest() != manifest["sha256"]:
+                raise BackupStoreError(f"snapshot {snapshot_id}: restored file hash mismatch")
+            _check_integrity(partial)
+        except Exception:
+            os.remove(partial)
+            raise
+        os.replace(partial, target_path)
+        return manifest
+
+    def verify(self, snapshot_id: Optional[str] = None, deep: bool = False) -> Dict[str, List[str]]:
+        """
+        Проверяет снимки (один или все): наличие и хэши всех кусков.
+        deep=True дополнительно собирает каждый снимок во временный файл и
+        прогоняет integrity_check. Возвращает {snapshot_id: [ошибки]}.
+        """
+        ids = [snapshot_id] if snapshot_id else self.snapshot_ids()
+        checked: Dict[str, Optional[str]] = {}
+        problems: Dict[str, List[str]] = {}
+        for sid in ids:
+            errors: List[str] = []
+            try:
+                manifest = self.load(sid)
+            except Exception as e:
+                problems[sid] = [str(e)]
+                continue
+            for digest in manifest["chunks"]:
+                # Общие куски проверяем один раз на все снимки
+                if digest not in checked:
+                    try:
+                        self._read_chunk(digest)
+                        checked[digest] = None
+                    except BackupStoreError as e:
+                        checked[digest] = str(e)
+                if checked[digest]:
+                    errors.append(checked[digest])
+            if deep and not errors:
+                fd, path = tempfile.mkstemp(prefix="verify-", suffix=".db", dir=self.root)
+                os.close(fd)
+                try:
+                    self.restore(sid, path)
+                except Exception as e:
+                    errors.append(str(e))
+                finally:
+                    if os.path.exists(path):
+                        os.remove(path)
+            problems[sid] = errors
+        return problems
+
+    # --- Очистка ---
+    def prune(self, keep_count: Optional[int] = None) -> dict:
+        """Оставляет keep_count последних снимков и удаляет куски, на которые никто не ссылается"""
+        if keep_count is None:
+            keep_count = config.database.backup_keep_count
+        ids = self.snapshot_ids()
+        removed = ids[:-keep_count] if keep_count > 0 else []
+        for sid in removed:
+            os.remove(self._manifest_path(sid))
+
+        referenced = set()
+        for sid in self.snapshot_ids():
+            referenced.update(self.load(sid)["chunks"])
+        freed = 0
+        for subdir in os.listdir(self.chunks_dir):
+            directory = os.path.join(self.chunks_dir, subdir)
+            for name in os.listdir(directory):
+                if name not in referenced:
+                    path = os.path.join(directory, name)
+                    freed += os.path.getsize(path)
+                    os.remove(path)
+        return {"snapshots_removed": len(removed), "bytes_freed": freed}
+
+    def usage(self) -> dict:
+        stored = 0
+        chunks = 0
+        for subdir in os.listdir(self.chunks_dir):
+            directory = os.path.join(self.chunks_dir, subdir)
+            for name in os.listdir(directory):
+                stored += os.path.getsize(os.path.join(directory, name))
+                chunks += 1
+        return {"chunks": chunks, "stored_bytes": stored}
+
+
+def _check_integrity(path: str) -> None:
+    connection = sqlite3.connect(path)
+    try:
+        result = connection.execute("PRAGMA integrity_check").fetchall()
+    finally:
+        connection.close()
+    if [tuple(row) for row in result] != [("ok",)]:
+        raise BackupStoreError(f"integrity_check failed: {result[:5]}")
+
+
+def _cmd_list(store: BackupStore, args) -> int:
+    usage = store.usage()
+    logical = 0
+    for sid in store.snapshot_ids():
+        manifest = store.load(sid)
+        logical += manifest["size"]
+        print(
+            f"{sid}  {manifest['created_at']}  size={manifest['size'] // 1024} KB  "
+            f"new={manifest['new_chunks']} chunks / {manifest['new_bytes'] // 1024} KB"
+        )
+    print(f"\nstored {usage['stored_bytes'] // 1024} KB in {usage['chunks']} chunks for {logical // 1024} KB of snapshots")
+    return 0
+
+
+def _cmd_verify(store: BackupStore, args) -> int:
+    problems = store.verify(args.snapshot_id, deep=args.deep)
+    failed = 0
+    for sid, errors in problems.items():
+        if errors:
+            failed += 1
+            print(f"{sid}: FAILED")
+            for error in errors[:10]:
+                print(f"  {error}")
+        else:
+            print(f"{sid}: ok")
+    return 1 if failed else 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Хранилище инкрементальных бэкапов SQLite")
+    parser.add_argument("--root", help="каталог хранилища (по умолчанию BACKUP_DIR/store)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("list", help="список снимков и занятое место")
+    verify = commands.add_parser("verify", help="проверить куски снимков")
+    verify.add_argument("snapshot_id", nargs="?")
+    verify.add_argument("--deep", action="store_true", help="собрать снимок и прогнать integrity_check")
+    args = parser.parse_args()
+
+    logger.remove()
+    store = BackupStore(args.root)
+    handlers = {"list": _cmd_list, "verify": _cmd_verify}
+    sys.exit(handlers[args.command](store, args))
+
+
+if __name__ == "__main__":
+    main()
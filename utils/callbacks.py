@@ -0,0 +1,308 @@
+"""
+Компактный формат callback_data и маршрутизация колбэков.
+
+Каждая кнопка описывается действием (CallbackAction): имя, короткий код и
+типизированные поля. В callback_data действие упаковывается как
+
+    <версия><код>[.<поле>.<поле>...]      например 1ma.3D7 — одобрить отзыв №12345
+
+Целые числа пишутся в base62 (id до 2^63 — не больше 11 символов), перечисления —
+индексом значения, строки — с экранированием. Упакованное значение проверяется
+на лимит Telegram в 64 байта, так что в кнопку помещаются и курсоры из
+нескольких чисел.
+
+Старый формат «имя:поле:поле» (reviews:photo:15:user:2) по-прежнему читается:
+кнопки в уже отправленных сообщениях продолжают работать.
+
+Разбор идёт по префиксному дереву: один проход по строке определяет и
+действие, и начало полей, независимо от числа действий. CallbackRoutes вешает
+на роутер один хендлер, который по действию сразу выбирает функцию, так что
+колбэк не проходит цепочку фильтров F.data.startswith(...).
+"""
+from collections import namedtuple
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import quote, unquote
+
+from aiogram import Router
+from aiogram.dispatcher.event.handler import CallableObject
+from aiogram.fsm.state import State
+from aiogram.types import CallbackQuery
+
+VERSION = "1"
+MAX_CALLBACK_BYTES = 64
+STALE_ANSWER = "Кнопка устарела, откройте меню заново."
+
+_SEPARATOR = "."
+_LEGACY_SEPARATOR = ":"
+_B62 = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+_B62_INDEX = {char: index for index, char in enumerate(_B62)}
+
+
+class CallbackDataError(ValueError):
+    pass
+
+
+def _to_b62(value: int) -> str:
+    if value < 0:
+        return "-" + _to_b62(-value)
+    digits = []
+    while True:
+        value, rest = divmod(value, 62)
+        digits.append(_B62[rest])
+        if not value:
+            return "".join(reversed(digits))
+
+
+def _from_b62(text: str) -> int:
+    if text.startswith("-"):
+        return -_from_b62(text[1:])
+    if not text:
+        raise CallbackDataError("empty number")
+    value = 0
+    for char in text:
+        try:
+            value = value * 62 + _B62_INDEX[char]
+        except KeyError:
+            raise CallbackDataError(f"bad base62 digit {char!r}")
+    return value
+
+
+# --- Поля ---
+class Int:
+    def __init__(self, name: str) -> None:
+        self.name = name
+
+    def encode(self, value: int) -> str:
+        return _to_b62(int(value))
+
+    def decode(self, text: str) -> int:
+        return _from_b62(text)
+
+    def decode_legacy(self, text: str) -> int:
+        try:
+            return int(text)
+        except ValueError:
+            raise CallbackDataError(f"{self.name}: not a number")
+
+
+class Enum:
+    def __init__(self, name: str, *choices: str) -> None:
+        self.name = name
+        self.choices = choices
+        self._index = {choice: index for index, choice in enumerate(choices)}
+
+    def encode(self, value: str) -> str:
+        try:
+            return _B62[self._index[value]]
+        except KeyError:
+            raise CallbackDataError(f"{self.name}: unknown value {value!r}")
+
+    def decode(self, text: str) -> str:
+        index = _B62_INDEX.get(text, len(self.choices)) if len(text) == 1 else len(self.choices)
+        if index >= len(self.choices):
+            raise CallbackDataError(f"{self.name}: bad value {text!r}")
+        return self.choices[index]
+
+    def decode_legacy(self, text: str) -> str:
+        if text not in self._index:
+            raise CallbackDataError(f"{self.name}: bad value {text!r}")
+        return text
+
+
+class Str:
+    def __init__(self, name: str) -> None:
+        self.name = name
+
+    def encode(self, value: str) -> str:
+        return quote(value, safe="")
+
+    def decode(self, text: str) -> str:
+        return unquote(text)
+
+    def decode_legacy(self, text: str) -> str:
+        return text
+
+
+# --- Действия ---
+class CallbackAction:
+    def __init__(self, name: str, code: str, *fields) -> None:
+        self.name = name
+        self.code = code
+        self.fields = fields
+        self.args = namedtuple(name.replace(":", "_"), [field.name for field in fields])
+        self._head = VERSION + code
+
+    def pack(self, *values: Any, **named: Any) -> str:
+        """Упаковать значения полей в callback_data"""
+        args = self.args(*values, **named)
+        data = self._head + "".join(_SEPARATOR + field.encode(value) for field, value in zip(self.fields, args))
+        if len(data.encode("utf-8")) > MAX_CALLBACK_BYTES:
+            raise CallbackDataError(f"{self.name}: callback_data longer than {MAX_CALLBACK_BYTES} bytes")
+        return data
+
+    def _unpack(self, parts: Iterable[str], legacy: bool):
+        parts = list(parts)
+        if len(parts) != len(self.fields):
+            raise CallbackDataError(f"{self.name}: expected {len(self.fields)} fields, got {len(parts)}")
+        if legacy:
+            return self.args(*(field.decode_legacy(part) for field, part in zip(self.fields, parts)))
+        return self.args(*(field.decode(part) for field, part in zip(self.fields, parts)))
+
+    def __repr__(self) -> str:
+        return f"CallbackAction({self.name!r})"
+
+
+class PrefixTrie:
+    """Дерево префиксов: самый длинный зарегистрированный префикс строки за один проход"""
+
+    def __init__(self) -> None:
+        self._root: Dict[str, Any] = {}
+
+    def insert(self, key: str, value: Any) -> None:
+        node = self._root
+        for char in key:
+            node = node.setdefault(char, {})
+        if None in node:
+            raise ValueError(f"duplicate callback prefix {key!r}")
+        node[None] = value
+
+    def longest_prefix(self, text: str) -> Tuple[Any, int]:
+        node = self._root
+        found, length = None, 0
+        for position, char in enumerate(text):
+            node = node.get(char)
+            if node is None:
+                break
+            if None in node:
+                found, length = node[None], position + 1
+        return found, length
+
+
+_ACTIONS: Dict[str, CallbackAction] = {}
+_TRIE = PrefixTrie()
+
+
+def register(action: CallbackAction) -> CallbackAction:
+    if action.name in _ACTIONS:
+        raise ValueError(f"duplicate callback action {action.name}")
+    _ACTIONS[action.name] = action
+    separator = _SEPARATOR if action.fields else ""
+    _TRIE.insert(action._head + separator, (action, False))
+    legacy_separator = _LEGACY_SEPARATOR if action.fields else ""
+    _TRIE.insert(action.name + legacy_separator, (action, True))
+    return action
+
+
+class Payload(namedtuple("Payload", "action args")):
+    """Разобранный колбэк: action — CallbackAction, args — поля (None, если они битые)"""
+
+
+@lru_cache(maxsize=4096)
+def decode(data: Optional[str]) -> Optional[Payload]:
+    """
+    Разобрать callback_data. None — чужой формат (колбэки других роутеров).
+    Известное действие с битыми полями даёт Payload с args=None.
+    Результат неизменяемый и кэшируется: анти-флуд, планировщик и роутер
+    разбирают одну и ту же строку один раз.
+    """
+    if not data:
+        return None
+    match, length = _TRIE.longest_prefix(data)
+    if match is None:
+        return None
+    action, legacy = match
+    rest = data[length:]
+    if not action.fields:
+        return Payload(action, action.args()) if not rest else None
+    try:
+        parts = rest.split(_LEGACY_SEPARATOR if legacy else _SEPARATOR)
+        return Payload(action, action._unpack(parts, legacy))
+    except (CallbackDataError, TypeError):
+        return Payload(action, None)
+
+
+def action_name(data: Optional[str]) -> Optional[str]:
+    payload = decode(data)
+    return payload.action.name if payload else None
+
+
+# --- Каталог кнопок ---
+REVIEW_NEW = register(CallbackAction("review:new", "n"))
+REVIEW_RATING = register(CallbackAction("review:rating", "r", Int("rating")))
+REVIEW_SKIP_MEDIA = register(CallbackAction("review:skip_media", "s"))
+REVIEWS_USER = register(CallbackAction("reviews:user", "u", Int("page")))
+REVIEWS_ADMIN = register(CallbackAction("reviews:admin", "a", Int("page")))
+REVIEWS_PHOTO = register(CallbackAction("reviews:photo", "p", Int("review_id"), Enum("role", "user", "admin"), Int("page")))
+REVIEWS_REPLY = register(CallbackAction("reviews:reply", "y", Int("review_id"), Int("page")))
+REVIEWS_DELETE = register(CallbackAction("reviews:delete", "d", Int("review_id"), Int("page")))
+WELCOME_EDIT = register(CallbackAction("welcome:edit", "w"))
+MODERATION_QUEUE = register(CallbackAction("admin:moderation", "m"))
+MODERATION_APPROVE = register(CallbackAction("moderation:approve", "ma", Int("review_id")))
+MODERATION_REJECT = register(CallbackAction("moderation:reject", "mr", Int("review_id")))
+MODERATION_DELETE = register(CallbackAction("moderation:delete", "md", Int("review_id")))
+
+# Страница отзывов для роли
+REVIEWS_PAGE = {"user": REVIEWS_USER, "admin": REVIEWS_ADMIN}
+
+
+# --- Маршрутизация ---
+class _Route:
+    __slots__ = ("handler", "states", "router_name", "name")
+
+    def __init__(self, callback: Callable, states: Tuple[Optional[str], ...], router_name: str) -> None:
+        self.handler = CallableObject(callback)
+        self.states = states
+        self.router_name = router_name
+        self.name = callback.__qualname__
+
+
+class CallbackRoutes:
+    """
+    Колбэки роутера по действиям:
+
+        routes = CallbackRoutes(admin_router)
+
+        @routes.on(MODERATION_APPROVE)
+        async def approve_review(call: CallbackQuery, cb, is_admin: bool): ...
+
+    Хендлер получает разобранные поля аргументом cb (cb.review_id) и остальные
+    данные aiogram как обычно. Состояния FSM, если указаны, проверяются по
+    raw_state. На роутер вешается один хендлер, который выбирает функцию по
+    действию; колбэки, которых здесь нет, идут дальше к другим роутерам.
+    """
+
+    def __init__(self, router: Router) -> None:
+        self.router_name = router.name
+        self._routes: Dict[CallbackAction, _Route] = {}
+        router.callback_query.register(self._dispatch, self._match)
+
+    def on(self, action: CallbackAction, *states: Optional[State]) -> Callable:
+        def decorator(callback: Callable) -> Callable:
+            if action in self._routes:
+                raise ValueError(f"{action.name} is already routed in {self.router_name}")
+            state_names = tuple(state.state if isinstance(state, State) else state for state in states)
+            self._routes[action] = _Route(callback, state_names, self.router_name)
+            return callback
+
+        return decorator
+
+    def routes(self) -> List[_Route]:
+        """Зарегистрированные функции — для тех, кому нужен настоящий хендлер, а не _dispatch"""
+        return list(self._routes.values())
+
+    async def _match(self, call: CallbackQuery, raw_state: Optional[str] = None) -> Any:
+        payload = decode(call.data)
+        if payload is None:
+            return False
+        route = self._routes.get(payload.action)
+        if route is None or (route.states and raw_state not in route.states):
+            return False
+        # callback_route попадает в data: по нему HandlerMetricsMiddleware подписывает замеры
+        return {"callback_route": route, "cb": payload.args}
+
+    async def _dispatch(self, call: CallbackQuery, callback_route: _Route, cb: Any, **data: Any) -> Any:
+        if cb is None:
+            await call.answer(STALE_ANSWER, show_alert=True)
+            return None
+        return await callback_route.handler.call(call, cb=cb, **data)
@@ -0,0 +1,49 @@
+"""
+Блокировка файла рабочей базы SQLite.
+
+Бот на всё время работы держит разделяемую блокировку файла <db>.lock,
+restore берёт эксклюзивную: пока жив хотя бы один процесс бота, восстановить
+базу нельзя, а пока идёт восстановление — не запустится бот. Блокировку
+держит ОС, поэтому после падения или kill процесса она снимается сама, в
+отличие от pid-файла.
+
+Нужен fcntl (Linux, macOS). Без него блокировка не берётся, и проверка
+остаётся на совести администратора.
+"""
+import os
+from typing import IO, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+class DatabaseLockedError(RuntimeError):
+    pass
+
+
+def lock_path(db_path: str) -> str:
+    return os.path.abspath(db_path) + ".lock"
+
+
+def acquire(db_path: str, exclusive: bool = False) -> Optional[IO]:
+    """Взять блокировку без ожидания; DatabaseLockedError, если она занята.
+
+    Возвращает открытый файл — блокировка держится, пока он не закрыт.
+    """
+    if fcntl is None:
+        return None
+    handle = open(lock_path(db_path), "a+")
+    try:
+        fcntl.flock(handle, (fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH) | fcntl.LOCK_NB)
+    except BlockingIOError:
+        handle.close()
+        who = "the bot" if exclusive else "a restore"
+        raise DatabaseLockedError(f"{db_path} is locked by {who}")
+    return handle
+
+
+def release(handle: Optional[IO]) -> None:
+    if handle is not None:
+        handle.close()
@@ -0,0 +1,149 @@
+"""
+Отложенное удаление сообщений.
+
+Хендлер не ждёт сам (asyncio.sleep держал бы апдейт и слот планировщика всё
+время ожидания), а ставит сообщения в очередь и сразу возвращается:
+
+    deletion_scheduler.schedule(chat_id, [message_id, ...], delay=30)
+
+Задания пишутся в таблицу scheduled_deletions и после перезапуска
+поднимаются из неё. В памяти они лежат в куче по времени удаления; одна
+фоновая задача спит до ближайшего срока. Всё, что созрело в пределах
+BATCH_WINDOW, удаляется пачкой: сообщения одного чата уходят одним вызовом
+deleteMessages (до 100 штук).
+"""
+import asyncio
+import heapq
+import time
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramAPIError, TelegramNetworkError, TelegramRetryAfter, TelegramServerError
+from loguru import logger
+
+from db_manager.db import Database, get_database
+
+# Сообщения, созревшие в пределах окна, удаляются одной пачкой
+BATCH_WINDOW = 1.0
+# Лимит deleteMessages
+MAX_MESSAGES_PER_CALL = 100
+# Повтор после сетевой ошибки или 5xx
+RETRY_DELAY = 60.0
+MAX_ATTEMPTS = 5
+
+
+class DeletionScheduler:
+    def __init__(self, db: Optional[Database] = None, batch_window: float = BATCH_WINDOW) -> None:
+        self.db = db or get_database()
+        self.batch_window = batch_window
+        self._heap: List[Tuple[float, int, int]] = []
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._attempts: Dict[Tuple[int, int], int] = {}
+        self.deleted_total = 0
+        self.failed_total = 0
+
+    def schedule(self, chat_id: int, message_ids: Iterable[int], delay: float) -> None:
+        """Удалить сообщения чата через delay секунд"""
+        delete_at = time.time() + delay
+        rows = [(chat_id, message_id, delete_at) for message_id in message_ids]
+        if not rows:
+            return
+        self.db.add_scheduled_deletions(rows)
+        self._push(rows)
+
+    def pending(self) -> int:
+        return len(self._heap)
+
+    def start(self, bot: Bot) -> None:
+        # Источник правды — таблица: в ней и задания прошлого запуска, и поставленные до start()
+        rows = self.db.get_scheduled_deletions()
+        if rows:
+            logger.info(f"Loaded {len(rows)} scheduled message deletions")
+        self._heap = []
+        self._push(rows)
+        self._task = asyncio.create_task(self._run(bot))
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def _push(self, rows: Iterable[Tuple[int, int, float]]) -> None:
+        earliest = self._heap[0][0] if self._heap else None
+        for chat_id, message_id, delete_at in rows:
+            heapq.heappush(self._heap, (delete_at, chat_id, message_id))
+        # Будим цикл, только если срок ближайшего задания сдвинулся
+        if self._heap and (earliest is None or self._heap[0][0] < earliest):
+            self._wakeup.set()
+
+    def _pop_due(self) -> List[Tuple[float, int, int]]:
+        horizon = time.time() + self.batch_window
+        due = []
+        while self._heap and self._heap[0][0] <= horizon:
+            due.append(heapq.heappop(self._heap))
+        return due
+
+    async def _run(self, bot: Bot) -> None:
+        while True:
+            self._wakeup.clear()
+            if not self._heap:
+                await self._wakeup.wait()
+                continue
+            delay = self._heap[0][0] - time.time()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                    continue
+                except asyncio.TimeoutError:
+                    pass
+            try:
+                await self._flush(bot, self._pop_due())
+            except Exception as e:
+                logger.error(f"Ошибка отложенного удаления сообщений: {e}")
+
+    async def _flush(self, bot: Bot, due: List[Tuple[float, int, int]]) -> None:
+        by_chat: Dict[int, List[int]] = defaultdict(list)
+        for _, chat_id, message_id in due:
+            by_chat[chat_id].append(message_id)
+
+        done: List[Tuple[int, int]] = []
+        retry: List[Tuple[int, int, float]] = []
+        now = time.time()
+        for chat_id, chat_messages in by_chat.items():
+            for start in range(0, len(chat_messages), MAX_MESSAGES_PER_CALL):
+                message_ids = chat_messages[start:start + MAX_MESSAGES_PER_CALL]
+                try:
+                    await bot.delete_messages(chat_id, message_ids)
+                    self.deleted_total += len(message_ids)
+                except (TelegramRetryAfter, TelegramNetworkError, TelegramServerError) as e:
+                    # Временная ошибка: пробуем позже, но не бесконечно
+                    for message_id in message_ids:
+                        key = (chat_id, message_id)
+                        self._attempts[key] = self._attempts.get(key, 0) + 1
+                        if self._attempts[key] < MAX_ATTEMPTS:
+                            retry.append((chat_id, message_id, now + RETRY_DELAY))
+                        else:
+                            self._attempts.pop(key)
+                            self.failed_total += 1
+                            done.append(key)
+                    logger.warning(f"Deleting messages in chat {chat_id} failed, will retry: {e}")
+                    continue
+                except TelegramAPIError as e:
+                    # Бот заблокирован, чат недоступен и т. п. — повтор не поможет
+                    self.failed_total += len(message_ids)
+                    logger.debug(f"Cannot delete messages in chat {chat_id}: {e}")
+                for message_id in message_ids:
+                    self._attempts.pop((chat_id, message_id), None)
+                    done.append((chat_id, message_id))
+
+        self.db.remove_scheduled_deletions(done)
+        if retry:
+            self.db.add_scheduled_deletions(retry)
+            self._push(retry)
@@ -0,0 +1,149 @@
+"""
+Приём свободной обратной связи.
+
+Хендлер только кладёт сообщение в очередь (submit) и сразу отвечает
+пользователю. Дальше:
+
+- повтор того же текста от того же пользователя в пределах
+  FEEDBACK_DEDUP_SECONDS отбрасывается (сравниваются тексты без учёта
+  регистра и пробелов);
+- накопленное пишется в таблицу feedback одной транзакцией раз в
+  FEEDBACK_FLUSH_INTERVAL секунд в рабочем потоке;
+- администраторы получают не сообщение на каждый отзыв, а одну сводку раз
+  в FEEDBACK_NOTIFY_INTERVAL секунд.
+
+Так загруженный чат стоит несколько транзакций в секунду, а не по одной на
+сообщение.
+"""
+import asyncio
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from aiogram import Bot
+from loguru import logger
+
+from config import config
+from db_manager.db import Database
+from utils.permissions import admin_registry
+
+# Сколько сообщений показать в сводке целиком, остальные — числом
+NOTIFY_PREVIEW_ITEMS = 10
+NOTIFY_PREVIEW_CHARS = 200
+# Предел окна дедупликации по памяти
+MAX_RECENT_KEYS = 100_000
+
+
+def _fingerprint(user_id: int, text: str) -> Tuple[int, bytes]:
+    normalized = " ".join(text.lower().split())
+    return user_id, hashlib.blake2b(normalized.encode("utf-8"), digest_size=8).digest()
+
+
+class FeedbackInbox:
+    def __init__(
+        self,
+        db: Optional[Database] = None,
+        flush_interval: Optional[float] = None,
+        dedup_window: Optional[float] = None,
+        notify_interval: Optional[float] = None,
+    ) -> None:
+        cfg = config.feedback
+        # Отдельное соединение: запись идёт в рабочем потоке
+        self.db = db or Database()
+        self.flush_interval = cfg.flush_interval if flush_interval is None else flush_interval
+        self.dedup_window = cfg.dedup_window if dedup_window is None else dedup_window
+        self.notify_interval = cfg.notify_interval if notify_interval is None else notify_interval
+
+        # (user_id, хэш текста) -> когда сообщение было принято; порядок — по времени
+        self._recent: "OrderedDict[Tuple[int, bytes], float]" = OrderedDict()
+        self._pending: List[Tuple[int, str, int]] = []
+        self._to_notify: List[Tuple[int, str]] = []
+        self._db_lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._last_notify = time.monotonic()
+        self.accepted_total = 0
+        self.duplicates_total = 0
+
+    def submit(self, user_id: int, text: str) -> bool:
+        """Принять сообщение. False — дубликат недавнего, он не сохраняется"""
+        now = time.monotonic()
+        self._forget_expired(now)
+        key = _fingerprint(user_id, text)
+        if key in self._recent:
+            self.duplicates_total += 1
+            return False
+        self._recent[key] = now
+        self._pending.append((user_id, text, 0))
+        self._to_notify.append((user_id, text))
+        self.accepted_total += 1
+        return True
+
+    def _forget_expired(self, now: float) -> None:
+        recent = self._recent
+        while recent and (len(recent) > MAX_RECENT_KEYS or now - next(iter(recent.values())) > self.dedup_window):
+            recent.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "pending_writes": len(self._pending),
+            "pending_notifications": len(self._to_notify),
+            "accepted_total": self.accepted_total,
+            "duplicates_total": self.duplicates_total,
+        }
+
+    # --- Фоновая задача ---
+    def start(self, bot: Bot) -> None:
+        self._task = asyncio.create_task(self._run(bot))
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self._flush()
+
+    async def _run(self, bot: Bot) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self._flush()
+                if self._to_notify and time.monotonic() - self._last_notify >= self.notify_interval:
+                    await self._notify(bot)
+            except Exception as e:
+                logger.error(f"Ошибка при сохранении обратной связи: {e}")
+
+    async def _flush(self) -> None:
+        if not self._pending:
+            return
+        # Забираем накопленное целиком; новые сообщения попадут в следующую пачку
+        rows, self._pending = self._pending, []
+        try:
+            await asyncio.to_thread(self._write_batch, rows)
+        except Exception:
+            self._pending[:0] = rows
+            raise
+
+    def _write_batch(self, rows: List[Tuple[int, str, int]]) -> None:
+        with self._db_lock:
+            self.db.add_feedbacks(rows)
+
+    async def _notify(self, bot: Bot) -> None:
+        items, self._to_notify = self._to_notify, []
+        self._last_notify = time.monotonic()
+        lines = [f"🆕 Новая обратная связь: {len(items)}\n"]
+        for _, text in items[:NOTIFY_PREVIEW_ITEMS]:
+            preview = text if len(text) <= NOTIFY_PREVIEW_CHARS else text[:NOTIFY_PREVIEW_CHARS] + "…"
+            lines.append(f"• {preview}")
+        if len(items) > NOTIFY_PREVIEW_ITEMS:
+            lines.append(f"…и ещё {len(items) - NOTIFY_PREVIEW_ITEMS}")
+        summary = "\n".join(lines)
+        for admin_id in admin_registry.ids():
+            try:
+                await bot.send_message(admin_id, summary)
+            except Exception as e:
+                logger.warning(f"Failed to notify admin {admin_id} about feedback: {e}")
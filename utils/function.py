@@ -7,7 +7,7 @@ from aiogram.fsm.context import FSMContext
 import random
 
 
-functions_router = Router()
+functions_router = Router(name="functions")
 
 
 @functions_router.callback_query(F.data == "close_callback")
@@ -0,0 +1,208 @@
+"""
+Неблокирующий конвейер JSON-логов.
+
+В потоке событий sink loguru только решает, нужна ли запись (сэмплирование
+и лимит по event_type), снимает с record нужные поля и кладёт их в очередь.
+JSON-сериализация, запись в файлы, ротация и zip-сжатие выполняются в
+фоновом потоке, так что стоимость лога на апдейт ограничена парой dict-операций.
+"""
+import json
+import os
+import queue
+import random
+import sys
+import threading
+import time
+import zipfile
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Tuple
+
+# Как часто повторять в stderr сообщение об ошибках записи, секунды
+ERROR_REPORT_INTERVAL = 60.0
+
+# Уровень -> (файл, формат периода ротации)
+DEFAULT_ROUTES: Dict[str, Tuple[str, str]] = {
+    "ERROR": ("database/errors.log", "%Y-%m"),
+    "INFO": ("database/info.log", "%Y-%m"),
+    "DEBUG": ("database/debug.log", "%G-W%V"),
+}
+
+
+class _RotatingFile:
+    """Файл, который при смене периода переименовывается и сжимается в фоне"""
+
+    def __init__(self, path: str, period_format: str) -> None:
+        self.path = path
+        self.period_format = period_format
+        self.period: Optional[str] = None
+        self.handle = None
+
+    def write(self, line: str, now: datetime) -> None:
+        period = now.strftime(self.period_format)
+        if self.handle is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            if os.path.exists(self.path):
+                # Файл от прошлого запуска: период берём по времени изменения
+                mtime = datetime.fromtimestamp(os.path.getmtime(self.path), timezone.utc)
+                self.period = mtime.strftime(self.period_format)
+            else:
+                self.period = period
+            self.handle = open(self.path, "a", encoding="utf-8")
+        if period != self.period:
+            self._rotate()
+            self.period = period
+        self.handle.write(line)
+
+    def _rotate(self) -> None:
+        self.handle.close()
+        base, ext = os.path.splitext(self.path)
+        rotated = f"{base}.{self.period}{ext}"
+        try:
+            os.replace(self.path, rotated)
+        finally:
+            # Не вышло переименовать — продолжаем писать в прежний файл
+            self.handle = open(self.path, "a", encoding="utf-8")
+        # Сжатие может занять заметное время — не задерживаем им даже писателя
+        threading.Thread(target=_compress, args=(rotated,), daemon=True).start()
+
+    def flush(self) -> None:
+        if self.handle:
+            self.handle.flush()
+
+    def close(self) -> None:
+        if self.handle:
+            self.handle.close()
+            self.handle = None
+
+
+def _compress(path: str) -> None:
+    try:
+        with zipfile.ZipFile(f"{path}.zip", "w", compression=zipfile.ZIP_DEFLATED) as archive:
+            archive.write(path, arcname=os.path.basename(path))
+        os.remove(path)
+    except OSError:
+        pass
+
+
+class AsyncJsonSink:
+    """Sink для loguru: сэмплирование на месте, сериализация и запись в потоке"""
+
+    def __init__(
+        self,
+        routes: Optional[Dict[str, Tuple[str, str]]] = None,
+        sample_rates: Optional[Dict[str, float]] = None,
+        rate_caps: Optional[Dict[str, int]] = None,
+        max_queue: int = 10000,
+    ) -> None:
+        self.routes = routes or DEFAULT_ROUTES
+        self.sample_rates = sample_rates or {}
+        self.rate_caps = rate_caps or {}
+        self._files = {level: _RotatingFile(path, fmt) for level, (path, fmt) in self.routes.items()}
+        self._queue: "queue.Queue[Optional[Tuple[str, Dict[str, Any]]]]" = queue.Queue(maxsize=max_queue)
+        # event_type -> (секунда, количество записей в ней)
+        self._windows: Dict[str, Tuple[int, int]] = {}
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+
+        self.enqueued = 0
+        self.sampled_out = 0
+        self.rate_limited = 0
+        self.overflow = 0
+        self.written = 0
+        self.write_errors = 0
+        self.write_seconds = 0.0
+        self._error_reported_at = 0.0
+
+    def _admit(self, event_type: Optional[str]) -> bool:
+        if event_type is None:
+            return True
+        rate = self.sample_rates.get(event_type)
+        if rate is not None and random.random() >= rate:
+            self.sampled_out += 1
+            return False
+        cap = self.rate_caps.get(event_type)
+        if cap is not None:
+            second = int(time.monotonic())
+            window, count = self._windows.get(event_type, (second, 0))
+            if window != second:
+                window, count = second, 0
+            if count >= cap:
+                self.rate_limited += 1
+                return False
+            self._windows[event_type] = (window, count + 1)
+        return True
+
+    def write(self, message) -> None:
+        record = message.record
+        level = record["level"].name
+        if level not in self._files:
+            return
+        extra = record["extra"]
+        # Ошибки не сэмплируем никогда
+        if level != "ERROR" and not self._admit(extra.get("event_type")):
+            return
+        payload = {
+            "timestamp": record["time"].timestamp(),
+            "level": level,
+            "message": record["message"],
+            "module": record["module"],
+            "function": record["function"],
+            "line": record["line"],
+            **extra,
+        }
+        try:
+            self._queue.put_nowait((level, payload))
+            self.enqueued += 1
+        except queue.Full:
+            self.overflow += 1
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            started = time.perf_counter()
+            level, payload = item
+            try:
+                now = datetime.fromtimestamp(payload["timestamp"], timezone.utc)
+                payload["timestamp"] = now.replace(tzinfo=None).isoformat() + "Z"
+                self._files[level].write(json.dumps(payload, default=str) + "\n", now)
+                self.written += 1
+                if self._queue.empty():
+                    for file in self._files.values():
+                        file.flush()
+            except Exception as e:
+                # Диск заполнен, не удалась ротация и т.п.: запись теряется, поток продолжает работу
+                self._report_error(e)
+            self.write_seconds += time.perf_counter() - started
+        for file in self._files.values():
+            try:
+                file.close()
+            except Exception as e:
+                self._report_error(e)
+
+    def _report_error(self, error: Exception) -> None:
+        # Писать об ошибке логов в сам лог нельзя — только в stderr и не чаще раза в минуту
+        self.write_errors += 1
+        now = time.monotonic()
+        if self.write_errors == 1 or now - self._error_reported_at >= ERROR_REPORT_INTERVAL:
+            self._error_reported_at = now
+            print(f"log-writer: failed to write log record ({self.write_errors} failures so far): {error!r}", file=sys.stderr)
+
+    def stop(self) -> None:
+        """Дописывает очередь и закрывает файлы"""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout=5)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queue_size": self._queue.qsize(),
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "write_errors": self.write_errors,
+            "sampled_out": self.sampled_out,
+            "rate_limited": self.rate_limited,
+            "overflow": self.overflow,
+            "avg_write_us": round(self.write_seconds / self.written * 1e6, 1) if self.written else 0.0,
+        }
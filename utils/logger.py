@@ -1,68 +1,50 @@
 # utils/logger.py
-import json
+import atexit
 import sys
-from datetime import datetime
 from loguru import logger
 
+from config import config
+from utils.log_pipeline import AsyncJsonSink
+
+_json_sink: AsyncJsonSink | None = None
+
+
 def setup_logging():
     """Настройка логирования для всего приложения"""
-    
+    global _json_sink
+
     # Удаляем все стандартные обработчики
     logger.remove()
-    
-    # Настройка JSON-форматирования для логов
-    def json_formatter(record):
-        record["extra"]["serialized"] = json.dumps({
-            "timestamp": datetime.utcfromtimestamp(record["time"].timestamp()).isoformat() + "Z",
-            "level": record["level"].name,
-            "message": record["message"],
-            "module": record["module"],
-            "function": record["function"],
-            "line": record["line"],
-            **record["extra"]
-        }, default=str)
-        return "{extra[serialized]}\n"
-    
-    # Лог ошибок в файл (JSON формат)
-    logger.add(
-        'database/errors.log',
-        format=json_formatter,
-        level="ERROR",
-        rotation="1 month",
-        compression="zip",
-        filter=lambda record: record["level"].name == "ERROR"
-    )
-    
-    # Лог информации в файл (JSON формат)
-    logger.add(
-        'database/info.log',
-        format=json_formatter,
-        level="INFO",
-        rotation="1 month",
-        compression="zip",
-        filter=lambda record: record["level"].name == "INFO"
+
+    # JSON-логи в файлы (errors/info/debug): сериализация, запись, ротация
+    # и сжатие выполняются в фоновом потоке, в цикле событий — только очередь
+    _json_sink = AsyncJsonSink(
+        sample_rates=config.logging.sample_rates,
+        rate_caps=config.logging.rate_caps,
+        max_queue=config.logging.queue_size,
     )
-    
-    # Вывод в консоль для разработки (красивый формат)
+    logger.add(_json_sink, format="{message}", level="DEBUG")
+    atexit.register(logger.remove)
+
+    # Вывод в консоль для разработки (красивый формат), запись — в потоке loguru.
+    # Высокочастотные события в консоль не пишем, они попадают только в файлы
+    noisy_events = set(config.logging.sample_rates) | set(config.logging.rate_caps)
     logger.add(
         sys.stdout,
         format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | <cyan>{module}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>",
         level="INFO",
-        colorize=True
+        colorize=True,
+        enqueue=True,
+        filter=lambda record: record["extra"].get("event_type") not in noisy_events
     )
-    
-    # Дополнительный debug лог для разработки
-    logger.add(
-        'database/debug.log',
-        format=json_formatter,
-        level="DEBUG",
-        rotation="1 week",
-        compression="zip",
-        filter=lambda record: record["level"].name == "DEBUG"
-    )
-    
+
     logger.info("Logging setup completed")
 
+
+def get_logging_stats() -> dict:
+    """Счётчики конвейера логов: очередь, отброшенные и среднее время записи"""
+    return _json_sink.stats() if _json_sink else {}
+
 # Утилиты для структурированного логирования
 def get_user_context(user) -> dict:
     """Создает контекст пользователя для логирования"""
@@ -123,4 +105,4 @@ def log_button_click(message, button_text: str, handler_name: str):
 
 
 # Экспортируем настроенный логгер
-__all__ = ['logger', 'setup_logging', 'log_command', 'log_callback', 'log_message_sent', 'log_error', 'get_user_context', 'log_button_click']
\ No newline at end of file
+__all__ = ['logger', 'setup_logging', 'log_command', 'log_callback', 'log_message_sent', 'log_error', 'get_user_context', 'log_button_click', 'get_logging_stats']
\ No newline at end of file
@@ -0,0 +1,145 @@
+"""
+Сторож цикла событий.
+
+Задача в цикле каждые interval секунд засыпает и меряет, насколько позже
+запланированного проснулась — это и есть лаг, он уходит в метрику.
+Вспомогательный поток следит за «пульсом» этой задачи: если цикл не отвечает
+дольше порога, поток снимает стек потока цикла (sys._current_frames) и
+определяет, какой хендлер сейчас выполняется. Когда цикл оживает, в лог пишется
+длительность блокировки вместе со снятым стеком — так находятся shutil.copy2,
+синхронные запросы к БД и прочие блокирующие вызовы.
+"""
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+from types import CodeType, FrameType
+from typing import Dict, List, Optional
+
+from aiogram import Dispatcher
+from loguru import logger
+
+from config import config
+from utils.callbacks import CallbackRoutes
+from utils.metrics import registry
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+loop_lag_seconds = registry.histogram(
+    "bot_event_loop_lag_seconds",
+    "Event loop wake-up delay",
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+
+
+class LoopLagMonitor:
+    def __init__(
+        self,
+        dp: Optional[Dispatcher] = None,
+        interval: Optional[float] = None,
+        threshold_ms: Optional[float] = None,
+    ) -> None:
+        cfg = config.loop_monitor
+        self.interval = interval or cfg.interval
+        self.threshold = (threshold_ms or cfg.block_threshold_ms) / 1000
+        self._handler_codes: Dict[CodeType, str] = self._collect_handlers(dp) if dp else {}
+        self._heartbeat = time.monotonic()
+        self._loop_thread_id: Optional[int] = None
+        self._captured: Optional[tuple] = None
+        self._stopped = threading.Event()
+        self._task: Optional[asyncio.Task] = None
+
+        self.last_lag = 0.0
+        self.blocks_total = 0
+        registry.gauge("bot_event_loop_lag_last_seconds", "Last measured event loop lag", lambda: self.last_lag)
+        registry.gauge(
+            "bot_event_loop_blocks_total", "Event loop stalls above threshold", lambda: self.blocks_total, kind="counter"
+        )
+
+    @staticmethod
+    def _collect_handlers(dp: Dispatcher) -> Dict[CodeType, str]:
+        codes = {}
+        for router in dp.chain_tail:
+            for observer in router.observers.values():
+                for handler in observer.handlers:
+                    owner = getattr(handler.callback, "__self__", None)
+                    if isinstance(owner, CallbackRoutes):
+                        # Общий _dispatch роутера не называет кнопку — берём функции из его таблицы
+                        for route in owner.routes():
+                            code = getattr(route.handler.callback, "__code__", None)
+                            if code is not None:
+                                codes[code] = f"{route.router_name}:{route.name}"
+                        continue
+                    code = getattr(handler.callback, "__code__", None)
+                    if code is not None:
+                        codes[code] = f"{router.name}:{handler.callback.__qualname__}"
+        return codes
+
+    def start(self) -> None:
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._task = asyncio.create_task(self._tick())
+        threading.Thread(target=self._watch, name="loop-watchdog", daemon=True).start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._task:
+            self._task.cancel()
+
+    async def _tick(self) -> None:
+        while True:
+            scheduled = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self._heartbeat = now
+            lag = max(now - scheduled, 0.0)
+            self.last_lag = lag
+            loop_lag_seconds.observe(lag)
+            if lag >= self.threshold:
+                self.blocks_total += 1
+                self._report(lag)
+
+    def _report(self, lag: float) -> None:
+        captured, self._captured = self._captured, None
+        context = {"event_type": "loop_blocked", "lag_ms": round(lag * 1000, 1)}
+        if captured is None:
+            logger.bind(**context).warning("Event loop was blocked (stack not captured)")
+            return
+        handler, stack = captured
+        context.update(handler=handler or "unknown", stack=stack)
+        logger.bind(**context).warning(
+            f"Event loop was blocked for {lag * 1000:.0f} ms in {handler or 'unknown'}:\n{stack}"
+        )
+
+    def _watch(self) -> None:
+        poll = min(self.threshold / 2, 0.05)
+        captured_for = None
+        while not self._stopped.wait(poll):
+            heartbeat = self._heartbeat
+            if time.monotonic() - heartbeat < self.interval + self.threshold or captured_for == heartbeat:
+                continue
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            captured_for = heartbeat
+            self._captured = (self._find_handler(frame), self._format_stack(frame))
+
+    def _find_handler(self, frame: Optional[FrameType]) -> Optional[str]:
+        while frame is not None:
+            name = self._handler_codes.get(frame.f_code)
+            if name:
+                return name
+            frame = frame.f_back
+        return None
+
+    @staticmethod
+    def _format_stack(frame: FrameType, limit: int = 15) -> str:
+        entries = traceback.extract_stack(frame)
+        # Начинаем с первого кадра проекта, рамки asyncio неинтересны
+        project: List[traceback.FrameSummary] = [e for e in entries if e.filename.startswith(PROJECT_ROOT)]
+        if project:
+            first = entries.index(project[0])
+            entries = entries[first:]
+        return "".join(traceback.format_list(entries[-limit:]))
@@ -0,0 +1,127 @@
+"""
+Плановое обслуживание базы.
+
+1. Архивация: одобренные отзывы старше REVIEW_ARCHIVE_DAYS переносятся из
+   reviews в reviews_archive короткими порциями, чтобы не держать блокировку
+   записи. Горячая таблица и её индекс остаются маленькими, страницы и
+   счётчики не трогают старые строки. Архивные отзывы по-прежнему доступны
+   администраторам (/review, выгрузка /export_reviews). Отклонённые
+   модератором отзывы попадают в архив сразу.
+2. ANALYZE — свежая статистика для планировщика после переноса строк.
+3. Инкрементальный VACUUM (только SQLite) — освободившиеся страницы
+   возвращаются файлу, не больше VACUUM_PAGES за проход. Только для базы в
+   режиме auto_vacuum=INCREMENTAL: новые базы создаются в нём, а старую
+   переводят один раз вручную (--convert) — это полный VACUUM, который
+   переписывает весь файл, поэтому само обслуживание его не запускает.
+
+Работает в отдельном потоке со своим соединением.
+
+    python -m utils.maintenance            # разовый проход
+    python -m utils.maintenance --convert  # перевести SQLite в auto_vacuum=INCREMENTAL (бот остановлен)
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from typing import Optional
+
+from loguru import logger
+
+from config import config
+from db_manager.db import Database
+
+# Пауза между порциями архивации: даёт боту вклиниться со своими записями
+BATCH_PAUSE_SECONDS = 0.05
+
+
+def run_maintenance(db_path: Optional[str] = None) -> dict:
+    """Один проход обслуживания. Синхронно, вызывать в рабочем потоке."""
+    settings = config.database
+    started = time.monotonic()
+    db = Database(path_to_database=db_path)
+    try:
+        archived = 0
+        if settings.review_archive_days > 0:
+            while True:
+                moved = db.archive_old_reviews(settings.review_archive_days, settings.review_archive_batch)
+                archived += moved
+                if moved < settings.review_archive_batch:
+                    break
+                time.sleep(BATCH_PAUSE_SECONDS)
+
+        analyze_started = time.monotonic()
+        db.analyze()
+        analyze_seconds = time.monotonic() - analyze_started
+
+        vacuum = {}
+        mode = db.auto_vacuum_mode()
+        if mode == 2:
+            vacuum = db.incremental_vacuum(settings.vacuum_pages)
+        elif mode is not None:
+            logger.info("SQLite auto_vacuum is not INCREMENTAL, skipping vacuum; run python -m utils.maintenance --convert")
+    finally:
+        db.close()
+
+    return {
+        "archived": archived,
+        "analyze_seconds": round(analyze_seconds, 2),
+        **vacuum,
+        "seconds": round(time.monotonic() - started, 2),
+    }
+
+
+async def periodic_maintenance(db_path: Optional[str] = None) -> None:
+    """Периодическое обслуживание базы (интервал — MAINTENANCE_INTERVAL_HOURS)"""
+    while True:
+        try:
+            await asyncio.sleep(config.database.maintenance_interval_hours * 3600)
+            stats = await asyncio.to_thread(run_maintenance, db_path)
+            logger.bind(event_type="db_maintenance", **stats).info(
+                f"DB maintenance: archived {stats['archived']} reviews, "
+                f"freed {stats.get('bytes_freed', 0) // 1024} KB in {stats['seconds']} s"
+            )
+        except Exception as e:
+            logger.error(f"Ошибка обслуживания базы: {e}")
+            await asyncio.sleep(3600)
+
+
+def convert(db_path: Optional[str] = None) -> int:
+    """Разовый перевод SQLite в auto_vacuum=INCREMENTAL; бот должен быть остановлен"""
+    # Импорт здесь: модуль подключается из main раньше, чем нужна блокировка
+    from utils import db_lock
+
+    db = Database(path_to_database=db_path)
+    try:
+        if db.use_postgres:
+            logger.info("PostgreSQL frees space with autovacuum, nothing to convert")
+            return 0
+        if db.auto_vacuum_mode() == 2:
+            logger.info(f"{db.db_path} is already in auto_vacuum=INCREMENTAL mode")
+            return 0
+        try:
+            lock = db_lock.acquire(db.db_path, exclusive=True)
+        except db_lock.DatabaseLockedError:
+            logger.error(f"{db.db_path} is in use, stop the bot before converting")
+            return 1
+        try:
+            logger.info(f"Converting {db.db_path} to auto_vacuum=INCREMENTAL (full VACUUM, {os.path.getsize(db.db_path) // 1024} KB)")
+            stats = db.convert_to_incremental_vacuum()
+        finally:
+            db_lock.release(lock)
+    finally:
+        db.close()
+    logger.bind(event_type="db_vacuum_convert", **stats).info(
+        f"Converted in {stats['seconds']} s, freed {stats['bytes_freed'] // 1024} KB"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Обслуживание базы")
+    parser.add_argument("--convert", action="store_true", help="перевести SQLite в auto_vacuum=INCREMENTAL (полный VACUUM)")
+    args = parser.parse_args()
+    if args.convert:
+        sys.exit(convert())
+    logger.remove()
+    print(run_maintenance())
@@ -0,0 +1,245 @@
+"""
+Метрики в текстовом формате Prometheus без внешних зависимостей.
+
+- задержка хендлеров по роутеру и хендлеру (middleware Dispatcher);
+- время и число строк по каждому SQL-выражению (вызывается из Database);
+- задержка и ошибки исходящих вызовов Bot API по методу (middleware сессии);
+- gauge'и с колбэками: очередь апдейтов, FSM-состояния, очереди регуляторов.
+
+Запись метрики — словарь и bisect по корзинам, её можно не выключать в проде.
+Отдаются по HTTP на config.metrics.host:port/metrics.
+"""
+import time
+from bisect import bisect_left
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from aiogram import BaseMiddleware
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiohttp import web
+from loguru import logger
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_labels(names: Sequence[str], values: LabelValues, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()) -> None:
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *label_values: str, amount: float = 1.0) -> None:
+        self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for values, value in list(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labels, values)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(
+        self, name: str, help_text: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> None:
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        # labels -> [счётчики корзин..., +Inf], сумма
+        self._values: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, *label_values: str) -> None:
+        entry = self._values.get(label_values)
+        if entry is None:
+            entry = self._values[label_values] = ([0] * (len(self.buckets) + 1), [0.0])
+        entry[0][bisect_left(self.buckets, value)] += 1
+        entry[1][0] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for values, (counts, total) in list(self._values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                bucket_labels = _format_labels(self.labels, values, 'le="%s"' % bound)
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            cumulative += counts[-1]
+            bucket_labels = _format_labels(self.labels, values, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, values)} {total[0]}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, values)} {cumulative}")
+        return lines
+
+
+class CallbackGauge:
+    """Метрика, значение которой вычисляется в момент сбора (gauge или готовый счётчик)"""
+
+    def __init__(
+        self, name: str, help_text: str, func: Callable[[], Any], labels: Sequence[str] = (), kind: str = "gauge"
+    ) -> None:
+        self.name = name
+        self.help = help_text
+        self.func = func
+        self.labels = tuple(labels)
+        self.kind = kind
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        try:
+            value = self.func()
+        except Exception as e:
+            logger.warning(f"Metric {self.name} collection failed: {e}")
+            return lines
+        if isinstance(value, dict):
+            for label_values, item in value.items():
+                if not isinstance(label_values, tuple):
+                    label_values = (label_values,)
+                lines.append(f"{self.name}{_format_labels(self.labels, label_values)} {item}")
+        else:
+            lines.append(f"{self.name} {value}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self._metrics: Dict[str, Any] = {}
+        # Асинхронные обновления перед сбором (например, COUNT в БД в рабочем потоке)
+        self._refreshers: List[Callable[[], Awaitable[None]]] = []
+
+    def counter(self, name: str, help_text: str, labels: Sequence[str] = ()) -> Counter:
+        return self._metrics.setdefault(name, Counter(name, help_text, labels))
+
+    def histogram(self, name: str, help_text: str, labels: Sequence[str] = (), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._metrics.setdefault(name, Histogram(name, help_text, labels, buckets))
+
+    def gauge(
+        self, name: str, help_text: str, func: Callable[[], Any], labels: Sequence[str] = (), kind: str = "gauge"
+    ) -> None:
+        self._metrics[name] = CallbackGauge(name, help_text, func, labels, kind)
+
+    def add_refresher(self, func: Callable[[], Awaitable[None]]) -> None:
+        self._refreshers.append(func)
+
+    async def render(self) -> str:
+        for refresh in self._refreshers:
+            try:
+                await refresh()
+            except Exception as e:
+                logger.warning(f"Metrics refresh failed: {e}")
+        lines: List[str] = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+handler_seconds = registry.histogram(
+    "bot_handler_seconds", "Handler latency by router and handler", ("router", "handler", "event")
+)
+handler_errors = registry.counter("bot_handler_errors_total", "Handler exceptions", ("router", "handler"))
+db_query_seconds = registry.histogram("bot_db_query_seconds", "SQL statement latency", ("statement",))
+db_query_rows = registry.counter("bot_db_query_rows_total", "Rows affected or fetched by SQL statement", ("statement",))
+api_call_seconds = registry.histogram("bot_api_call_seconds", "Outbound Bot API call latency", ("method",))
+api_call_errors = registry.counter("bot_api_call_errors_total", "Outbound Bot API errors", ("method", "error"))
+
+
+@lru_cache(maxsize=512)
+def statement_label(query: str) -> str:
+    """Короткая метка SQL-выражения: запросы в коде статичны, так что набор меток конечен"""
+    return " ".join(query.split())[:120]
+
+
+def observe_query(query: str, seconds: float, rows: int = 0) -> None:
+    label = statement_label(query)
+    db_query_seconds.observe(seconds, label)
+    if rows > 0:
+        db_query_rows.inc(label, amount=rows)
+
+
+def observe_rows(query: str, rows: int) -> None:
+    if rows > 0:
+        db_query_rows.inc(statement_label(query), amount=rows)
+
+
+def _handler_name(data: Dict[str, Any]) -> Tuple[str, str]:
+    route = data.get("callback_route")
+    if route is not None:
+        # Колбэк разобран CallbackRoutes: подписываем настоящей функцией, а не общим диспетчером
+        return route.router_name, route.name
+    router = data.get("event_router")
+    handler = data.get("handler")
+    callback = getattr(handler, "callback", None)
+    return (
+        getattr(router, "name", "unknown"),
+        getattr(callback, "__qualname__", "unknown"),
+    )
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """Inner middleware: регистрируется на Dispatcher и наследуется всеми роутерами"""
+
+    def __init__(self, event_name: str) -> None:
+        self.event_name = event_name
+
+    async def __call__(self, handler, event, data: Dict[str, Any]) -> Any:
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            handler_errors.inc(*_handler_name(data))
+            raise
+        finally:
+            router, name = _handler_name(data)
+            handler_seconds.observe(time.perf_counter() - started, router, name, self.event_name)
+
+
+class ApiMetricsMiddleware(BaseRequestMiddleware):
+    """Middleware сессии: время реального HTTP-вызова Bot API и ошибки по методу"""
+
+    async def __call__(self, make_request, bot, method):
+        method_name = type(method).__name__
+        started = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        except Exception as e:
+            api_call_errors.inc(method_name, type(e).__name__)
+            raise
+        finally:
+            api_call_seconds.observe(time.perf_counter() - started, method_name)
+
+
+async def _metrics_handler(request: web.Request) -> web.Response:
+    body = await registry.render()
+    return web.Response(text=body, content_type="text/plain", charset="utf-8")
+
+
+async def start_metrics_server(host: str, port: int) -> Optional[web.AppRunner]:
+    """Поднять /metrics; если порт занят (например, другим процессом бота) — без метрик, но бот работает"""
+    app = web.Application()
+    app.router.add_get("/metrics", _metrics_handler)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    try:
+        await web.TCPSite(runner, host, port).start()
+    except OSError as e:
+        await runner.cleanup()
+        logger.warning(f"Metrics endpoint disabled, cannot bind {host}:{port}: {e}")
+        return None
+    logger.info(f"Metrics endpoint: http://{host}:{port}/metrics")
+    return runner
@@ -1,12 +1,81 @@
+"""
+Роли пользователей.
+
+Администраторы — это владелец (OWNER_ID), ADMIN_IDS из окружения и те, кого
+владелец назначил через /owner (таблица admins). Список держится в памяти
+как frozenset: проверка — один lookup без запросов к БД. Запись в таблицу
+admins сбрасывает кэш, а раз в ADMIN_CACHE_TTL секунд он перечитывается,
+чтобы другие процессы с той же базой увидели изменения.
+
+RoleMiddleware определяет роль один раз на апдейт и передаёт хендлерам
+role ("owner" / "admin" / "user") и is_admin.
+"""
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, User
+
 from config import config
 
+ROLE_OWNER = "owner"
+ROLE_ADMIN = "admin"
+ROLE_USER = "user"
+
+ADMIN_CACHE_TTL = 60.0
+
+
+class AdminRegistry:
+    def __init__(self, ttl: float = ADMIN_CACHE_TTL) -> None:
+        self.ttl = ttl
+        self._ids: Optional[frozenset] = None
+        self._loaded_at = 0.0
+
+    def ids(self) -> frozenset:
+        """Все администраторы, включая владельца"""
+        if self._ids is None or time.monotonic() - self._loaded_at > self.ttl:
+            # БД импортируем здесь: db_manager.db сам импортирует этот модуль
+            from db_manager.db import get_database
+
+            stored = (user_id for user_id, _ in get_database().get_all_admins())
+            self._ids = frozenset((config.bot.owner_id, *config.bot.admin_ids, *stored))
+            self._loaded_at = time.monotonic()
+        return self._ids
+
+    def invalidate(self) -> None:
+        self._ids = None
+
+
+admin_registry = AdminRegistry()
+
+
+def get_role(user_id: int) -> str:
+    if user_id == config.bot.owner_id:
+        return ROLE_OWNER
+    if user_id in admin_registry.ids():
+        return ROLE_ADMIN
+    return ROLE_USER
+
 
 def is_admin(user_id: int) -> bool:
     """
-    Check whether a user is an admin based on the ADMIN_IDS env variable.
-    Owner is treated as admin automatically.
+    Check whether a user is an admin: owner, ADMIN_IDS env variable or the admins table.
+    Handlers get the same answer as the is_admin argument from RoleMiddleware.
     """
-    return user_id == config.bot.owner_id or user_id in config.bot.admin_ids
+    return get_role(user_id) != ROLE_USER
 
 
+class RoleMiddleware(BaseMiddleware):
+    """Outer middleware Dispatcher: роль считается один раз на апдейт"""
 
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        user: Optional[User] = data.get("event_from_user")
+        role = get_role(user.id) if user else ROLE_USER
+        data["role"] = role
+        data["is_admin"] = role != ROLE_USER
+        return await handler(event, data)
@@ -0,0 +1,41 @@
+"""
+Перцептивный хэш картинки (dHash, 64 бита).
+
+Картинка сводится к 9×8 в оттенках серого, каждый бит — «левый пиксель
+ярче правого». Пересжатие, смена размера и лёгкая цветокоррекция хэш почти
+не меняют, поэтому одинаковые фото различаются на несколько бит (расстояние
+Хэмминга), а разные — на десятки.
+
+Модуль выполняется в процессах пула, поэтому ничего из бота не импортирует.
+Pillow — необязательная зависимость: без неё dhash бросает ImportError.
+"""
+from io import BytesIO
+
+HASH_SIZE = 8
+
+
+def pillow_available() -> bool:
+    try:
+        import PIL  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def dhash(data: bytes) -> int:
+    from PIL import Image
+
+    with Image.open(BytesIO(data)) as image:
+        # JPEG декодируется сразу в уменьшенном виде — в разы быстрее полного
+        image.draft("L", (HASH_SIZE * 4, HASH_SIZE * 4))
+        pixels = list(image.convert("L").resize((HASH_SIZE + 1, HASH_SIZE), Image.BILINEAR).getdata())
+    value = 0
+    for row in range(HASH_SIZE):
+        offset = row * (HASH_SIZE + 1)
+        for col in range(HASH_SIZE):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def distance(left: int, right: int) -> int:
+    return (left ^ right).bit_count()
@@ -0,0 +1,171 @@
+"""
+Поиск одинаковых фото в отзывах (необязательный, PHOTO_DEDUP_ENABLED).
+
+После сохранения отзыва с фото finalize_review ставит задание в очередь и
+не ждёт. Фоновые воркеры:
+
+1. по file_unique_id ищут уже посчитанный хэш — один и тот же файл
+   скачивается один раз;
+2. иначе скачивают самый маленький размер фото через Bot API (для хэша
+   9×8 пикселей больше не нужно) и считают dHash в пуле процессов, чтобы
+   декодирование картинок не занимало цикл событий;
+3. ищут в BK-дереве фото на расстоянии Хэмминга не больше
+   PHOTO_DEDUP_DISTANCE и записывают ближайшее в review_photos — модератор
+   видит «фото похоже на фото отзыва №X».
+
+Нужен Pillow (pip install Pillow); без него пайплайн не запускается.
+"""
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from aiogram import Bot
+from loguru import logger
+
+from config import config
+from db_manager.db import Database, get_database
+from utils.phash import dhash, distance, pillow_available
+
+
+class BKTree:
+    """Дерево Буркхарда-Келлера по расстоянию Хэмминга: поиск соседей без полного перебора"""
+
+    def __init__(self) -> None:
+        # Узел: [хэш, элементы с этим хэшем, {расстояние: потомок}]
+        self._root: Optional[list] = None
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, value: int, item: Any) -> None:
+        self._size += 1
+        if self._root is None:
+            self._root = [value, [item], {}]
+            return
+        node = self._root
+        while True:
+            gap = distance(value, node[0])
+            if gap == 0:
+                node[1].append(item)
+                return
+            child = node[2].get(gap)
+            if child is None:
+                node[2][gap] = [value, [item], {}]
+                return
+            node = child
+
+    def search(self, value: int, radius: int) -> List[Tuple[int, Any]]:
+        """Все элементы не дальше radius: [(расстояние, элемент), ...]"""
+        if self._root is None:
+            return []
+        found = []
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            gap = distance(value, node[0])
+            if gap <= radius:
+                found.extend((gap, item) for item in node[1])
+            # Неравенство треугольника: потомки вне [gap - radius, gap + radius] не подходят
+            for edge, child in node[2].items():
+                if gap - radius <= edge <= gap + radius:
+                    stack.append(child)
+        return found
+
+
+class PhotoDedup:
+    def __init__(self) -> None:
+        cfg = config.photo_dedup
+        self.enabled = cfg.enabled
+        self.workers = cfg.workers
+        self.max_distance = cfg.max_distance
+        self.queue_size = cfg.queue_size
+        self._tree = BKTree()
+        self._queue: Optional[asyncio.Queue] = None
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._tasks: List[asyncio.Task] = []
+        self.downloads_total = 0
+        self.matches_total = 0
+        self.dropped_total = 0
+
+    def submit(self, review_id: int, file_id: str, file_unique_id: str) -> None:
+        """Поставить фото отзыва в очередь; ничего не ждёт и не падает"""
+        if self._queue is None:
+            return
+        try:
+            self._queue.put_nowait((review_id, file_id, file_unique_id))
+        except asyncio.QueueFull:
+            self.dropped_total += 1
+            logger.warning(f"Photo dedup queue is full, review {review_id} skipped")
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "queued": self._queue.qsize() if self._queue else 0,
+            "indexed": len(self._tree),
+            "downloads_total": self.downloads_total,
+            "matches_total": self.matches_total,
+            "dropped_total": self.dropped_total,
+        }
+
+    # --- Запуск и остановка (хуки Dispatcher) ---
+    async def on_startup(self, bot: Bot) -> None:
+        if not self.enabled:
+            return
+        if not pillow_available():
+            logger.warning("PHOTO_DEDUP_ENABLED is set but Pillow is not installed, photo dedup is off")
+            return
+        for review_id, phash in await asyncio.to_thread(self._load_hashes):
+            self._tree.add(phash, review_id)
+        self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._tasks = [asyncio.create_task(self._worker(bot)) for _ in range(self.workers)]
+        logger.info(f"Photo dedup started: {len(self._tree)} photos indexed, {self.workers} workers")
+
+    async def on_shutdown(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+        if self._pool:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    @staticmethod
+    def _load_hashes() -> List[Tuple[int, int]]:
+        # Отдельное соединение: выполняется в рабочем потоке
+        db = Database()
+        try:
+            return db.get_review_photo_hashes()
+        finally:
+            db.close()
+
+    # --- Обработка ---
+    async def _worker(self, bot: Bot) -> None:
+        while True:
+            review_id, file_id, file_unique_id = await self._queue.get()
+            try:
+                await self._process(bot, review_id, file_id, file_unique_id)
+            except Exception as e:
+                logger.warning(f"Photo dedup failed for review {review_id}: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _process(self, bot: Bot, review_id: int, file_id: str, file_unique_id: str) -> None:
+        db = get_database()
+        phash = db.get_photo_hash(file_unique_id)
+        if phash is None:
+            buffer = await bot.download(file_id)
+            self.downloads_total += 1
+            loop = asyncio.get_running_loop()
+            phash = await loop.run_in_executor(self._pool, dhash, buffer.getvalue())
+
+        matches = [match for match in self._tree.search(phash, self.max_distance) if match[1] != review_id]
+        gap, similar_id = min(matches) if matches else (None, None)
+        if matches:
+            self.matches_total += 1
+        self._tree.add(phash, review_id)
+        db.save_review_photo(review_id, file_unique_id, phash, similar_id, gap)
+
+
+photo_dedup = PhotoDedup()
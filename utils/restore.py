@@ -0,0 +1,218 @@
+"""
+Восстановление SQLite из бэкапов.
+
+    python -m utils.restore list
+    python -m utils.restore validate 20250115_143022           # снимок хранилища или файл .db
+    python -m utils.restore restore 20250115_143022            # на момент снимка
+    python -m utils.restore restore --until "2025-01-15 14:05"  # на момент времени (нужен архив WAL)
+
+База собирается рядом с рабочей во временном файле, проходит integrity_check
+и только после этого подменяет рабочую одним rename. Копия прежней базы со
+своими -wal/-shm сохраняется как <db>.before-restore-<время>. Бот на время
+восстановления нужно остановить: пока он держит блокировку базы (utils.db_lock),
+восстановление откажется начинаться.
+"""
+import argparse
+import os
+import shutil
+import sys
+import time
+from datetime import datetime
+from typing import Optional, Tuple
+
+from config import config
+from utils import db_lock
+from utils.backup_store import BackupStore, BackupStoreError, _check_integrity
+from utils.wal_archive import Timeline, list_timelines, replay, usable_snapshots
+
+FULL_BACKUP_PREFIX = "database_backup_"
+
+
+def _format_ts(value: float) -> str:
+    return datetime.fromtimestamp(value).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _parse_time(value: str) -> float:
+    for fmt in ("%Y-%m-%d %H:%M:%S.%f", "%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%dT%H:%M:%S", "%Y-%m-%dT%H:%M"):
+        try:
+            return datetime.strptime(value, fmt).timestamp()
+        except ValueError:
+            continue
+    raise argparse.ArgumentTypeError(f"unrecognized time: {value} (use 'YYYY-MM-DD HH:MM[:SS]')")
+
+
+def _full_backups() -> list:
+    backup_dir = config.database.backup_dir
+    if not os.path.isdir(backup_dir):
+        return []
+    files = [
+        os.path.join(backup_dir, name)
+        for name in os.listdir(backup_dir)
+        if name.startswith(FULL_BACKUP_PREFIX) and name.endswith(".db")
+    ]
+    return sorted(files, key=os.path.getmtime)
+
+
+def _resolve_file(source: str) -> Optional[str]:
+    for candidate in (source, os.path.join(config.database.backup_dir, source)):
+        if os.path.isfile(candidate):
+            return candidate
+    return None
+
+
+def cmd_list(store: BackupStore, args) -> int:
+    print("Full copies:")
+    for path in _full_backups():
+        print(f"  {os.path.basename(path)}  {os.path.getsize(path) // 1024} KB  {_format_ts(os.path.getmtime(path))}")
+
+    print("\nSnapshots (python -m utils.backup_store list for details):")
+    for snapshot_id in store.snapshot_ids():
+        manifest = store.load(snapshot_id)
+        print(f"  {snapshot_id}  {manifest['size'] // 1024} KB  {manifest['created_at']}")
+
+    timelines = list_timelines()
+    if timelines:
+        print("\nPoint-in-time recovery windows (WAL archive):")
+    for timeline in timelines:
+        snapshots = usable_snapshots(timeline, store)
+        until = timeline.covered_until()
+        if not snapshots or until is None:
+            print(f"  {timeline.id}  no usable window")
+            continue
+        print(f"  {timeline.id}  {_format_ts(snapshots[0]['ready_at'])} .. {_format_ts(until)}")
+    return 0
+
+
+def cmd_validate(store: BackupStore, args) -> int:
+    path = _resolve_file(args.source)
+    if path:
+        try:
+            _check_integrity(path)
+        except Exception as e:
+            print(f"{path}: FAILED {e}")
+            return 1
+        print(f"{path}: ok")
+        return 0
+
+    errors = store.verify(args.source, deep=True).get(args.source, [])
+    if errors:
+        print(f"{args.source}: FAILED")
+        for error in errors[:10]:
+            print(f"  {error}")
+        return 1
+    print(f"{args.source}: ok")
+    return 0
+
+
+def _pick_point_in_time(store: BackupStore, until: float, snapshot_id: Optional[str]) -> Tuple[Timeline, dict]:
+    for timeline in reversed(list_timelines()):
+        if timeline.started_at > until:
+            continue
+        candidates = [s for s in usable_snapshots(timeline, store) if s["ready_at"] <= until]
+        if snapshot_id:
+            candidates = [s for s in candidates if s["id"] == snapshot_id]
+        if candidates:
+            return timeline, candidates[-1]
+    raise BackupStoreError(f"no snapshot + WAL archive covers {_format_ts(until)}")
+
+
+def _swap(staging: str, db_path: str) -> Optional[str]:
+    """Подменяет рабочую базу собранной; копию прежней откладывает в сторону"""
+    kept = None
+    if os.path.exists(db_path):
+        kept = f"{db_path}.before-restore-{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(db_path + suffix):
+                shutil.copy2(db_path + suffix, kept + suffix)
+    # Чужой WAL поверх восстановленной базы её испортит — убираем до подмены
+    for suffix in ("-wal", "-shm"):
+        if os.path.exists(db_path + suffix):
+            os.remove(db_path + suffix)
+    # Рабочий файл существует всё время: подмена — одно переименование
+    os.replace(staging, db_path)
+    return kept
+
+
+def cmd_restore(store: BackupStore, args) -> int:
+    db_path = os.path.abspath(args.db or config.database.path)
+    staging = db_path + ".restore"
+    started = time.monotonic()
+
+    if args.until is not None:
+        try:
+            timeline, snapshot = _pick_point_in_time(store, args.until, args.source)
+        except BackupStoreError as e:
+            print(e)
+            return 1
+        covered = timeline.covered_until() or timeline.started_at
+        plan = (
+            f"snapshot {snapshot['id']} + WAL timeline {timeline.id} up to {_format_ts(min(args.until, covered))}"
+        )
+        if args.until > covered:
+            plan += f" (archive ends at {_format_ts(covered)})"
+    elif args.source:
+        file_source = _resolve_file(args.source)
+        plan = f"file {file_source}" if file_source else f"snapshot {args.source}"
+    else:
+        print("Specify a snapshot id / backup file or --until")
+        return 2
+
+    print(f"Restore {db_path} from {plan}")
+    if not args.yes and input("Continue? [y/N] ").strip().lower() not in ("y", "yes"):
+        return 1
+
+    try:
+        # Эксклюзивная блокировка держится до конца восстановления: бот не запустится посреди него
+        lock = db_lock.acquire(db_path, exclusive=True)
+    except db_lock.DatabaseLockedError:
+        print(f"{db_path} is in use, stop the bot before restoring")
+        return 1
+
+    try:
+        try:
+            if args.until is not None:
+                store.restore(snapshot["id"], staging)
+                from_epoch = timeline.epoch_started_before(snapshot["effective_from"])
+                result = replay(staging, timeline, from_epoch, args.until)
+                if result["until"]:
+                    print(f"Replayed {result['frames']} WAL frames, state as of {_format_ts(result['until'])}")
+            elif file_source:
+                shutil.copyfile(file_source, staging)
+            else:
+                store.restore(args.source, staging)
+            _check_integrity(staging)
+        except Exception as e:
+            if os.path.exists(staging):
+                os.remove(staging)
+            print(f"Restore failed: {e}")
+            return 1
+
+        kept = _swap(staging, db_path)
+    finally:
+        db_lock.release(lock)
+    print(f"Restored in {time.monotonic() - started:.1f}s")
+    if kept:
+        print(f"Previous database kept as {kept}")
+    return 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Восстановление SQLite из бэкапов")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("list", help="полные копии, снимки и окна восстановления на момент времени")
+    validate = commands.add_parser("validate", help="проверить снимок или файл бэкапа")
+    validate.add_argument("source", help="id снимка или путь/имя файла .db")
+    restore = commands.add_parser("restore", help="восстановить рабочую базу")
+    restore.add_argument("source", nargs="?", help="id снимка или путь/имя файла .db")
+    restore.add_argument("--until", type=_parse_time, help="момент времени 'YYYY-MM-DD HH:MM[:SS]'")
+    restore.add_argument("--db", help="куда восстанавливать (по умолчанию DATABASE_PATH)")
+    restore.add_argument("--yes", action="store_true", help="не спрашивать подтверждение")
+    args = parser.parse_args()
+
+    store = BackupStore()
+    handlers = {"list": cmd_list, "validate": cmd_validate, "restore": cmd_restore}
+    sys.exit(handlers[args.command](store, args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+"""
+Поиск повторов и спам-волн среди отзывов.
+
+Перед сохранением отзыва finalize_review сверяет текст с индексом:
+
+- точный повтор — хэш нормализованного текста (без регистра, пунктуации и
+  лишних пробелов);
+- почти повтор — MinHash по символьным 5-граммам и LSH-корзины: кандидаты
+  находятся за несколько lookup'ов в словарях, а не перебором всех отзывов,
+  похожесть (оценка Жаккара) считается только для них.
+
+Решение:
+
+- свой же отзыв (точный или почти повтор) — DUPLICATE, новый не сохраняется;
+- похожие отзывы других пользователей за последние SPAM_WAVE_HOURS — FLAG,
+  модератор видит «похож на №X»; если таких пользователей набралось
+  SPAM_WAVE_USERS, это спам-волна — SPAM, отзыв и ещё не проверенные
+  участники волны уходят в архив мимо очереди модерации.
+
+Индекс живёт в памяти процесса, пополняется при каждом новом отзыве и при
+запуске заполняется последними DUPLICATE_INDEX_SIZE отзывами из таблицы
+reviews (rebuild, в рабочем потоке). Отклонённые и удалённые отзывы из него
+убираются (remove), а ушедшие в архив как спам — только перестают считаться
+повтором своего автора (retire), но ещё участвуют в подсчёте волны.
+"""
+import hashlib
+import random
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Dict, List, NamedTuple, Optional, Set, Tuple
+
+from loguru import logger
+
+from config import config
+
+ACCEPT = "accept"
+FLAG = "flag"
+DUPLICATE = "duplicate"
+SPAM = "spam"
+
+SHINGLE_SIZE = 5
+# Длинный текст сводится к MAX_SHINGLES наименьшим хэшам шинглов (bottom-k):
+# выборка согласована между текстами, а цена подписи не растёт с длиной
+MAX_SHINGLES = 256
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+# Короткие тексты («Отлично!») совпадают у разных людей честно — в спам-волны не считаются
+MIN_GLOBAL_CHARS = 30
+
+_MERSENNE = (1 << 61) - 1
+_rng = random.Random(0x5EED)
+_PERMUTATIONS = tuple((_rng.randrange(1, _MERSENNE), _rng.randrange(0, _MERSENNE)) for _ in range(NUM_PERM))
+_NON_WORD = re.compile(r"[\W_]+", re.UNICODE)
+
+
+def normalize(text: str) -> str:
+    return " ".join(_NON_WORD.sub(" ", text.lower()).split())
+
+
+def _hash64(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def minhash(normalized: str) -> Tuple[int, ...]:
+    if len(normalized) <= SHINGLE_SIZE:
+        shingles = {normalized}
+    else:
+        shingles = {normalized[i:i + SHINGLE_SIZE] for i in range(len(normalized) - SHINGLE_SIZE + 1)}
+    hashes = sorted(_hash64(shingle) for shingle in shingles)[:MAX_SHINGLES]
+    return tuple(min((a * h + b) % _MERSENNE for h in hashes) for a, b in _PERMUTATIONS)
+
+
+def similarity(left: Tuple[int, ...], right: Tuple[int, ...]) -> float:
+    """Оценка коэффициента Жаккара по двум подписям"""
+    return sum(1 for x, y in zip(left, right) if x == y) / NUM_PERM
+
+
+def _band_keys(signature: Tuple[int, ...]) -> List[Tuple[int, ...]]:
+    return [signature[band * ROWS:(band + 1) * ROWS] for band in range(BANDS)]
+
+
+def _timestamp(value: Any) -> float:
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value)
+        except ValueError:
+            return time.time()
+    if isinstance(value, datetime):
+        # CURRENT_TIMESTAMP в базе — UTC без пояса; как местное время окна сдвинулись бы на смещение
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.timestamp()
+    return time.time()
+
+
+class Verdict(NamedTuple):
+    action: str
+    match_id: Optional[int] = None
+    score: float = 0.0
+    # Участники спам-волны, которых стоит убрать из очереди модерации
+    cluster: Tuple[int, ...] = ()
+    # Посчитанный при проверке ключ текста — add не считает его заново
+    exact: bytes = b""
+    signature: Tuple[int, ...] = ()
+    is_global: bool = False
+
+
+class _Doc(NamedTuple):
+    user_id: int
+    exact: bytes
+    signature: Tuple[int, ...]
+    created: float
+    is_global: bool
+
+
+class ReviewSimilarityIndex:
+    def __init__(self) -> None:
+        cfg = config.similarity
+        self.threshold = cfg.threshold
+        self.spam_wave_users = cfg.spam_wave_users
+        self.spam_wave_seconds = cfg.spam_wave_hours * 3600
+        self.max_docs = cfg.index_size
+        self._docs: "OrderedDict[int, _Doc]" = OrderedDict()
+        self._exact: Dict[bytes, Set[int]] = {}
+        self._bands: List[Dict[Tuple[int, ...], Set[int]]] = [{} for _ in range(BANDS)]
+        # Пометки для модератора: id отзыва -> (похожий отзыв, похожесть)
+        self._flags: Dict[int, Tuple[int, float]] = {}
+        # Отзывы в архиве: не повтор для автора, но часть спам-волны
+        self._retired: Set[int] = set()
+        # Индекс пополняется и из рабочего потока (rebuild)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    # --- Проверка ---
+    def check(self, user_id: int, text: str) -> Verdict:
+        normalized = normalize(text)
+        exact, signature, is_global = self._exact_key(normalized), minhash(normalized), len(normalized) >= MIN_GLOBAL_CHARS
+        verdict = self._check(user_id, exact, signature, is_global)
+        return verdict._replace(exact=exact, signature=signature, is_global=is_global)
+
+    @staticmethod
+    def _exact_key(normalized: str) -> bytes:
+        return hashlib.blake2b(normalized.encode("utf-8"), digest_size=16).digest()
+
+    def _check(self, user_id: int, exact: bytes, signature: Tuple[int, ...], is_global: bool, now: Optional[float] = None) -> Verdict:
+        now = time.time() if now is None else now
+        with self._lock:
+            candidates = set(self._exact.get(exact, ()))
+            for band, key in enumerate(_band_keys(signature)):
+                candidates.update(self._bands[band].get(key, ()))
+
+            best_other: Optional[Tuple[float, int]] = None
+            wave: Dict[int, int] = {}  # автор -> его отзыв в волне
+            for doc_id in candidates:
+                doc = self._docs[doc_id]
+                score = 1.0 if doc.exact == exact else similarity(signature, doc.signature)
+                if score < self.threshold:
+                    continue
+                if doc.user_id == user_id:
+                    if doc_id in self._retired:
+                        continue
+                    return Verdict(DUPLICATE, doc_id, score)
+                if not (is_global and doc.is_global) or now - doc.created > self.spam_wave_seconds:
+                    continue
+                wave.setdefault(doc.user_id, doc_id)
+                if best_other is None or score > best_other[0]:
+                    best_other = (score, doc_id)
+
+        if best_other is None:
+            return Verdict(ACCEPT)
+        if len(wave) + 1 >= self.spam_wave_users:
+            return Verdict(SPAM, best_other[1], best_other[0], tuple(sorted(wave.values())))
+        return Verdict(FLAG, best_other[1], best_other[0])
+
+    # --- Пополнение ---
+    def add(self, review_id: int, user_id: int, text: str, verdict: Optional[Verdict] = None, created: Optional[float] = None) -> None:
+        created = time.time() if created is None else created
+        if verdict is not None and verdict.signature:
+            doc = _Doc(user_id, verdict.exact, verdict.signature, created, verdict.is_global)
+        else:
+            normalized = normalize(text)
+            doc = _Doc(user_id, self._exact_key(normalized), minhash(normalized), created, len(normalized) >= MIN_GLOBAL_CHARS)
+        self._add(review_id, doc, verdict)
+
+    def remove(self, *review_ids: int) -> None:
+        """Убрать отклонённые или удалённые отзывы: повтор их текста снова принимается"""
+        with self._lock:
+            for review_id in review_ids:
+                if review_id in self._docs:
+                    self._evict(review_id)
+
+    def retire(self, *review_ids: int) -> None:
+        """Отзывы ушли в архив как спам: повтором для автора больше не считаются"""
+        with self._lock:
+            self._retired.update(review_id for review_id in review_ids if review_id in self._docs)
+            for review_id in review_ids:
+                self._flags.pop(review_id, None)
+
+    def _add(self, review_id: int, doc: _Doc, verdict: Optional[Verdict]) -> None:
+        with self._lock:
+            if review_id in self._docs:
+                return
+            self._docs[review_id] = doc
+            self._exact.setdefault(doc.exact, set()).add(review_id)
+            for band, key in enumerate(_band_keys(doc.signature)):
+                self._bands[band].setdefault(key, set()).add(review_id)
+            if verdict is not None and verdict.action == FLAG:
+                self._flags[review_id] = (verdict.match_id, verdict.score)
+            while len(self._docs) > self.max_docs:
+                self._evict(next(iter(self._docs)))
+
+    def _evict(self, review_id: int) -> None:
+        doc = self._docs.pop(review_id)
+        self._flags.pop(review_id, None)
+        self._retired.discard(review_id)
+        bucket = self._exact[doc.exact]
+        bucket.discard(review_id)
+        if not bucket:
+            del self._exact[doc.exact]
+        for band, key in enumerate(_band_keys(doc.signature)):
+            bucket = self._bands[band][key]
+            bucket.discard(review_id)
+            if not bucket:
+                del self._bands[band][key]
+
+    def flag_for(self, review_id: int) -> Optional[Tuple[int, float]]:
+        """Похожий отзыв другого автора для карточки модерации"""
+        return self._flags.get(review_id)
+
+    # --- Заполнение при запуске ---
+    def rebuild(self, db_path: Optional[str] = None) -> int:
+        """Заполнить индекс последними отзывами из reviews. Синхронно, вызывать в рабочем потоке."""
+        # БД импортируем здесь: модуль подключается из логики отзывов раньше базы
+        from db_manager.db import Database
+
+        started = time.monotonic()
+        db = Database(path_to_database=db_path)
+        loaded = 0
+        try:
+            # Старые сверх размера индекса всё равно были бы вытеснены — не читаем их
+            for row in reversed(db.get_recent_reviews(self.max_docs)):
+                normalized = normalize(row["text"] or "")
+                created = _timestamp(row.get("created_at"))
+                doc = _Doc(
+                    row["user_id"], self._exact_key(normalized), minhash(normalized),
+                    created, len(normalized) >= MIN_GLOBAL_CHARS,
+                )
+                verdict = None
+                if not row.get("is_approved"):
+                    # Пометки нужны только отзывам, которые ещё ждут модерации
+                    verdict = self._check(doc.user_id, doc.exact, doc.signature, doc.is_global, now=created)
+                self._add(row["id"], doc, verdict)
+                loaded += 1
+        finally:
+            db.close()
+        logger.info(f"Review similarity index: {loaded} reviews in {time.monotonic() - started:.1f} s")
+        return loaded
+
+
+review_index = ReviewSimilarityIndex()
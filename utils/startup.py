@@ -0,0 +1,101 @@
+"""
+Замер холодного старта.
+
+main.py импортирует этот модуль первым и отмечает фазы запуска (импорты,
+логирование, БД, бот, диспетчер). Когда приходит первый апдейт, в лог пишется
+отчёт: длительность каждой фазы и полное время от старта до первого апдейта.
+
+С переменной окружения STARTUP_PROFILE=true дополнительно замеряется каждый
+импорт (собственное время модуля без вложенных импортов) и в отчёт попадают
+самые медленные. Переменная читается из окружения процесса, а не из .env:
+в момент установки хука config ещё не импортирован — он тоже под замером.
+"""
+import builtins
+import os
+import sys
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class StartupProfiler:
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self._last_mark = self.started
+        self.phases: List[Tuple[str, float]] = []
+        # Имя модуля -> (время вместе с вложенными импортами, собственное время)
+        self.imports: Dict[str, Tuple[float, float]] = {}
+        self._children: List[float] = []
+        self._original_import = None
+        self.first_update_seen = False
+
+    def mark(self, phase: str) -> None:
+        """Закрывает фазу: её длительность — время с предыдущей отметки"""
+        now = time.perf_counter()
+        self.phases.append((phase, now - self._last_mark))
+        self._last_mark = now
+
+    # --- Замер импортов ---
+    def install_import_hook(self) -> None:
+        if self._original_import is None:
+            self._original_import = builtins.__import__
+            builtins.__import__ = self._timed_import
+
+    def remove_import_hook(self) -> None:
+        if self._original_import is not None:
+            builtins.__import__ = self._original_import
+            self._original_import = None
+
+    def _timed_import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        original = self._original_import
+        # Уже загруженные модули и относительные импорты не замеряем отдельно
+        if level or name in sys.modules:
+            return original(name, globals, locals, fromlist, level)
+        self._children.append(0.0)
+        started = time.perf_counter()
+        try:
+            return original(name, globals, locals, fromlist, level)
+        finally:
+            total = time.perf_counter() - started
+            children = self._children.pop()
+            if self._children:
+                self._children[-1] += total
+            self.imports[name] = (total, total - children)
+
+    # --- Первый апдейт ---
+    async def first_update_middleware(self, handler, event, data) -> Any:
+        """Outer middleware Dispatcher: отмечает первый апдейт и пишет отчёт"""
+        if not self.first_update_seen:
+            self.first_update_seen = True
+            self.mark("first_update")
+            self.remove_import_hook()
+            self.log_report()
+        return await handler(event, data)
+
+    def report(self, top: int = 15) -> Dict[str, Any]:
+        result: Dict[str, Any] = {
+            "total_ms": round((self._last_mark - self.started) * 1000, 1),
+            "phases": {name: round(seconds * 1000, 1) for name, seconds in self.phases},
+        }
+        if self.imports:
+            slowest = sorted(self.imports.items(), key=lambda item: item[1][1], reverse=True)[:top]
+            result["slowest_imports"] = {
+                name: {"self_ms": round(own * 1000, 1), "total_ms": round(total * 1000, 1)}
+                for name, (total, own) in slowest
+            }
+        return result
+
+    def log_report(self, stage: Optional[str] = None) -> None:
+        from loguru import logger
+
+        report = self.report()
+        phases = ", ".join(f"{name}={ms:.0f}ms" for name, ms in report["phases"].items())
+        stage = stage or ("first update" if self.first_update_seen else "ready")
+        logger.bind(event_type="startup_report", **report).info(
+            f"Startup to {stage}: {report['total_ms']:.0f} ms ({phases})"
+        )
+
+
+startup = StartupProfiler()
+
+if os.environ.get("STARTUP_PROFILE", "").lower() in ("1", "true", "yes"):
+    startup.install_import_hook()
@@ -0,0 +1,145 @@
+"""
+Планировщик апдейтов на уровне Dispatcher.
+
+- апдейты одного пользователя обрабатываются строго по очереди, поэтому
+  двойное нажатие не гоняет FSM наперегонки и не дублирует редактирования;
+- общее число одновременно работающих хендлеров ограничено;
+- у пользователя в очереди не больше max_pending апдейтов, лишние отбрасываются;
+- повторный колбэк с теми же данными, пока первый ещё в очереди или выполняется,
+  отбрасывается; из нескольких ожидающих кликов пагинации по одному сообщению
+  выполняется только последний.
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from aiogram import BaseMiddleware
+from aiogram.types import CallbackQuery, TelegramObject, Update, User
+from loguru import logger
+
+from config import config
+from utils.callbacks import action_name
+
+# Колбэки, у которых важен только последний клик (пагинация)
+COLLAPSIBLE_ACTIONS = frozenset(("reviews:user", "reviews:admin"))
+
+
+class _Ticket:
+    __slots__ = ("superseded",)
+
+    def __init__(self) -> None:
+        self.superseded = False
+
+
+class _UserQueue:
+    __slots__ = ("lock", "pending", "active_data", "collapsible")
+
+    def __init__(self) -> None:
+        self.lock = asyncio.Lock()
+        self.pending = 0
+        # callback_data, которые сейчас в очереди или выполняются: (message_id, data)
+        self.active_data: set = set()
+        # Последний ожидающий колбэк пагинации: (message_id, action) -> ticket
+        self.collapsible: Dict[Tuple[Optional[int], str], _Ticket] = {}
+
+
+def _collapse_action(data: str) -> Optional[str]:
+    action = action_name(data)
+    return action if action in COLLAPSIBLE_ACTIONS else None
+
+
+async def _silent_answer(call: CallbackQuery) -> None:
+    try:
+        await call.answer()
+    except Exception:
+        pass
+
+
+class UpdateScheduler(BaseMiddleware):
+    def __init__(self, max_in_flight: Optional[int] = None, max_pending_per_user: Optional[int] = None) -> None:
+        cfg = config.scheduler
+        self.max_in_flight = max_in_flight or cfg.max_in_flight
+        self.max_pending_per_user = max_pending_per_user or cfg.max_pending_per_user
+        self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        self._users: Dict[int, _UserQueue] = {}
+
+        self.in_flight = 0
+        self.dropped_total = 0
+        self.collapsed_total = 0
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any],
+    ) -> Any:
+        user: Optional[User] = data.get("event_from_user")
+        if user is None:
+            return await self._run(handler, event, data)
+
+        queue = self._users.get(user.id)
+        if queue is None:
+            queue = self._users[user.id] = _UserQueue()
+
+        call = event.callback_query
+        dedup_key = None
+        if call is not None and call.data:
+            message_id = call.message.message_id if call.message else None
+            dedup_key = (message_id, call.data)
+            if dedup_key in queue.active_data:
+                # Тот же клик уже в работе — повтор ничего не изменит
+                self.dropped_total += 1
+                await _silent_answer(call)
+                return None
+
+        if queue.pending >= self.max_pending_per_user:
+            self.dropped_total += 1
+            logger.bind(user_id=user.id, event_type="update_dropped").debug("User queue is full")
+            if call is not None:
+                await _silent_answer(call)
+            return None
+
+        ticket = None
+        if dedup_key is not None:
+            queue.active_data.add(dedup_key)
+            action = _collapse_action(call.data)
+            if action is not None:
+                collapse_key = (dedup_key[0], action)
+                previous = queue.collapsible.get(collapse_key)
+                if previous is not None:
+                    previous.superseded = True
+                ticket = queue.collapsible[collapse_key] = _Ticket()
+
+        queue.pending += 1
+        try:
+            async with queue.lock:
+                if ticket is not None:
+                    if queue.collapsible.get(collapse_key) is ticket:
+                        del queue.collapsible[collapse_key]
+                    if ticket.superseded:
+                        # Пока ждали очереди, пользователь кликнул дальше
+                        self.collapsed_total += 1
+                        await _silent_answer(call)
+                        return None
+                return await self._run(handler, event, data)
+        finally:
+            queue.pending -= 1
+            if dedup_key is not None:
+                queue.active_data.discard(dedup_key)
+            if queue.pending == 0:
+                self._users.pop(user.id, None)
+
+    async def _run(self, handler, event, data) -> Any:
+        async with self._semaphore:
+            self.in_flight += 1
+            try:
+                return await handler(event, data)
+            finally:
+                self.in_flight -= 1
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "in_flight": self.in_flight,
+            "queued_users": len(self._users),
+            "dropped_total": self.dropped_total,
+            "collapsed_total": self.collapsed_total,
+        }
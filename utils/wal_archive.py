@@ -0,0 +1,411 @@
+"""
+Непрерывное архивирование WAL SQLite для восстановления на момент времени.
+
+Когда WAL_ARCHIVE_ENABLED=true, база работает в режиме WAL с отключённым
+автоматическим checkpoint, а фоновый поток бота каждые WAL_ARCHIVE_INTERVAL
+секунд дописывает новые кадры WAL в архив и сам делает checkpoint:
+
+1. под кратким write-локом (BEGIN IMMEDIATE) находит последний кадр-коммит N;
+2. открывает читающую транзакцию на снимке N — пока она открыта, SQLite не
+   может начать WAL заново, а checkpoint не заходит дальше N;
+3. без лока копирует кадры до N в архив и, если их накопилось достаточно,
+   делает PASSIVE checkpoint — он покрывает только уже заархивированные кадры.
+
+Архив: BACKUP_DIR/wal/<линия>/ — базовый снимок из хранилища бэкапов
+(timeline.json), файлы эпох (<эпоха>.wal, между перезапусками WAL) и index.jsonl
+с моментами копирования. Если непрерывность нарушилась (WAL перезапустился не
+нашим checkpoint, бот перезапущен), начинается новая линия со своим базовым
+снимком. Точность восстановления — интервал архивирования.
+"""
+import gzip
+import json
+import os
+import shutil
+import sqlite3
+import struct
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from loguru import logger
+
+from config import config
+
+WAL_HEADER_SIZE = 32
+FRAME_HEADER_SIZE = 24
+
+
+class WalArchiveError(Exception):
+    pass
+
+
+def archive_root() -> str:
+    return os.path.join(config.database.backup_dir, "wal")
+
+
+def _read_header(wal_path: str) -> Optional[Tuple[bytes, int, bytes]]:
+    """(заголовок, размер страницы, соль) или None, если WAL пуст"""
+    try:
+        with open(wal_path, "rb") as f:
+            header = f.read(WAL_HEADER_SIZE)
+    except FileNotFoundError:
+        return None
+    if len(header) < WAL_HEADER_SIZE:
+        return None
+    page_size = struct.unpack(">I", header[8:12])[0]
+    if page_size == 1:
+        page_size = 65536
+    return header, page_size, header[16:24]
+
+
+def _last_commit(wal_path: str, page_size: int, salt: bytes, start_frame: int) -> int:
+    """Номер последнего кадра-коммита текущей эпохи (кадры считаются с 1)"""
+    frame_size = FRAME_HEADER_SIZE + page_size
+    last = start_frame
+    frame = start_frame + 1
+    with open(wal_path, "rb") as f:
+        while True:
+            f.seek(WAL_HEADER_SIZE + (frame - 1) * frame_size)
+            header = f.read(FRAME_HEADER_SIZE)
+            if len(header) < FRAME_HEADER_SIZE or header[8:16] != salt:
+                break
+            # Кадры после незавершённой транзакции тоже с нашей солью, но без признака коммита
+            if struct.unpack(">I", header[4:8])[0]:
+                last = frame
+            frame += 1
+    return last
+
+
+class Timeline:
+    """Непрерывная линия архива: базовый снимок + эпохи WAL"""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.id = os.path.basename(path)
+        with open(os.path.join(path, "timeline.json"), encoding="utf-8") as f:
+            self.meta = json.load(f)
+
+    @property
+    def started_at(self) -> float:
+        return self.meta["started_at"]
+
+    def entries(self) -> List[dict]:
+        index = os.path.join(self.path, "index.jsonl")
+        if not os.path.exists(index):
+            return []
+        with open(index, encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def covered_until(self) -> Optional[float]:
+        entries = self.entries()
+        return entries[-1]["time"] if entries else None
+
+    def epoch_path(self, epoch: int) -> str:
+        plain = os.path.join(self.path, f"{epoch:06d}.wal")
+        return plain if os.path.exists(plain) else plain + ".gz"
+
+    def epoch_started_before(self, moment: float) -> int:
+        """Последняя эпоха, начавшаяся не позже moment"""
+        chosen = 1
+        for epoch, started in self.meta.get("epochs", {}).items():
+            if started <= moment:
+                chosen = max(chosen, int(epoch))
+        return chosen
+
+
+def list_timelines(root: Optional[str] = None) -> List[Timeline]:
+    root = root or archive_root()
+    if not os.path.isdir(root):
+        return []
+    timelines = []
+    for name in sorted(os.listdir(root)):
+        path = os.path.join(root, name)
+        if os.path.exists(os.path.join(path, "timeline.json")):
+            timelines.append(Timeline(path))
+    return timelines
+
+
+class WalArchiver:
+    def __init__(self, db_path: str, root: Optional[str] = None, store=None) -> None:
+        from utils.backup_store import BackupStore
+
+        self.db_path = os.path.abspath(db_path)
+        self.wal_path = self.db_path + "-wal"
+        self.root = root or archive_root()
+        self.store = store or BackupStore()
+        self.interval = config.database.wal_archive_interval
+        self.checkpoint_frames = config.database.wal_checkpoint_pages
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        # Соединения живут всё время работы архиватора: последнее закрывшееся
+        # соединение SQLite само делает checkpoint и удаляет WAL
+        self._lock_conn = self._connect()
+        self._read_conn = self._connect()
+        self._ckpt_conn = self._connect()
+
+        self.timeline_dir: Optional[str] = None
+        self.epoch = 0
+        self.salt: Optional[bytes] = None
+        self.archived = 0  # Кадров текущей эпохи в архиве
+        self.checkpointed = 0
+        self.epoch_closed = False
+
+        self.frames_total = 0
+        self.timelines_started = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.db_path, isolation_level=None, timeout=5, check_same_thread=False)
+        connection.execute("PRAGMA wal_autocheckpoint=0")
+        return connection
+
+    # --- Жизненный цикл ---
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="wal-archiver", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=30)
+        if not self.timeline_dir:
+            return
+        # Последние кадры до закрытия соединений бота
+        try:
+            self.tick()
+        except Exception as e:
+            logger.error(f"WAL archive: final tick failed: {e}")
+
+    def _run(self) -> None:
+        # Базовый снимок большой базы долгий — снимаем его здесь, а не в цикле событий
+        try:
+            self._start_timeline("startup")
+        except Exception as e:
+            logger.error(f"WAL archive: could not start timeline: {e}")
+            return
+        while not self._stop.wait(self.interval):
+            try:
+                self.tick()
+            except Exception as e:
+                logger.error(f"WAL archive tick failed: {e}")
+
+    def _start_timeline(self, reason: str) -> None:
+        self._close_epoch_file()
+        started_at = time.time()
+        timeline_id = datetime.fromtimestamp(started_at).strftime("%Y%m%d_%H%M%S")
+        path = os.path.join(self.root, timeline_id)
+        while os.path.exists(path):
+            path += "_"
+        os.makedirs(path)
+
+        # Базовый снимок после открытия линии: все более поздние кадры попадут в архив
+        manifest = self.store.snapshot(self.db_path) or self.store.latest()
+        meta = {
+            "started_at": started_at,
+            "reason": reason,
+            "db_path": self.db_path,
+            "base_snapshot": manifest["id"],
+            "epochs": {},
+        }
+        self._write_meta(path, meta)
+        self.timeline_dir = path
+        self.epoch = 0
+        self.salt = None
+        self.archived = 0
+        self.checkpointed = 0
+        self.epoch_closed = False
+        self.timelines_started += 1
+        logger.bind(event_type="wal_archive", timeline=os.path.basename(path), reason=reason).info(
+            f"WAL archive: new timeline {os.path.basename(path)} (base snapshot {manifest['id']}, {reason})"
+        )
+
+    @staticmethod
+    def _write_meta(path: str, meta: dict) -> None:
+        partial = os.path.join(path, "timeline.json.part")
+        with open(partial, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(partial, os.path.join(path, "timeline.json"))
+
+    def _epoch_file(self, epoch: int) -> str:
+        return os.path.join(self.timeline_dir, f"{epoch:06d}.wal")
+
+    def _close_epoch_file(self) -> None:
+        """Сжимает файл завершённой эпохи"""
+        if not self.timeline_dir or not self.epoch:
+            return
+        path = self._epoch_file(self.epoch)
+        if os.path.exists(path):
+            with open(path, "rb") as src, gzip.open(path + ".gz", "wb", compresslevel=6) as dst:
+                shutil.copyfileobj(src, dst)
+            os.remove(path)
+
+    def _begin_epoch(self, header: bytes, salt: bytes) -> None:
+        self._close_epoch_file()
+        self.epoch += 1
+        self.salt = salt
+        self.archived = 0
+        self.checkpointed = 0
+        self.epoch_closed = False
+        with open(self._epoch_file(self.epoch), "wb") as f:
+            f.write(header)
+        meta_path = os.path.join(self.timeline_dir, "timeline.json")
+        with open(meta_path, encoding="utf-8") as f:
+            meta = json.load(f)
+        meta["epochs"][str(self.epoch)] = time.time()
+        self._write_meta(self.timeline_dir, meta)
+
+    # --- Основной шаг ---
+    def tick(self) -> None:
+        try:
+            self._lock_conn.execute("BEGIN IMMEDIATE")
+        except sqlite3.OperationalError:
+            return  # Долгая запись — попробуем в следующий раз
+        gap = False
+        target = self.archived
+        page_size = 0
+        try:
+            found = _read_header(self.wal_path)
+            if found:
+                header, page_size, salt = found
+                if salt != self.salt:
+                    # WAL начат заново; без потерь — только если предыдущую эпоху закрыл наш checkpoint
+                    if self.salt is not None and not self.epoch_closed:
+                        gap = True
+                    else:
+                        self._begin_epoch(header, salt)
+                if not gap:
+                    target = _last_commit(self.wal_path, page_size, salt, self.archived)
+                    # Снимок чтения на кадре target: WAL не перезапустится, пока мы копируем
+                    self._read_conn.execute("BEGIN")
+                    self._read_conn.execute("SELECT 1 FROM sqlite_master LIMIT 1").fetchall()
+        finally:
+            self._lock_conn.execute("ROLLBACK")
+
+        if gap:
+            self._start_timeline("wal restarted outside the archiver")
+            return
+        if not found:
+            return
+
+        try:
+            if target > self.archived:
+                self._copy_frames(page_size, target)
+            if self.archived - self.checkpointed >= self.checkpoint_frames:
+                busy, log, checkpointed = self._ckpt_conn.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchone()
+                self.checkpointed = checkpointed
+                # Полный checkpoint только заархивированных кадров: после него WAL можно начинать заново
+                self.epoch_closed = not busy and log == checkpointed == self.archived
+        finally:
+            self._read_conn.execute("COMMIT")
+
+    def _copy_frames(self, page_size: int, target: int) -> None:
+        frame_size = FRAME_HEADER_SIZE + page_size
+        with open(self.wal_path, "rb") as src:
+            src.seek(WAL_HEADER_SIZE + self.archived * frame_size)
+            data = src.read((target - self.archived) * frame_size)
+        with open(self._epoch_file(self.epoch), "ab") as dst:
+            dst.write(data)
+            dst.flush()
+            os.fsync(dst.fileno())
+        self.frames_total += target - self.archived
+        self.archived = target
+        self.epoch_closed = False
+        with open(os.path.join(self.timeline_dir, "index.jsonl"), "a", encoding="utf-8") as f:
+            f.write(json.dumps({"epoch": self.epoch, "frames": target, "time": time.time()}) + "\n")
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "timeline": os.path.basename(self.timeline_dir) if self.timeline_dir else None,
+            "epoch": self.epoch,
+            "frames_total": self.frames_total,
+            "timelines_started": self.timelines_started,
+        }
+
+
+def _read_epoch(path: str) -> bytes:
+    if path.endswith(".gz"):
+        with gzip.open(path, "rb") as f:
+            return f.read()
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def replay(db_file: str, timeline: Timeline, from_epoch: int, until: float) -> dict:
+    """
+    Накатывает на db_file кадры линии начиная с эпохи from_epoch, скопированные
+    в архив не позже until. Каждая эпоха подкладывается как <db>-wal и
+    применяется штатным checkpoint SQLite.
+    """
+    last_frames: Dict[int, int] = {}
+    last_time: Optional[float] = None
+    for entry in timeline.entries():
+        if entry["epoch"] >= from_epoch and entry["time"] <= until:
+            last_frames[entry["epoch"]] = entry["frames"]
+            last_time = entry["time"]
+
+    connection = sqlite3.connect(db_file)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.close()
+
+    applied = 0
+    for epoch in sorted(last_frames):
+        data = _read_epoch(timeline.epoch_path(epoch))
+        page_size = struct.unpack(">I", data[8:12])[0]
+        if page_size == 1:
+            page_size = 65536
+        frames = last_frames[epoch]
+        if os.path.exists(db_file + "-shm"):
+            os.remove(db_file + "-shm")
+        with open(db_file + "-wal", "wb") as f:
+            f.write(data[: WAL_HEADER_SIZE + frames * (FRAME_HEADER_SIZE + page_size)])
+        connection = sqlite3.connect(db_file)
+        try:
+            busy, _, _ = connection.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+            if busy:
+                raise WalArchiveError(f"could not checkpoint epoch {epoch}")
+        finally:
+            connection.close()
+        applied += frames
+
+    # Восстановленная база возвращается в обычный режим журнала, бот включит WAL сам
+    connection = sqlite3.connect(db_file)
+    connection.execute("PRAGMA journal_mode=DELETE")
+    connection.close()
+    for suffix in ("-wal", "-shm"):
+        if os.path.exists(db_file + suffix):
+            os.remove(db_file + suffix)
+    return {"epochs": len(last_frames), "frames": applied, "until": last_time}
+
+
+def usable_snapshots(timeline: Timeline, store) -> List[dict]:
+    """Снимки, от которых можно накатывать эту линию: базовый и снятые во время её записи"""
+    snapshots = []
+    covered_until = timeline.covered_until() or timeline.started_at
+    for snapshot_id in store.snapshot_ids():
+        if snapshot_id == timeline.meta["base_snapshot"]:
+            manifest = store.load(snapshot_id)
+            # Базовый снят после открытия линии, даже если переиспользован неизменившийся
+            manifest["effective_from"] = timeline.started_at
+            manifest["ready_at"] = timeline.started_at
+            snapshots.append(manifest)
+            continue
+        manifest = store.load(snapshot_id)
+        created = datetime.fromisoformat(manifest["created_at"]).timestamp()
+        if timeline.started_at <= created <= covered_until:
+            manifest["effective_from"] = created
+            # Снимок согласован на момент не позже конца копирования (+1 с на округление created_at)
+            manifest["ready_at"] = created + manifest.get("backup_seconds", 0) + 1
+            snapshots.append(manifest)
+    return sorted(snapshots, key=lambda m: m["ready_at"])
+
+
+def prune_timelines(store, root: Optional[str] = None) -> int:
+    """Удаляет линии, для которых в хранилище не осталось ни одного снимка (кроме текущей)"""
+    timelines = list_timelines(root)
+    removed = 0
+    for timeline in timelines[:-1]:
+        if not usable_snapshots(timeline, store):
+            shutil.rmtree(timeline.path)
+            removed += 1
+    return removed
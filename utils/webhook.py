@@ -0,0 +1,116 @@
+"""
+Режим webhook на aiohttp как альтернатива long polling.
+
+Запрос от Telegram подтверждается сразу после проверки секрета и постановки
+апдейта в ограниченную очередь; обработку выполняет фиксированный пул
+воркеров. Если очередь переполнена, отвечаем 503 — Telegram повторит
+доставку позже, так что нагрузка не копится в памяти.
+
+Несколько процессов могут слушать один порт (reuse_port), вебхук при этом
+регистрирует только процесс с WEBHOOK_REGISTER=true. Поэтому секрет не
+генерируется при запуске, а задаётся в WEBHOOK_SECRET — общий для всех
+процессов; без него сервер не запускается: принимал бы апдейты от кого угодно.
+"""
+import asyncio
+import hmac
+from typing import List, Optional
+
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+from loguru import logger
+
+from config import config
+from utils.metrics import registry
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+class WebhookServer:
+    def __init__(self, dp: Dispatcher, bot: Bot) -> None:
+        self.dp = dp
+        self.bot = bot
+        self.cfg = config.webhook
+        if not self.cfg.secret:
+            raise ValueError("WEBHOOK_SECRET is required in webhook mode")
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=self.cfg.queue_size)
+        self._workers: List[asyncio.Task] = []
+        self.accepted_total = 0
+        self.rejected_total = 0
+        registry.gauge("bot_webhook_queue_size", "Accepted updates waiting for a worker", self.queue.qsize)
+        registry.gauge("bot_webhook_rejected_total", "Updates rejected with 503", lambda: self.rejected_total, kind="counter")
+
+    async def handle(self, request: web.Request) -> web.Response:
+        token = request.headers.get(SECRET_HEADER, "")
+        if not hmac.compare_digest(token, self.cfg.secret):
+            return web.Response(status=401)
+
+        try:
+            update = Update.model_validate(await request.json(), context={"bot": self.bot})
+        except Exception as e:
+            logger.warning(f"Некорректный апдейт в webhook: {e}")
+            # 200, чтобы Telegram не слал битый апдейт повторно
+            return web.Response()
+
+        try:
+            self.queue.put_nowait(update)
+        except asyncio.QueueFull:
+            self.rejected_total += 1
+            return web.Response(status=503)
+
+        self.accepted_total += 1
+        return web.Response()
+
+    async def _worker(self) -> None:
+        while True:
+            update = await self.queue.get()
+            try:
+                await self.dp.feed_update(self.bot, update)
+            except Exception as e:
+                logger.error(f"Ошибка обработки апдейта {update.update_id}: {e}")
+            finally:
+                self.queue.task_done()
+
+    async def on_startup(self, app: web.Application) -> None:
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.cfg.workers)]
+        await self.dp.emit_startup(bot=self.bot)
+        if self.cfg.register:
+            await self.bot.set_webhook(
+                url=self.cfg.url.rstrip("/") + self.cfg.path,
+                secret_token=self.cfg.secret,
+                allowed_updates=self.dp.resolve_used_update_types(),
+                max_connections=self.cfg.max_connections,
+            )
+            logger.info(f"Webhook registered: {self.cfg.url}{self.cfg.path}")
+
+    async def on_shutdown(self, app: web.Application) -> None:
+        # Дорабатываем то, что уже принято, чтобы не потерять подтверждённые апдейты
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout=self.cfg.drain_timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Webhook shutdown: {self.queue.qsize()} updates left unprocessed")
+        for task in self._workers:
+            task.cancel()
+        await self.dp.emit_shutdown(bot=self.bot)
+        await self.bot.session.close()
+
+    def create_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post(self.cfg.path, self.handle)
+        app.on_startup.append(self.on_startup)
+        app.on_shutdown.append(self.on_shutdown)
+        return app
+
+
+async def run_webhook(dp: Dispatcher, bot: Bot, stop_event: Optional[asyncio.Event] = None) -> None:
+    """Запускает aiohttp-сервер и работает до отмены задачи или stop_event"""
+    server = WebhookServer(dp, bot)
+    runner = web.AppRunner(server.create_app())
+    await runner.setup()
+    site = web.TCPSite(runner, config.webhook.host, config.webhook.port, reuse_port=config.webhook.reuse_port)
+    await site.start()
+    logger.info(f"Webhook server listening on {config.webhook.host}:{config.webhook.port}{config.webhook.path}")
+    try:
+        await (stop_event or asyncio.Event()).wait()
+    finally:
+        await runner.cleanup()